@@ -0,0 +1,368 @@
+"""
+Admission control in front of the generation routes.
+
+Each generation request passes three checks before its handler runs:
+
+1. a token bucket per client: the X-Client-Id header when the request comes
+   from a proxy listed in AI_TRUSTED_PROXIES, else the remote address
+2. a token bucket per endpoint, for endpoints listed in AI_ENDPOINT_RATES
+3. a slot in a bounded priority queue: at most AI_ADMISSION_CONCURRENCY
+   requests run at once and the rest wait, interactive requests (explain a
+   concept, evaluate one answer, ...) ahead of batch work (session
+   completion, batch evaluation, learning paths, background jobs)
+
+An empty bucket is answered with 429, a full queue or a wait longer than
+AI_ADMISSION_TIMEOUT with 503; both carry Retry-After. Batch requests are
+shed once the queue is half full, so interactive traffic always finds room.
+"""
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import math
+import os
+import threading
+import time
+
+import metrics
+
+ENABLED = os.getenv('AI_ADMISSION', '1') not in ('0', 'false')
+
+# Requests that may run their handler at the same time
+CONCURRENCY = int(os.getenv('AI_ADMISSION_CONCURRENCY', 16))
+
+# Requests that may wait for a slot; batch requests may use half of it
+MAX_WAITING = int(os.getenv('AI_ADMISSION_QUEUE', 64))
+BATCH_QUEUE_SHARE = 0.5
+
+# Seconds a request may wait for a slot before it is shed
+TIMEOUT = float(os.getenv('AI_ADMISSION_TIMEOUT', 30))
+
+# Per-client token bucket: sustained requests per second and burst size; 0 disables
+CLIENT_RATE = float(os.getenv('AI_CLIENT_RATE', 2))
+CLIENT_BURST = int(os.getenv('AI_CLIENT_BURST', 20))
+
+# Addresses or networks (comma-separated) whose X-Client-Id header is trusted,
+# e.g. the Node backend (on the same host by default); empty keys every request on its remote address
+TRUSTED_PROXIES = os.getenv('AI_TRUSTED_PROXIES', '127.0.0.1,::1')
+
+CLIENT_ID_HEADER = 'X-Client-Id'
+
+INTERACTIVE = 0
+BATCH = 1
+CLASS_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+INTERACTIVE_ENDPOINTS = (
+    'summarize-notes',
+    'explain-concept',
+    'generate-quiz',
+    'generate-interview-questions',
+    'evaluate-answer',
+    'evaluate-answers',
+)
+
+BATCH_ENDPOINTS = (
+    'generate-session-notes',
+    'generate-session-assessment',
+    'generate-learning-path',
+    'complete-session',
+)
+
+
+class Rejected(Exception):
+    """A request was not admitted; `status` is 429 or 503"""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def endpoint_class(endpoint):
+    return INTERACTIVE if endpoint in INTERACTIVE_ENDPOINTS else BATCH
+
+
+def parse_endpoint_rates(spec):
+    """Parse "endpoint=rate:burst,endpoint=rate" into {endpoint: (rate, burst)}"""
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        endpoint, value = item.split('=', 1)
+        rate, _, burst = value.partition(':')
+        rate = float(rate)
+        rates[endpoint.strip()] = (rate, int(burst) if burst else max(1, math.ceil(rate)))
+    return rates
+
+
+def parse_networks(spec):
+    """Parse "10.0.0.5,172.16.0.0/12" into a tuple of ip networks"""
+    return tuple(
+        ipaddress.ip_network(item.strip(), strict=False) for item in (spec or '').split(',') if item.strip()
+    )
+
+
+def client_id(header, remote_addr, trusted=None):
+    """
+    The key for a request's client bucket: `header` (its X-Client-Id) only
+    when `remote_addr` is one of the `trusted` proxy networks, so a client
+    cannot pick its own bucket; otherwise the remote address.
+    """
+    trusted = _TRUSTED if trusted is None else trusted
+    if header and remote_addr and trusted:
+        try:
+            address = ipaddress.ip_address(remote_addr)
+        except ValueError:
+            address = None
+        if address is not None and any(address in network for network in trusted):
+            return header
+    return remote_addr or 'unknown'
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now):
+        """Take a token; returns 0 on success, otherwise the seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets by key, created on first use; idle full buckets are dropped"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def take(self, key):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            wait = bucket.take(now)
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        refill = self.burst / self.rate
+        idle = [key for key, bucket in self._buckets.items() if now - bucket.updated > refill]
+        for key in idle:
+            del self._buckets[key]
+
+
+class _Waiter:
+    """A queued request; `grant` hands it a slot from whichever thread releases one"""
+
+    def __init__(self, future=None):
+        self.event = threading.Event() if future is None else None
+        self.future = future
+        self.granted = False
+        self.abandoned = False
+
+    def grant(self):
+        self.granted = True
+        if self.future is None:
+            self.event.set()
+        else:
+            self.future.get_loop().call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionQueue:
+    """
+    At most `capacity` requests hold a slot; others wait in priority order
+    (then arrival order) up to `timeout`. A released slot passes straight to
+    the next waiter. Works for both threads (acquire) and coroutines
+    (acquire_async).
+    """
+
+    def __init__(self, capacity=CONCURRENCY, max_waiting=MAX_WAITING, timeout=TIMEOUT):
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = {INTERACTIVE: 0, BATCH: 0}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        # Moving average of how long a slot is held, for Retry-After
+        self._service_time = 1.0
+
+    def _limit(self, priority):
+        if priority == BATCH:
+            return int(self.max_waiting * BATCH_QUEUE_SHARE)
+        return self.max_waiting
+
+    def _retry_after(self):
+        queued = sum(self.waiting.values())
+        return (queued / max(1, self.capacity) + 1) * self._service_time
+
+    def _enter(self, priority, waiter, shed):
+        """Take a free slot (returns None) or queue `waiter` (returns it); raises Rejected when full"""
+        with self._lock:
+            if self.active < self.capacity and not any(self.waiting.values()):
+                self.active += 1
+                return None
+            if shed and sum(self.waiting.values()) >= self._limit(priority):
+                raise Rejected(503, 'queue_full', self._retry_after())
+            self.waiting[priority] += 1
+            heapq.heappush(self._heap, (priority, next(self._sequence), waiter))
+            metrics.ADMISSION_QUEUE.inc(CLASS_NAMES[priority])
+            return waiter
+
+    def _abandon(self, priority, waiter):
+        """Withdraw a waiter that gave up; returns True if it was granted a slot meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.abandoned = True
+            self.waiting[priority] -= 1
+            metrics.ADMISSION_QUEUE.dec(CLASS_NAMES[priority])
+            return False
+
+    def acquire(self, priority, shed=True):
+        """
+        Block until this thread holds a slot; raises Rejected. With shed=False
+        the request is queued however long the queue is, and waits without
+        a timeout.
+        """
+        waiter = self._enter(priority, _Waiter(), shed)
+        if waiter is None:
+            return
+        if not waiter.event.wait(self.timeout if shed else None) and not self._abandon(priority, waiter):
+            raise Rejected(503, 'timeout', self._retry_after())
+
+    async def acquire_async(self, priority, shed=True):
+        """Wait (without a thread) until this task holds a slot; raises Rejected"""
+        waiter = self._enter(priority, _Waiter(asyncio.get_running_loop().create_future()), shed)
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout if shed else None)
+        except asyncio.TimeoutError:
+            if not self._abandon(priority, waiter):
+                raise Rejected(503, 'timeout', self._retry_after())
+        except asyncio.CancelledError:
+            if self._abandon(priority, waiter):
+                self.release()
+            raise
+
+    def release(self, held=None):
+        """Free a slot, handing it to the next waiter if there is one; `held` is how long it was held"""
+        with self._lock:
+            if held is not None:
+                self._service_time = 0.9 * self._service_time + 0.1 * held
+            while self._heap:
+                priority, _, waiter = heapq.heappop(self._heap)
+                if waiter.abandoned:
+                    continue
+                self.waiting[priority] -= 1
+                metrics.ADMISSION_QUEUE.dec(CLASS_NAMES[priority])
+                waiter.grant()
+                return
+            self.active -= 1
+
+
+class Admission:
+    """The per-client and per-endpoint rate limits plus the priority queue"""
+
+    def __init__(self, queue, client_limiter=None, endpoint_limiters=None):
+        self.queue = queue
+        self.client_limiter = client_limiter
+        self.endpoint_limiters = endpoint_limiters or {}
+
+    def check_rates(self, client, endpoint):
+        """Raises Rejected(429) when the client's or the endpoint's bucket is empty"""
+        if self.client_limiter is not None:
+            wait = self.client_limiter.take(client)
+            if wait:
+                raise Rejected(429, 'client_rate', wait)
+        limiter = self.endpoint_limiters.get(endpoint)
+        if limiter is not None:
+            wait = limiter.take(endpoint)
+            if wait:
+                raise Rejected(429, 'endpoint_rate', wait)
+
+    def _admit(self, client, endpoint, internal):
+        """
+        Rate checks for a request; returns the queue priority when it also needs
+        a slot. Internal job dispatches skip the rate limits (the job submission
+        was already counted) and queue as batch work without being shed.
+        """
+        try:
+            if not internal:
+                self.check_rates(client, endpoint)
+        except Rejected as e:
+            metrics.ADMISSION_REJECTIONS.inc(endpoint, e.reason)
+            raise
+        if endpoint not in INTERACTIVE_ENDPOINTS + BATCH_ENDPOINTS:
+            return None
+        return BATCH if internal else endpoint_class(endpoint)
+
+    def admit(self, client, endpoint, internal=False):
+        """
+        Admit a request to `endpoint`; returns True when it holds a queue slot,
+        which must be given back with release(). Raises Rejected.
+        """
+        priority = self._admit(client, endpoint, internal)
+        if priority is None:
+            return False
+        try:
+            self.queue.acquire(priority, shed=not internal)
+        except Rejected as e:
+            metrics.ADMISSION_REJECTIONS.inc(endpoint, e.reason)
+            raise
+        return True
+
+    async def admit_async(self, client, endpoint, internal=False):
+        priority = self._admit(client, endpoint, internal)
+        if priority is None:
+            return False
+        try:
+            await self.queue.acquire_async(priority, shed=not internal)
+        except Rejected as e:
+            metrics.ADMISSION_REJECTIONS.inc(endpoint, e.reason)
+            raise
+        return True
+
+    def release(self, held):
+        self.queue.release(held)
+
+
+_TRUSTED = parse_networks(TRUSTED_PROXIES)
+
+
+def admission_from_env():
+    """Build admission control from AI_ADMISSION_* / AI_CLIENT_* / AI_ENDPOINT_RATES, or None when disabled"""
+    if not ENABLED:
+        return None
+    endpoint_rates = parse_endpoint_rates(os.getenv('AI_ENDPOINT_RATES'))
+    return Admission(
+        AdmissionQueue(),
+        client_limiter=RateLimiter(CLIENT_RATE, CLIENT_BURST) if CLIENT_RATE > 0 else None,
+        endpoint_limiters={
+            endpoint: RateLimiter(rate, burst) for endpoint, (rate, burst) in endpoint_rates.items() if rate > 0
+        }
+    )
@@ -1,674 +1,266 @@
-import json
-import re
-from flask import Flask, request, jsonify
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, g, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+import admission
+import cancellation
+import codec
+import handlers
+import hooks
+import jobs
+import metrics
+import resilience
+import startup
+import tracing
+from model_client import WARM_UP, create_client
+from sse import markdown_events
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
-
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-# Suppress the warnings about private imports
-import warnings
-warnings.filterwarnings("ignore", module="google.generativeai")
-
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Initialize the Gemini model
-model = genai.GenerativeModel('gemini-2.5-flash')
+app.json = codec.json_provider(DefaultJSONProvider)(app)
+
+# Configure Gemini API; all routes call the model through the client so responses can be cached
+client = create_client()
+admission_control = admission.admission_from_env()
+if WARM_UP:
+    client.start_warm_up()
+
+def perform(step):
+    """Run one step yielded by a handler (see handlers.py) on this thread"""
+    if isinstance(step, handlers.Blocking):
+        return step.run()
+    if isinstance(step, handlers.Generate):
+        return client.generate(
+            step.endpoint, step.prompt, parse=step.parse, use_cache=step.use_cache, structured=step.spec
+        )
+    if handlers.is_plan(step):
+        return run(step)
+    steps = step.steps
+    if len(steps) == 1:
+        try:
+            return [perform(steps[0])]
+        except Exception as e:
+            if not step.return_exceptions:
+                raise
+            return [e]
+    with ThreadPoolExecutor(max_workers=min(len(steps), step.limit)) as pool:
+        futures = [pool.submit(resilience.with_deadline(perform), part) for part in steps]
+        if step.return_exceptions:
+            return [future.exception() or future.result() for future in futures]
+        return [future.result() for future in futures]
+
+def run(plan):
+    """Drive a handler generator to its result, performing each step it yields"""
+    if not handlers.is_plan(plan):
+        return plan
+    value, failure = None, None
+    while True:
+        try:
+            step = plan.send(value) if failure is None else plan.throw(failure)
+        except StopIteration as done:
+            return done.value
+        try:
+            value, failure = perform(step), None
+        except Exception as e:
+            value, failure = None, e
+
+def produce(plan):
+    """The text a Stream's plan yields, performing the steps in between as they come"""
+    value, failure = None, None
+    try:
+        while True:
+            try:
+                item = plan.send(value) if failure is None else plan.throw(failure)
+            except StopIteration:
+                return
+            if isinstance(item, str):
+                value, failure = None, None
+                yield item
+                continue
+            try:
+                value, failure = perform(item), None
+            except Exception as e:
+                value, failure = None, e
+    finally:
+        plan.close()
+
+def stream_markdown(stream):
+    """
+    Stream a markdown generation as SSE `chunk` events followed by a `done` event with its metadata.
+    Markdown that is already complete, or produced by a plan, comes as the stream's `chunks`.
+    """
+    chunks = stream.chunks
+    if chunks is None:
+        chunks, g.cache_status = client.stream(stream.endpoint, stream.prompt, use_cache=not hooks.cache_bypassed(request))
+    elif handlers.is_plan(chunks):
+        chunks = produce(chunks)
+    return Response(
+        stream_with_context(markdown_events(iter(chunks), stream.metadata, route=g.get('metrics_route', 'unmatched'))),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def respond(result):
+    """A Flask response for a handler's (body, status[, headers]) or Stream"""
+    if isinstance(result, handlers.Stream):
+        return stream_markdown(result)
+    body, *rest = result
+    return (jsonify(body), *rest)
+
+def handle(handler, *args):
+    """Serve the current request with `handler` from handlers.py"""
+    call = hooks.call(request, request.get_json(silent=True))
+    result = run(handler(call, *args))
+    g.cache_status, g.cache_similarity = call.cache_status, call.cache_similarity
+    return respond(result)
+
+
+@app.before_request
+def start_request():
+    hooks.start(request, g)
+
+@app.before_request
+def watch_disconnect():
+    """Work for this request stops when its client disconnects (see cancellation.py)"""
+    # Read the body first; unread body bytes on the socket would look like a client still sending
+    request.get_data()
+    g.disconnect_watch = cancellation.begin(request.environ)
+
+@app.before_request
+def admit_request():
+    """Apply rate limits and take a queue slot for POST /api/* routes; rejected requests get 429/503 with Retry-After"""
+    target = hooks.admission_target(request, admission_control)
+    if target is None:
+        return None
+    try:
+        if admission_control.admit(*target, internal=request.environ.get('ai.job', False)):
+            g.admitted_at = time.perf_counter()
+    except admission.Rejected as e:
+        return respond(hooks.rejection(e))
+    return None
+
+@app.before_request
+def decompress_request():
+    encoding = hooks.request_encoding(request)
+    if not encoding:
+        return None
+    # watch_disconnect already read (and cached) the compressed body
+    data, problem = hooks.decompress(encoding, request.get_data())
+    if problem:
+        return respond(problem)
+    request.stream = io.BytesIO(data)
+    request._cached_data = data
+    return None
+
+@app.after_request
+def finish_response(response):
+    g.response_streamed = response.is_streamed
+    if not response.is_streamed and 'Content-Encoding' not in response.headers:
+        data = hooks.encode(request, response, response.get_data())
+        if data is not None:
+            response.set_data(data)
+    hooks.finish_response(g, response, size=None if response.is_streamed else response.content_length)
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    """A client that disconnected is recorded as 499 before the request's trace and metrics are finished"""
+    watch = g.pop('disconnect_watch', None)
+    cancellation.finish()
+    # A disconnect during a streamed response is counted by sse.py as stage "streaming"
+    if watch is not None and watch.disconnected and not g.get('response_streamed'):
+        hooks.disconnected(g)
+    hooks.finish(request, g, admission_control)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/health', methods=['GET'])
+@app.route('/health/live', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up and serving; does not depend on the model"""
     return jsonify({
         'status': 'healthy',
         'message': 'AI Backend is running'
     }), 200
 
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    return respond(handlers.readiness(client))
+
 @app.route('/api/summarize-notes', methods=['POST'])
 def summarize_notes():
-    """
-    Summarize notes and extract important information
-    Expected request body:
-    {
-        "content": "note content here",
-        "title": "note title (optional)"
-    }
-    """
-    try:
-        data = request.get_json()
-        
-        if not data or 'content' not in data:
-            return jsonify({
-                'error': 'Missing required field: content'
-            }), 400
-        
-        note_content = data['content']
-        note_title = data.get('title', 'Untitled Note')
-        
-        if not note_content.strip():
-            return jsonify({
-                'error': 'Note content cannot be empty'
-            }), 400
-        
-        # Create a comprehensive prompt for Gemini
-        prompt = f"""
-You are an educational assistant helping students understand their notes better. 
-Analyze the following notes and provide a comprehensive summary with these sections:
-
-Note Title: {note_title}
-
-Note Content:
-{note_content}
-
-Please provide your response in the following structured format:
-
-## Important Theory
-[Extract and explain the key theoretical concepts, definitions, and foundational knowledge from the notes. Make it clear and easy to understand.]
-
-## Real-World Examples
-[Provide 3-5 practical, real-world examples that demonstrate how these concepts are applied in everyday life or professional scenarios. Be specific and relatable.]
-
-## Key Points
-[List 5-10 most important takeaways, facts, or points that students must remember. Use bullet points for clarity.]
-
-## Study Tips
-[Provide 2-3 actionable study tips or memory techniques to help students retain this information better.]
-
-Make your response educational, engaging, and easy to understand for students.
-"""
-        
-        # Generate content using Gemini
-        response = model.generate_content(prompt)
-        
-        if not response or not response.text:
-            return jsonify({
-                'error': 'Failed to generate summary from AI'
-            }), 500
-        
-        # Parse the response to extract sections
-        summary_text = response.text
-        
-        # Return the structured response
-        return jsonify({
-            'success': True,
-            'summary': summary_text,
-            'note_title': note_title,
-            'timestamp': data.get('timestamp')
-        }), 200
-    
-    except ValueError as ve:
-        return jsonify({
-            'error': f'Invalid input: {str(ve)}'
-        }), 400
-    
-    except Exception as e:
-        print(f"Error in summarize_notes: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred while processing your request: {str(e)}'
-        }), 500
+    return handle(handlers.summarize_notes)
 
 @app.route('/api/explain-concept', methods=['POST'])
 def explain_concept():
-    """
-    Explain a specific concept from notes
-    Expected request body:
-    {
-        "concept": "concept to explain",
-        "context": "surrounding context (optional)"
-    }
-    """
-    try:
-        data = request.get_json()
-        
-        if not data or 'concept' not in data:
-            return jsonify({
-                'error': 'Missing required field: concept'
-            }), 400
-        
-        concept = data['concept']
-        context = data.get('context', '')
-        
-        prompt = f"""
-Explain the following concept in a simple, student-friendly way:
-
-Concept: {concept}
-
-{"Context: " + context if context else ""}
-
-Provide:
-1. A clear definition
-2. Why it's important
-3. A simple example
-4. Common misconceptions (if any)
-
-Keep the explanation concise but thorough.
-"""
-        
-        response = model.generate_content(prompt)
-        
-        return jsonify({
-            'success': True,
-            'explanation': response.text,
-            'concept': concept
-        }), 200
-    
-    except Exception as e:
-        print(f"Error in explain_concept: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred: {str(e)}'
-        }), 500
+    return handle(handlers.explain_concept)
 
 @app.route('/api/generate-quiz', methods=['POST'])
 def generate_quiz():
-    """
-    Generate quiz questions from notes
-    Expected request body:
-    {
-        "content": "note content",
-        "num_questions": 5
-    }
-    """
-    try:
-        data = request.get_json()
-        
-        if not data or 'content' not in data:
-            return jsonify({
-                'error': 'Missing required field: content'
-            }), 400
-        
-        content = data['content']
-        num_questions = data.get('num_questions', 5)
-        
-        prompt = f"""
-Based on the following notes, generate {num_questions} multiple-choice quiz questions to test understanding:
-
-{content}
-
-Provide the response in EXACT JSON format with this structure:
-{{
-  "questions": [
-    {{
-      "id": 1,
-      "question": "The question text here",
-      "options": [
-        "Option A",
-        "Option B", 
-        "Option C",
-        "Option D"
-      ],
-      "correct_answer": "Option A",
-      "explanation": "Explanation of why this is correct"
-    }}
-  ]
-}}
-
-Requirements:
-1. Generate EXACTLY {num_questions} questions
-2. Each question MUST have exactly 4 options (A, B, C, D)
-3. The correct_answer field MUST match exactly one of the options
-4. Provide a clear explanation for each answer
-5. Return ONLY valid JSON, no markdown formatting or additional text
-6. Make questions educational and thought-provoking
-"""
-        
-        response = model.generate_content(prompt)
-        result_text = response.text.strip() if response.text else ""
-        
-        # Clean the response to extract JSON
-        if '```json' in result_text:
-            result_text = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            result_text = result_text.split('```')[1].split('```')[0].strip()
-        
-        quiz_data = json.loads(result_text)
-        
-        return jsonify({
-            'success': True,
-            'quiz': quiz_data,
-            'num_questions': num_questions
-        }), 200
-    
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {str(e)}")
-        print(f"Response text: {result_text}")
-        return jsonify({
-            'error': 'Failed to parse AI response',
-            'details': str(e)
-        }), 500
-    
-    except Exception as e:
-        print(f"Error in generate_quiz: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred: {str(e)}'
-        }), 500
+    return handle(handlers.generate_quiz)
 
 @app.route('/api/generate-session-notes', methods=['POST'])
 def generate_session_notes():
-    """
-    Generate comprehensive notes from study session details
-    Expected request body:
-    {
-        "title": "Session title",
-        "subject": "Subject name",
-        "description": "Session description"
-    }
-    """
-    try:
-        data = request.get_json()
-        
-        if not data or 'title' not in data or 'subject' not in data:
-            return jsonify({
-                'error': 'Missing required fields: title and subject'
-            }), 400
-        
-        title = data['title']
-        subject = data['subject']
-        description = data.get('description', '')
-        
-        prompt = f"""
-You are an educational assistant helping students by creating comprehensive, reference-supported study notes.
-
-Based on the following study session information, create detailed, well-structured notes that students can use for learning and revision:
-
-Session Title: {title}
-Subject: {subject}
-Session Description: {description}
-
-Please generate comprehensive notes with the following structure:
-
-# {title}
-
-## Overview
-[Provide a brief introduction to the topic and its importance]
-
-## Key Concepts
-[List and explain the main concepts, theories, and principles related to this topic]
-
-## Detailed Explanation
-[Provide in-depth explanation of the topic with clear subsections]
-
-## Important Definitions
-[List important terms and their definitions]
-
-## Real-World Applications
-[Explain how this topic is applied in real-world scenarios with examples]
-
-## Common Misconceptions
-[Address common misunderstandings students might have]
-
-## Study Tips
-[Provide tips for understanding and remembering this material]
-
-## Practice Questions
-[Suggest 3-5 questions students should be able to answer after studying this material]
-
-## Reference Links
-List 5–8 trusted, **clickable reference links** that students can use for further learning.
-
-Each resource should be written in **Markdown link format**:
-[Resource Title](https://example.com) – with a short description (1–2 lines) explaining what the link offers.
-
-Include a mix of:
-- Official documentation or reference sites (e.g., Oracle, IEEE, W3C, etc.)
-- Educational websites (.edu, .org, or high-quality learning platforms)
-- Online tutorials or blogs
-- Recommended books (include purchase or preview links if available)
-- Coding practice or interactive learning platforms
-
-⚠️ Make sure all links:
-- Are **specific and direct** (not homepages or search result pages)
-- Open educational content relevant to the topic
-- Are **clickable** in Markdown format
-
-Make the notes clear, educational, well-organized, and suitable for student learning.
-Ensure all reference links are live and clickable.
-"""
-  
-        response = model.generate_content(prompt)
-        
-        if not response or not response.text:
-            return jsonify({
-                'error': 'Failed to generate notes from AI'
-            }), 500
-        
-        return jsonify({
-            'success': True,
-            'content': response.text,
-            'title': title,
-            'subject': subject
-        }), 200
-    
-    except Exception as e:
-        print(f"Error in generate_session_notes: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred while generating notes: {str(e)}'
-        }), 500
+    return handle(handlers.generate_session_notes)
 
 @app.route('/api/generate-session-assessment', methods=['POST'])
 def generate_session_assessment():
-    """
-    Generate assessment questions from study session details
-    Expected request body:
-    {
-        "title": "Session title",
-        "subject": "Subject name", 
-        "description": "Session description",
-        "num_questions": 5
-    }
-    """
-    try:
-        data = request.get_json()
-        
-        if not data or 'title' not in data or 'subject' not in data:
-            return jsonify({
-                'error': 'Missing required fields: title and subject'
-            }), 400
-        
-        title = data['title']
-        subject = data['subject']
-        description = data.get('description', '')
-        num_questions = data.get('num_questions', 5)
-        
-        prompt = f"""
-You are an educational assessment expert. Based on the following study session information, create {num_questions} high-quality multiple-choice questions to evaluate student understanding.
-
-Session Title: {title}
-Subject: {subject}
-Session Description: {description}
-
-Provide the assessment in EXACT JSON format with this structure:
-{{
-  "assessment": {{
-    "title": "{title}",
-    "subject": "{subject}",
-    "questions": [
-      {{
-        "id": 1,
-        "question": "The question text here",
-        "options": [
-          "Option A",
-          "Option B", 
-          "Option C",
-          "Option D"
-        ],
-        "correct_answer": "Option A",
-        "explanation": "Explanation of why this is correct"
-      }}
-    ]
-  }}
-}}
-
-Requirements:
-1. Generate EXACTLY {num_questions} questions
-2. Each question MUST have exactly 4 options
-3. The correct_answer field MUST match exactly one of the options
-4. Provide a clear, educational explanation for each answer
-5. Return ONLY valid JSON, no markdown formatting or additional text
-6. Make questions challenging but fair, testing true understanding
-7. Cover different aspects of the topic described
-"""
-        
-        response = model.generate_content(prompt)
-        result_text = response.text.strip() if response.text else ""
-        
-        # Clean the response to extract JSON
-        if '```json' in result_text:
-            result_text = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            result_text = result_text.split('```')[1].split('```')[0].strip()
-        
-        assessment_data = json.loads(result_text)
-        
-        return jsonify({
-            'success': True,
-            'assessment': assessment_data['assessment']
-        }), 200
-    
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {str(e)}")
-        print(f"Response text: {result_text}")
-        return jsonify({
-            'error': 'Failed to parse AI response',
-            'details': str(e)
-        }), 500
-    
-    except Exception as e:
-        print(f"Error in generate_session_assessment: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred: {str(e)}'
-        }), 500
+    return handle(handlers.generate_session_assessment)
+
+@app.route('/api/complete-session', methods=['POST'])
+def complete_session():
+    return handle(handlers.complete_session)
 
 @app.route('/api/generate-interview-questions', methods=['POST'])
 def generate_interview_questions():
-    """
-    Generate interview questions based on resume and job role
-    Expected request body:
-    {
-        "resume": "Resume text",
-        "jobRole": "Job role/position"
-    }
-    """
-    result_text = ""  # Initialize at the beginning
-    try:
-        data = request.get_json()
-        
-        if not data or 'resume' not in data or 'jobRole' not in data:
-            return jsonify({
-                'error': 'Missing required fields: resume and jobRole'
-            }), 400
-        
-        resume = data['resume']
-        job_role = data['jobRole']
-        
-        prompt = f"""Based on the following resume and job role, generate exactly 10 interview questions.
-The questions should be relevant to the candidate's experience and the target role.
-Mix technical, behavioral, and situational questions.
-
-Job Role: {job_role}
-
-Resume:
-{resume}
-
-Generate 10 questions in JSON format with this exact structure:
-{{
-  "questions": [
-    {{
-      "id": 1,
-      "question": "Question text here",
-      "type": "technical",
-      "expectedPoints": ["key point 1", "key point 2", "key point 3"]
-    }},
-    {{
-      "id": 2,
-      "question": "Question text here",
-      "type": "behavioral",
-      "expectedPoints": ["key point 1", "key point 2"]
-    }}
-  ]
-}}
-
-Types should be one of: "technical", "behavioral", or "situational"
-Return ONLY valid JSON, no additional text or markdown."""
-
-        response = model.generate_content(prompt)
-        if response and response.text:
-            result_text = response.text.strip()
-        
-        # Clean the response to extract JSON
-        if '```json' in result_text:
-            result_text = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            result_text = result_text.split('```')[1].split('```')[0].strip()
-        
-        questions_data = json.loads(result_text)
-        
-        return jsonify(questions_data), 200
-    
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {str(e)}")
-        print(f"Response text: {result_text}")
-        return jsonify({
-            'error': 'Failed to parse AI response',
-            'details': str(e)
-        }), 500
-    
-    except Exception as e:
-        print(f"Error in generate_interview_questions: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred: {str(e)}'
-        }), 500
+    return handle(handlers.generate_interview_questions)
 
 @app.route('/api/evaluate-answer', methods=['POST'])
 def evaluate_answer():
-    """
-    Evaluate an interview answer
-    Expected request body:
-    {
-        "question": "Interview question",
-        "answer": "Candidate's answer",
-        "expectedPoints": ["point1", "point2"],
-        "jobRole": "Job role"
-    }
-    """
-    result_text = ""  # Initialize at the beginning
-    try:
-        data = request.get_json()
-        
-        if not data or 'question' not in data or 'answer' not in data:
-            return jsonify({
-                'error': 'Missing required fields: question and answer'
-            }), 400
-        
-        question = data['question']
-        answer = data['answer']
-        expected_points = data.get('expectedPoints', [])
-        job_role = data.get('jobRole', '')
-        
-        prompt = f"""Evaluate the following interview answer for the job role: {job_role}
-
-Question: {question}
-
-Expected Key Points: {', '.join(expected_points)}
-
-Candidate's Answer: {answer}
-
-Provide an evaluation in JSON format with this exact structure:
-{{
-  "score": 8,
-  "strengths": ["strength 1", "strength 2"],
-  "improvements": ["improvement 1", "improvement 2"],
-  "feedback": "Overall feedback paragraph explaining the score and key observations"
-}}
-
-Score should be 0-10 based on:
-- Relevance and completeness of answer
-- Clarity of communication
-- Coverage of expected key points
-- Specific examples or details provided
-
-Return ONLY valid JSON, no additional text or markdown."""
-
-        response = model.generate_content(prompt)
-        if response and response.text:
-            result_text = response.text.strip()
-        
-        # Clean the response to extract JSON
-        if '```json' in result_text:
-            result_text = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            result_text = result_text.split('```')[1].split('```')[0].strip()
-        
-        evaluation_data = json.loads(result_text)
-        
-        return jsonify(evaluation_data), 200
-    
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {str(e)}")
-        print(f"Response text: {result_text}")
-        return jsonify({
-            'error': 'Failed to parse AI response',
-            'details': str(e)
-        }), 500
-    
-    except Exception as e:
-        print(f"Error in evaluate_answer: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred: {str(e)}'
-        }), 500
+    return handle(handlers.evaluate_answer)
+
+@app.route('/api/evaluate-answers', methods=['POST'])
+def evaluate_answers():
+    return handle(handlers.evaluate_answers)
 
 @app.route('/api/generate-learning-path', methods=['POST'])
 def generate_learning_path():
-    """
-    Generate a personalized learning path
-    Expected request body:
-    {
-        "topic": "topic to learn",
-        "skillLevel": "beginner|intermediate|advanced",
-        "duration": "duration in weeks",
-        "goal": "learning goal"
-    }
-    """
-    try:
-        data = request.get_json()
-        
-        if not data or 'topic' not in data:
-            return jsonify({
-                'error': 'Missing required field: topic'
-            }), 400
-        
-        topic = data['topic']
-        level = data.get('skillLevel', 'beginner')
-        duration = data.get('duration', '4 weeks')
-        goal = data.get('goal', 'Master this topic')
-        
-        prompt = f"""You are an educational expert helping students create effective learning paths.
-Create a detailed, structured learning path for the following:
-
-Topic: {topic}
-Skill Level: {level}
-Duration: {duration}
-Goal: {goal}
-
-Make sure the learning path is:
-- Logical and progressive (from fundamentals to mastery)
-- Action-oriented (learn by doing)
-- Realistic for the given duration
-- Clear, structured, and visually easy to follow
-
-Provide your response in Markdown format with proper headings and structure.
-"""
-        
-        response = model.generate_content(prompt)
-        
-        if not response or not response.text:
-            return jsonify({
-                'error': 'Failed to generate learning path from AI'
-            }), 500
-        
-        return jsonify({
-            'success': True,
-            'content': response.text,
-            'topic': topic,
-            'level': level,
-            'duration': duration,
-            'goal': goal
-        }), 200
-    
-    except Exception as e:
-        print(f"Error in generate_learning_path: {str(e)}")
-        return jsonify({
-            'error': f'An error occurred while generating learning path: {str(e)}'
-        }), 500
+    return handle(handlers.generate_learning_path)
+
+def run_job(endpoint, payload, request_id=None):
+    """Run a job by dispatching its route internally, under the submitting request's ID; returns (status_code, body)"""
+    with app.test_request_context(
+        f'/api/{endpoint}', method='POST', json=payload, environ_base={'ai.job': True},
+        headers={tracing.REQUEST_ID_HEADER: request_id} if request_id else None
+    ):
+        response = app.full_dispatch_request()
+        return response.status_code, response.get_json()
+
+job_queue = jobs.queue_from_env(run_job)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    return handle(handlers.submit_job, job_queue, tracing.current_request_id())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    return respond(run(handlers.job_status(job_queue, job_id)))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    return respond(run(handlers.job_result(job_queue, job_id)))
+
+startup.mark('app_loaded')
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5001))
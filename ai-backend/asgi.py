@@ -0,0 +1,292 @@
+"""
+Asyncio (ASGI) serving mode for the AI backend.
+
+Serves the same routes and JSON contracts as app.py, but every request is a
+coroutine: while a request waits on Gemini it holds no thread, so one process
+can keep hundreds of requests in flight. Upstream calls are capped by a global
+semaphore (AI_MAX_UPSTREAM) and optional per-endpoint semaphores
+(AI_ENDPOINT_LIMITS). Blocking local work the handlers yield (the SQLite
+stores, the similarity index) runs with asyncio.to_thread, and the request
+hooks are shared with app.py through hooks.py.
+
+Run with:
+    hypercorn asgi:app --bind 0.0.0.0:5001
+"""
+import asyncio
+import time
+import os
+from quart import Quart, request, jsonify, g, Response
+from quart.wrappers.response import DataBody
+from quart.json.provider import DefaultJSONProvider
+from quart_cors import cors
+from dotenv import load_dotenv
+import admission
+import codec
+import handlers
+import hooks
+import jobs
+import metrics
+import startup
+import tracing
+from model_client import WARM_UP, create_client
+from sse import markdown_events_async
+
+# Load environment variables
+load_dotenv()
+
+app = cors(Quart(__name__), allow_origin='*')  # Enable CORS for all routes
+app.json = codec.json_provider(DefaultJSONProvider)(app)
+
+client = create_client()
+admission_control = admission.admission_from_env()
+
+async def perform(step):
+    """Run one step yielded by a handler (see handlers.py) on the event loop"""
+    if isinstance(step, handlers.Blocking):
+        return await asyncio.to_thread(step.run)
+    if isinstance(step, handlers.Generate):
+        return await client.generate_async(
+            step.endpoint, step.prompt, parse=step.parse, use_cache=step.use_cache, structured=step.spec
+        )
+    if handlers.is_plan(step):
+        return await run(step)
+    parallel = asyncio.Semaphore(step.limit)
+    
+    async def limited(part):
+        async with parallel:
+            return await perform(part)
+    
+    return await asyncio.gather(*(limited(part) for part in step.steps), return_exceptions=step.return_exceptions)
+
+async def run(plan):
+    """Drive a handler generator to its result, awaiting each step it yields"""
+    if not handlers.is_plan(plan):
+        return plan
+    value, failure = None, None
+    while True:
+        try:
+            step = plan.send(value) if failure is None else plan.throw(failure)
+        except StopIteration as done:
+            return done.value
+        try:
+            value, failure = await perform(step), None
+        except Exception as e:
+            value, failure = None, e
+
+async def finished_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+async def produce(plan):
+    """The text a Stream's plan yields, awaiting the steps in between as they come"""
+    value, failure = None, None
+    try:
+        while True:
+            try:
+                item = plan.send(value) if failure is None else plan.throw(failure)
+            except StopIteration:
+                return
+            if isinstance(item, str):
+                value, failure = None, None
+                yield item
+                continue
+            try:
+                value, failure = await perform(item), None
+            except Exception as e:
+                value, failure = None, e
+    finally:
+        plan.close()
+
+def stream_markdown(stream):
+    """
+    Stream a markdown generation as SSE `chunk` events followed by a `done` event with its metadata.
+    Markdown that is already complete, or produced by a plan, comes as the stream's `chunks`.
+    """
+    if stream.chunks is None:
+        chunks, g.cache_status = client.stream_async(stream.endpoint, stream.prompt, use_cache=not hooks.cache_bypassed(request))
+    elif handlers.is_plan(stream.chunks):
+        chunks = produce(stream.chunks)
+    else:
+        chunks = finished_chunks(stream.chunks)
+    response = Response(
+        markdown_events_async(chunks, stream.metadata, route=g.get('metrics_route', 'unmatched')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.timeout = None
+    return response
+
+def respond(result):
+    """A Quart response for a handler's (body, status[, headers]) or Stream"""
+    if isinstance(result, handlers.Stream):
+        return stream_markdown(result)
+    body, *rest = result
+    return (jsonify(body), *rest)
+
+async def handle(handler, *args):
+    """Serve the current request with `handler` from handlers.py"""
+    call = hooks.call(request, await request.get_json(silent=True))
+    result = await run(handler(call, *args))
+    g.cache_status, g.cache_similarity = call.cache_status, call.cache_similarity
+    return respond(result)
+
+
+@app.before_request
+async def start_request():
+    hooks.start(request, g)
+
+@app.before_request
+async def admit_request():
+    """Apply rate limits and take a queue slot for POST /api/* routes; rejected requests get 429/503 with Retry-After"""
+    target = hooks.admission_target(request, admission_control)
+    if target is None:
+        return None
+    try:
+        if await admission_control.admit_async(*target, internal=request.scope.get('ai.job', False)):
+            g.admitted_at = time.perf_counter()
+    except admission.Rejected as e:
+        return respond(hooks.rejection(e))
+    return None
+
+@app.before_request
+async def decompress_request():
+    encoding = hooks.request_encoding(request)
+    if not encoding:
+        return None
+    data, problem = hooks.decompress(encoding, await request.get_data())
+    if problem:
+        return respond(problem)
+    body = request.body_class(None, None)
+    body.append(data)
+    body.set_complete()
+    request.body = body
+    return None
+
+@app.after_request
+async def finish_response(response):
+    buffered = isinstance(response.response, DataBody)
+    if buffered and 'Content-Encoding' not in response.headers:
+        data = hooks.encode(request, response, await response.get_data())
+        if data is not None:
+            response.set_data(data)
+    hooks.finish_response(g, response, size=response.content_length if buffered else None)
+    return response
+
+@app.teardown_request
+async def finish_request(exc):
+    """
+    Quart cancels the handler of a request whose client disconnects; the cancellation
+    also stops its upstream calls, and 499 is what gets recorded.
+    """
+    if isinstance(exc, asyncio.CancelledError):
+        hooks.disconnected(g)
+    hooks.finish(request, g, admission_control)
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/health', methods=['GET'])
+@app.route('/health/live', methods=['GET'])
+async def health_check():
+    """Liveness: the process is up and serving; does not depend on the model"""
+    return jsonify({
+        'status': 'healthy',
+        'message': 'AI Backend is running'
+    }), 200
+
+@app.route('/health/ready', methods=['GET'])
+async def readiness_check():
+    return respond(handlers.readiness(client))
+
+@app.route('/api/summarize-notes', methods=['POST'])
+async def summarize_notes():
+    return await handle(handlers.summarize_notes)
+
+@app.route('/api/explain-concept', methods=['POST'])
+async def explain_concept():
+    return await handle(handlers.explain_concept)
+
+@app.route('/api/generate-quiz', methods=['POST'])
+async def generate_quiz():
+    return await handle(handlers.generate_quiz)
+
+@app.route('/api/generate-session-notes', methods=['POST'])
+async def generate_session_notes():
+    return await handle(handlers.generate_session_notes)
+
+@app.route('/api/generate-session-assessment', methods=['POST'])
+async def generate_session_assessment():
+    return await handle(handlers.generate_session_assessment)
+
+@app.route('/api/complete-session', methods=['POST'])
+async def complete_session():
+    return await handle(handlers.complete_session)
+
+@app.route('/api/generate-interview-questions', methods=['POST'])
+async def generate_interview_questions():
+    return await handle(handlers.generate_interview_questions)
+
+@app.route('/api/evaluate-answer', methods=['POST'])
+async def evaluate_answer():
+    return await handle(handlers.evaluate_answer)
+
+@app.route('/api/evaluate-answers', methods=['POST'])
+async def evaluate_answers():
+    return await handle(handlers.evaluate_answers)
+
+@app.route('/api/generate-learning-path', methods=['POST'])
+async def generate_learning_path():
+    return await handle(handlers.generate_learning_path)
+
+job_loop = None
+
+@app.before_serving
+async def capture_job_loop():
+    global job_loop
+    job_loop = asyncio.get_running_loop()
+
+@app.before_serving
+async def start_warm_up():
+    startup.mark('serving')
+    if WARM_UP:
+        client.start_warm_up()
+
+async def dispatch_job(endpoint, payload, request_id):
+    async with app.test_request_context(
+        f'/api/{endpoint}', method='POST', json=payload, scope_base={'ai.job': True},
+        headers={tracing.REQUEST_ID_HEADER: request_id} if request_id else None
+    ):
+        response = await app.full_dispatch_request()
+        return response.status_code, await response.get_json()
+
+def run_job(endpoint, payload, request_id=None):
+    """
+    Run a job by dispatching its route internally, under the submitting
+    request's ID; returns (status_code, body). Called from a job worker
+    thread, so the route runs on the server's event loop.
+    """
+    return asyncio.run_coroutine_threadsafe(dispatch_job(endpoint, payload, request_id), job_loop).result()
+
+job_queue = jobs.queue_from_env(run_job)
+
+@app.route('/api/jobs', methods=['POST'])
+async def submit_job():
+    return await handle(handlers.submit_job, job_queue, tracing.current_request_id())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+async def job_status(job_id):
+    return respond(await run(handlers.job_status(job_queue, job_id)))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+async def job_result(job_id):
+    return respond(await run(handlers.job_result(job_queue, job_id)))
+
+startup.mark('app_loaded')
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5001))
+    
+    print(f"Starting async AI Backend on port {port}...")
+    app.run(host='0.0.0.0', port=port)
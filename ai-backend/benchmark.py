@@ -0,0 +1,358 @@
+"""
+Load test for the AI backend.
+
+Drives every route at a configurable concurrency and reports, per endpoint,
+p50/p95/p99 latency, requests per second, error count and the server's peak
+resident memory. With --spawn the server is started locally on the stub
+model backend (AI_MODEL_BACKEND=stub), so no Gemini quota is spent.
+
+Examples:
+    python benchmark.py --spawn --concurrency 32 --requests 300
+    python benchmark.py --spawn --server asgi --stub-latency lognormal:0.8:0.5
+    python benchmark.py --url http://localhost:5001 --pid 12345 --endpoints explain-concept
+    python benchmark.py --spawn --save baseline.json
+    python benchmark.py --spawn --compare baseline.json --max-regression 0.2
+    python benchmark.py --server prefork --cold-start 10
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _payloads(i):
+    """Request bodies per endpoint; `i` varies the input so cached responses are not reused"""
+    return {
+        'summarize-notes': {
+            'title': f'Photosynthesis {i}',
+            'content': f'Notes #{i}\n\nPhotosynthesis converts light energy into chemical energy. ' * 20
+        },
+        'explain-concept': {'concept': f'Big O notation ({i})', 'context': 'Algorithms course'},
+        'generate-quiz': {'content': f'Quiz source #{i}: cell biology, mitochondria, ATP.', 'num_questions': 5},
+        'generate-session-notes': {
+            'title': f'Binary Trees {i}', 'subject': 'Computer Science', 'description': 'Traversals and balancing'
+        },
+        'generate-session-assessment': {
+            'title': f'Binary Trees {i}', 'subject': 'Computer Science', 'description': 'Traversals', 'num_questions': 5
+        },
+        'generate-interview-questions': {
+            'resume': f'Candidate {i}. Five years of Python, Flask and PostgreSQL. Led a team of four.',
+            'jobRole': 'Backend Engineer'
+        },
+        'evaluate-answer': {
+            'question': 'Describe a time you fixed a production incident.',
+            'answer': f'Answer {i}: I rolled back the release and added an alert.',
+            'expectedPoints': ['situation', 'action', 'result'],
+            'jobRole': 'Backend Engineer'
+        },
+        'evaluate-answers': {
+            'jobRole': 'Backend Engineer',
+            'answers': [{
+                'question': f'Question {n}?',
+                'answer': f'Answer {i}.{n}',
+                'expectedPoints': ['point']
+            } for n in range(10)]
+        },
+        'generate-learning-path': {
+            'topic': f'Rust {i}', 'skillLevel': 'beginner', 'duration': '4 weeks', 'goal': 'Build a CLI tool'
+        },
+    }
+
+
+ENDPOINTS = list(_payloads(0))
+STREAMING_ENDPOINTS = ['summarize-notes', 'generate-session-notes', 'generate-learning-path']
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def read_rss_mb(pid):
+    """Resident set size of a process in MB (Linux /proc only)"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler(threading.Thread):
+    """Samples the server's RSS in the background and keeps the peak"""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = read_rss_mb(self.pid)
+            if rss is not None:
+                self.peak = rss if self.peak is None else max(self.peak, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def send(url, body, stream, timeout):
+    """POST one request; returns (status, total_seconds, first_byte_seconds)"""
+    data = json.dumps(body).encode('utf-8')
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            status = resp.status
+            if stream:
+                first = resp.read(1)
+                first_byte = time.perf_counter() - start
+                # A streamed request only succeeded if it ended with a `done` event
+                if b'event: error' in first + resp.read():
+                    status = 502
+            else:
+                resp.read()
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start, first_byte
+
+
+def run_endpoint(base_url, endpoint, stream, concurrency, requests, offset, repeat, timeout, pid):
+    url = f'{base_url}/api/{endpoint}' + ('?stream=1' if stream else '')
+    sampler = MemorySampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda i: send(url, _payloads(offset + (0 if repeat else i))[endpoint], stream, timeout),
+            range(requests)
+        ))
+    elapsed = time.perf_counter() - started
+    peak_rss = sampler.stop() if sampler else None
+
+    latencies = [r[1] for r in results if 200 <= r[0] < 300]
+    first_bytes = [r[2] for r in results if r[2] is not None and 200 <= r[0] < 300]
+    ms = lambda v: None if v is None else round(v * 1000, 1)
+    return {
+        'endpoint': endpoint + (' (stream)' if stream else ''),
+        'requests': requests,
+        'errors': sum(1 for r in results if not 200 <= r[0] < 300),
+        'rps': round(requests / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'ttfb_p50_ms': ms(percentile(first_bytes, 50)),
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port):
+    if server == 'asgi':
+        return [sys.executable, '-m', 'hypercorn', 'asgi:app', '--bind', f'127.0.0.1:{port}']
+    if server == 'prefork':
+        return [sys.executable, 'serve.py']
+    return [sys.executable, 'app.py']
+
+
+def start_process(server, port, env_overrides):
+    env = dict(os.environ, PORT=str(port), AI_BIND=f'127.0.0.1:{port}', **env_overrides)
+    return subprocess.Popen(
+        server_command(server, port), cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def spawn_server(server, port, env_overrides):
+    cmd = server_command(server, port)
+    proc = start_process(server, port, env_overrides)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'Server exited during startup: {" ".join(cmd)}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1).read()
+            return proc
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError('Server did not become healthy within 30s')
+
+
+def _poll(url, proc, deadline):
+    """Seconds until `url` answers 200, or None if the server exited or the deadline passed"""
+    start = time.perf_counter()
+    while time.perf_counter() < deadline and proc.poll() is None:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                return time.perf_counter() - start, json.loads(resp.read() or b'null')
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.005)
+    return None, None
+
+
+def measure_cold_start(server, runs, env_overrides, timeout=60):
+    """Start the server `runs` times; time to liveness (/health/live) and readiness (/health/ready)"""
+    live, ready, phases = [], [], None
+    for _ in range(runs):
+        port = free_port()
+        start = time.perf_counter()
+        proc = start_process(server, port, env_overrides)
+        try:
+            deadline = start + timeout
+            elapsed, _ = _poll(f'http://127.0.0.1:{port}/health/live', proc, deadline)
+            if elapsed is None:
+                raise RuntimeError(f'Server did not become live within {timeout}s')
+            live.append((time.perf_counter() - start) * 1000)
+            elapsed, body = _poll(f'http://127.0.0.1:{port}/health/ready', proc, deadline)
+            if elapsed is None:
+                raise RuntimeError(f'Server did not become ready within {timeout}s')
+            ready.append((time.perf_counter() - start) * 1000)
+            phases = body.get('startup')
+        finally:
+            proc.terminate()
+            proc.wait()
+    return {
+        'server': server,
+        'runs': runs,
+        'live_p50_ms': round(percentile(live, 50), 1),
+        'live_max_ms': round(max(live), 1),
+        'ready_p50_ms': round(percentile(ready, 50), 1),
+        'ready_max_ms': round(max(ready), 1),
+        'startup_phases_s': phases,
+    }
+
+
+def print_table(rows):
+    columns = ['endpoint', 'requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'ttfb_p50_ms', 'peak_rss_mb']
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print('  '.join(str('-' if row[c] is None else row[c]).ljust(widths[c]) for c in columns))
+
+
+def compare(rows, baseline_path, max_regression):
+    """Report endpoints whose p95 or RPS got worse than the baseline by more than max_regression"""
+    with open(baseline_path) as f:
+        baseline = {row['endpoint']: row for row in json.load(f)['results']}
+    regressions = []
+    for row in rows:
+        base = baseline.get(row['endpoint'])
+        if not base:
+            continue
+        if base['p95_ms'] and row['p95_ms'] and row['p95_ms'] > base['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{row['endpoint']}: p95 {base['p95_ms']}ms -> {row['p95_ms']}ms")
+        if base['rps'] and row['rps'] and row['rps'] < base['rps'] * (1 - max_regression):
+            regressions.append(f"{row['endpoint']}: rps {base['rps']} -> {row['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the AI backend routes')
+    parser.add_argument('--url', help='Base URL of a running server (default: spawn one)')
+    parser.add_argument('--pid', type=int, help='PID of the running server, for memory sampling')
+    parser.add_argument('--spawn', action='store_true', help='Start a local server on the stub backend')
+    parser.add_argument('--server', choices=['wsgi', 'asgi', 'prefork'], default='wsgi', help='Server to spawn')
+    parser.add_argument('--workers', type=int, default=2, help='AI_WORKERS for a spawned prefork server')
+    parser.add_argument('--cold-start', type=int, metavar='RUNS',
+                        help='Instead of a load test, start the server RUNS times and time liveness and readiness')
+    parser.add_argument('--backend', default='stub', help='AI_MODEL_BACKEND for the spawned server')
+    parser.add_argument('--stub-latency', default='lognormal:0.5:0.4', help='AI_STUB_LATENCY for the spawned server')
+    parser.add_argument('--stub-failure-rate', default='0', help='AI_STUB_FAILURE_RATE for the spawned server')
+    parser.add_argument('--admission', action='store_true',
+                        help='Keep admission control on in the spawned server (off by default: all load comes from one client)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint')
+    parser.add_argument('--endpoints', default='all', help='Comma-separated endpoints, or "all"')
+    parser.add_argument('--stream', action='store_true', help='Also benchmark the SSE variants')
+    parser.add_argument('--repeat', action='store_true', help='Send identical requests (measures the cache path)')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--save', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON file from --save to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed fractional p95/RPS regression')
+    args = parser.parse_args()
+
+    server_env = {
+        'AI_MODEL_BACKEND': args.backend,
+        'AI_STUB_LATENCY': args.stub_latency,
+        'AI_STUB_FAILURE_RATE': args.stub_failure_rate,
+        'FLASK_ENV': 'production',
+        'AI_ADMISSION': '1' if args.admission else '0',
+        'AI_WORKERS': str(args.workers),
+    }
+
+    if args.cold_start:
+        result = measure_cold_start(args.server, args.cold_start, server_env)
+        print(json.dumps(result, indent=2))
+        return
+
+    endpoints = ENDPOINTS if args.endpoints == 'all' else args.endpoints.split(',')
+    runs = [(e, False) for e in endpoints]
+    if args.stream:
+        runs += [(e, True) for e in endpoints if e in STREAMING_ENDPOINTS]
+
+    proc = None
+    base_url, pid = args.url, args.pid
+    if args.spawn or not base_url:
+        port = free_port()
+        proc = spawn_server(args.server, port, server_env)
+        base_url, pid = f'http://127.0.0.1:{port}', proc.pid
+
+    rows = []
+    try:
+        for n, (endpoint, stream) in enumerate(runs):
+            offset = (n + 1) * 1000000 + int(time.time())
+            rows.append(run_endpoint(
+                base_url, endpoint, stream, args.concurrency, args.requests, offset, args.repeat, args.timeout, pid
+            ))
+            print(f"  {rows[-1]['endpoint']}: done", file=sys.stderr)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    print_table(rows)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'args': vars(args), 'results': rows}, f, indent=2)
+
+    if args.compare:
+        regressions = compare(rows, args.compare, args.max_regression)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
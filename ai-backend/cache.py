@@ -0,0 +1,208 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """
+    Normalize a prompt so that formatting-only differences share a cache entry.
+    Trailing/leading whitespace on each line and runs of blank lines are collapsed.
+    """
+    lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in prompt.strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
+
+
+def make_cache_key(endpoint, model_name, prompt):
+    """Content-addressed key for a (endpoint, model, prompt) triple"""
+    digest = hashlib.sha256()
+    for part in (endpoint, model_name, normalize_prompt(prompt)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL.
+    Entries are evicted least-recently-used first once either the entry
+    count or the total size of the stored values exceeds its limit.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, size = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier shared by every worker process pointing at the same file.
+    Each thread keeps its own connection; WAL mode lets readers and a writer
+    work concurrently across processes.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl=3600, max_rows=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'created_at REAL NOT NULL, expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at)')
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO responses (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)',
+            (key, value, now, expires_at)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM responses WHERE key = ?', (key,))
+
+    def prune(self):
+        """Drop expired rows and trim the table down to max_rows (oldest first)"""
+        conn = self._connection()
+        conn.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),))
+        conn.execute(
+            'DELETE FROM responses WHERE key IN ('
+            'SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_rows,)
+        )
+
+
+class ResponseCache:
+    """
+    Two-tier response cache: an in-process LRU in front of an optional
+    SQLite file. Disk hits are promoted into memory.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        try:
+            value = self.disk.get(key)
+        except sqlite3.Error as e:
+            print(f"Response cache read failed: {str(e)}")
+            return None
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                print(f"Response cache write failed: {str(e)}")
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+
+def cache_from_env():
+    """Build the response cache from AI_CACHE_* environment variables"""
+    ttl = int(os.getenv('AI_CACHE_TTL', 3600))
+    memory = MemoryCache(
+        max_entries=int(os.getenv('AI_CACHE_MAX_ENTRIES', 512)),
+        max_bytes=int(os.getenv('AI_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+        ttl=ttl
+    )
+    disk = None
+    db_path = os.getenv('AI_CACHE_DB')
+    if db_path:
+        disk = SQLiteCache(
+            db_path,
+            ttl=ttl,
+            max_rows=int(os.getenv('AI_CACHE_DB_MAX_ROWS', 10000))
+        )
+    return ResponseCache(memory, disk)
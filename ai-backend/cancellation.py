@@ -0,0 +1,226 @@
+"""
+Stop working for clients that have gone away.
+
+asgi.py: Quart cancels a request's handler when its client disconnects. The
+cancellation reaches the upstream call (a shared single-flight generation is
+only cancelled once its last waiter has gone), and the upstream slot is
+released as the call unwinds.
+
+app.py: WSGI has no disconnect event, so once a request's body has been
+read its connection is registered with one shared watcher thread, which
+waits on all of them with a selector; a connection that turns readable and
+peeks as end-of-file is closed, and its request is marked disconnected. Generations run on the
+request's own thread, so the admission queue keeps counting them: the
+synchronous SDK call cannot be interrupted and finishes (its answer is
+cached), but no retries, repairs or further generations are started for the
+request unless another request shares the generation. A request that is only
+waiting on another request's shared generation stops waiting within
+AI_DISCONNECT_POLL seconds, freeing its thread and admission slot.
+
+On both servers a streamed response that is closed early stops reading the
+upstream stream, and the partial text is not cached.
+
+Counted in ai_client_disconnects_total{route, stage} and
+ai_upstream_cancelled_total{endpoint, kind}.
+"""
+import contextlib
+import contextvars
+import os
+import selectors
+import socket
+import threading
+
+import metrics
+
+ENABLED = os.getenv('AI_CANCEL_ON_DISCONNECT', '1') not in ('0', 'false')
+
+# Seconds between disconnect checks while a WSGI request waits on a shared generation
+POLL_INTERVAL = float(os.getenv('AI_DISCONNECT_POLL', 0.25))
+
+# Where WSGI servers expose the client connection
+SOCKET_KEYS = ('werkzeug.socket', 'gunicorn.socket')
+
+# Exceptions (by class name) that mean the caller went away, not that upstream failed
+CANCELLATIONS = ('CancelledError', 'GeneratorExit', 'ClientDisconnected')
+
+_watch = contextvars.ContextVar('ai_disconnect_watch', default=None)
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready"""
+
+
+def is_cancellation(error):
+    return type(error).__name__ in CANCELLATIONS
+
+
+class SocketWatch:
+    """Disconnect detection for one WSGI request; once disconnected, always disconnected"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.gone = threading.Event()
+
+    @property
+    def disconnected(self):
+        return self.gone.is_set()
+
+    def poll(self):
+        return self.gone.is_set()
+
+    def readable(self):
+        """Called when the connection turns readable; returns whether it still needs watching"""
+        try:
+            data = self.sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except (BlockingIOError, InterruptedError):
+            # Nothing to read after all: the connection is open and idle
+            return True
+        except ValueError:
+            # TLS sockets do not support peeking; treat the client as present
+            return False
+        except OSError:
+            data = b''
+        if data == b'':
+            self.gone.set()
+        # Otherwise the client sent more data (a pipelined request): it is still there
+        return False
+
+
+class Watcher:
+    """One daemon thread watching every registered request connection with a selector"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changes = []
+        self._selector = None
+        self._wakeup = None
+
+    def _start(self):
+        self._selector = selectors.DefaultSelector()
+        reader, self._wakeup = socket.socketpair()
+        reader.setblocking(False)
+        self._wakeup.setblocking(False)
+        self._selector.register(reader, selectors.EVENT_READ)
+        threading.Thread(target=self._run, name='disconnect-watcher', daemon=True).start()
+
+    def add(self, watch):
+        self._change(True, watch)
+
+    def remove(self, watch):
+        self._change(False, watch)
+
+    def _change(self, add, watch):
+        # The selector is only touched by the watcher thread; changes are queued and it is woken
+        with self._lock:
+            if self._selector is None:
+                self._start()
+            self._changes.append((add, watch))
+        try:
+            self._wakeup.send(b'\0')
+        except OSError:
+            # The wakeup buffer is full, so the watcher is already due to wake
+            pass
+
+    def _apply(self):
+        with self._lock:
+            changes, self._changes = self._changes, []
+        for add, watch in changes:
+            try:
+                if add:
+                    # A connection closed without finish() may have left its descriptor registered
+                    if watch.sock.fileno() in self._selector.get_map():
+                        self._selector.unregister(watch.sock.fileno())
+                    self._selector.register(watch.sock, selectors.EVENT_READ, watch)
+                elif self._selector.get_key(watch.sock).data is watch:
+                    self._selector.unregister(watch.sock)
+            except (KeyError, ValueError, OSError):
+                # Already unregistered, or the socket is closed
+                pass
+
+    def _run(self):
+        while True:
+            self._apply()
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    try:
+                        key.fileobj.recv(4096)
+                    except OSError:
+                        pass
+                elif not key.data.readable():
+                    self._selector.unregister(key.fileobj)
+
+
+_watcher = Watcher()
+
+
+class _Shared:
+    """A watch that only reports a disconnect while `wanted()` is False (nobody else needs the work)"""
+
+    def __init__(self, watch, wanted):
+        self.watch = watch
+        self.wanted = wanted
+
+    def poll(self):
+        return self.watch.poll() and not self.wanted()
+
+
+def begin(environ):
+    """Start watching the current WSGI request's connection; returns the watch, or None when it cannot be watched"""
+    if not ENABLED or not hasattr(socket, 'MSG_DONTWAIT'):
+        return None
+    sock = next((environ[key] for key in SOCKET_KEYS if environ.get(key) is not None), None)
+    if sock is None:
+        return None
+    watch = SocketWatch(sock)
+    _watcher.add(watch)
+    _watch.set(watch)
+    return watch
+
+
+def finish():
+    watch = _watch.get()
+    if isinstance(watch, SocketWatch):
+        _watcher.remove(watch)
+    _watch.set(None)
+
+
+def disconnected():
+    watch = _watch.get()
+    return watch is not None and watch.poll()
+
+
+def check(endpoint=None):
+    """Raise ClientDisconnected when the current request's client has gone"""
+    if disconnected():
+        if endpoint is not None:
+            metrics.UPSTREAM_CANCELLED.inc(endpoint, 'skipped')
+        raise ClientDisconnected('Client disconnected')
+
+
+@contextlib.contextmanager
+def shared(wanted):
+    """Within the block, a disconnect only counts while `wanted()` is False (e.g. no other request waits on the work)"""
+    watch = _watch.get()
+    if watch is None:
+        yield
+        return
+    token = _watch.set(_Shared(watch, wanted))
+    try:
+        yield
+    finally:
+        _watch.reset(token)
+
+
+def wait(endpoint, done):
+    """
+    Block until the threading.Event `done` is set. Raises ClientDisconnected
+    when the current request's client goes away first.
+    """
+    watch = _watch.get()
+    if watch is None:
+        done.wait()
+        return
+    while not done.wait(POLL_INTERVAL):
+        if watch.poll():
+            metrics.UPSTREAM_CANCELLED.inc(endpoint, 'abandoned')
+            raise ClientDisconnected('Client disconnected')
@@ -0,0 +1,175 @@
+"""
+Wire encoding for the AI backend, shared by both servers.
+
+- JSON is encoded and decoded with orjson when it is installed; anything
+  orjson cannot encode goes through the framework's stdlib encoder as before
+- responses of at least AI_COMPRESS_MIN_BYTES are compressed with br
+  (when the brotli package is installed) or gzip, whichever the client's
+  Accept-Encoding prefers
+- request bodies sent with Content-Encoding: gzip are decompressed, up to
+  AI_MAX_REQUEST_BYTES once inflated
+- successful /api/ GET and HEAD results carry a weak ETag of their body; a
+  request whose If-None-Match lists it gets 304 with no body. POST results
+  are not conditional: the route has already run by the time the tag is
+  known, and RFC 9110 only allows 304 for GET and HEAD
+"""
+import hashlib
+import json
+import os
+import zlib
+
+import tracing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION = os.getenv('AI_COMPRESSION', '1') not in ('0', 'false')
+
+# Smaller responses are sent as they are; compressing them saves little
+MIN_SIZE = int(os.getenv('AI_COMPRESS_MIN_BYTES', 1024))
+
+# Low levels: most of the size reduction for a fraction of the CPU time
+GZIP_LEVEL = int(os.getenv('AI_GZIP_LEVEL', 5))
+BROTLI_QUALITY = int(os.getenv('AI_BROTLI_QUALITY', 4))
+
+# Methods whose responses get an ETag and honour If-None-Match
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+# Largest request body accepted after gzip decompression
+MAX_REQUEST_BYTES = int(os.getenv('AI_MAX_REQUEST_BYTES', 16 * 1024 * 1024))
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+# Server preference when the client weights encodings equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+class BodyTooLarge(ValueError):
+    """A decompressed request body is over AI_MAX_REQUEST_BYTES"""
+
+
+def fast_dumps(obj, sort_keys=False, default=None):
+    """JSON text for `obj` via orjson, or None when orjson is missing or cannot encode it"""
+    if orjson is None:
+        return None
+    # Dates go through `default` so they are formatted exactly as the stdlib path would
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    try:
+        return orjson.dumps(obj, default=default, option=option).decode('utf-8')
+    except TypeError:
+        return None
+
+
+def dumps(obj):
+    text = fast_dumps(obj)
+    return text if text is not None else json.dumps(obj)
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def json_provider(base):
+    """Subclass of a framework's DefaultJSONProvider (Flask or Quart) that encodes with orjson"""
+
+    class FastJSONProvider(base):
+        @tracing.traced('serialize')
+        def dumps(self, obj, **kwargs):
+            # Pretty-printing (indent/separators) stays on the stdlib encoder
+            text = None if kwargs else fast_dumps(obj, sort_keys=self.sort_keys, default=self.default)
+            return text if text is not None else super().dumps(obj, **kwargs)
+
+        @tracing.traced('parse')
+        def loads(self, s, **kwargs):
+            if kwargs or orjson is None:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+    return FastJSONProvider
+
+
+def _accepted(header):
+    """{encoding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for item in (header or '').split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def response_encoding(accept_encoding, content_type, size):
+    """'br', 'gzip' or None for a response of `size` bytes"""
+    if not COMPRESSION or size < MIN_SIZE:
+        return None
+    if not (content_type or '').startswith(COMPRESSIBLE_TYPES):
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # A gzip wrapper (wbits 16+) with no timestamp, so equal bodies compress to equal bytes
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gunzip(data, limit=MAX_REQUEST_BYTES):
+    """Inflate a gzip request body; raises BodyTooLarge past `limit`, ValueError when it is not valid gzip"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(data, limit + 1)
+    except zlib.error as e:
+        raise ValueError(f'Invalid gzip body: {str(e)}')
+    if len(body) > limit or decompressor.unconsumed_tail:
+        raise BodyTooLarge('Request body is too large')
+    if not decompressor.eof:
+        raise ValueError('Invalid gzip body: truncated')
+    return body
+
+
+def etag(data):
+    return 'W/"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, tag):
+    """Weak comparison of an If-None-Match header against `tag`"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = tag[2:] if tag.startswith('W/') else tag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
@@ -0,0 +1,64 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+
+def parse_endpoint_limits(spec):
+    """Parse "endpoint=limit,endpoint=limit" into a dict"""
+    limits = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        endpoint, limit = item.split('=', 1)
+        limits[endpoint.strip()] = int(limit)
+    return limits
+
+
+class UpstreamLimits:
+    """
+    Caps concurrent upstream model calls in the asyncio server.
+
+    Every call takes a slot from the global semaphore and, when the endpoint
+    has its own limit, from that endpoint's semaphore as well. Waiting
+    requests only cost a suspended coroutine, not a thread.
+    """
+
+    def __init__(self, global_limit=32, endpoint_limits=None):
+        self.global_limit = global_limit
+        self.endpoint_limits = endpoint_limits or {}
+        self._global = None
+        self._endpoints = {}
+
+    def _semaphores(self, endpoint):
+        # Created lazily so they bind to the event loop that serves requests
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+        semaphores = [self._global]
+        limit = self.endpoint_limits.get(endpoint)
+        if limit:
+            if endpoint not in self._endpoints:
+                self._endpoints[endpoint] = asyncio.Semaphore(limit)
+            semaphores.insert(0, self._endpoints[endpoint])
+        return semaphores
+
+    @asynccontextmanager
+    async def slot(self, endpoint):
+        """Hold an upstream slot for `endpoint` (endpoint semaphore first, then global)"""
+        semaphores = self._semaphores(endpoint)
+        acquired = []
+        try:
+            for semaphore in semaphores:
+                await semaphore.acquire()
+                acquired.append(semaphore)
+            yield
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+
+def limits_from_env():
+    """Build upstream limits from AI_MAX_UPSTREAM and AI_ENDPOINT_LIMITS"""
+    return UpstreamLimits(
+        global_limit=int(os.getenv('AI_MAX_UPSTREAM', 32)),
+        endpoint_limits=parse_endpoint_limits(os.getenv('AI_ENDPOINT_LIMITS'))
+    )
@@ -0,0 +1,75 @@
+"""
+Helpers for /api/evaluate-answers: several interview answers are packed into
+one prompt so the shared instructions are sent once instead of once per answer.
+"""
+import os
+
+from json_extract import fix_evaluation
+
+# Answers per packed model call; larger batches are split into several calls
+BATCH_SIZE = int(os.getenv('AI_EVAL_BATCH_SIZE', 10))
+
+# Packed calls for one request that may run at the same time
+MAX_PARALLEL_BATCHES = int(os.getenv('AI_EVAL_MAX_PARALLEL', 3))
+
+# Requests with more answers than this are rejected before any model call
+MAX_ANSWERS = int(os.getenv('AI_EVAL_MAX_ANSWERS', 50))
+
+EVALUATION_FIELDS = ('score', 'strengths', 'improvements', 'feedback')
+
+
+def prepare_batches(answers, batch_size=BATCH_SIZE):
+    """
+    Validate the submitted answers and pack the valid ones into batches.
+
+    Returns (results, batches): `results` has one slot per answer, already
+    holding an error for invalid items, and each batch is a list of items
+    numbered by their position in the request (starting at 1).
+    """
+    results = [None] * len(answers)
+    pending = []
+    for index, item in enumerate(answers):
+        if not isinstance(item, dict) or 'question' not in item or 'answer' not in item:
+            results[index] = {'error': 'Missing required fields: question and answer'}
+            continue
+        pending.append({
+            'id': index + 1,
+            'question': item['question'],
+            'answer': item['answer'],
+            'expectedPoints': item.get('expectedPoints') or []
+        })
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    return results, batches
+
+
+def unpack_evaluations(batch, parsed):
+    """Map a packed model response back to {id: evaluation or error} for every item in the batch"""
+    by_id = {}
+    entries = parsed.get('evaluations') if isinstance(parsed, dict) else None
+    for entry in entries or []:
+        if isinstance(entry, dict) and 'id' in entry:
+            try:
+                by_id[int(entry['id'])] = entry
+            except (TypeError, ValueError):
+                continue
+
+    unpacked = {}
+    for item in batch:
+        entry = fix_evaluation(by_id.get(item['id']))
+        if entry is None:
+            unpacked[item['id']] = {'error': 'AI response did not include an evaluation for this answer'}
+        else:
+            unpacked[item['id']] = {field: entry[field] for field in EVALUATION_FIELDS}
+    return unpacked
+
+
+def batch_failed(batch, message):
+    """Per-item errors for a batch whose model call failed as a whole"""
+    return {item['id']: {'error': message} for item in batch}
+
+
+def fill_results(results, unpacked):
+    """Place unpacked evaluations into their request positions"""
+    for item_id, evaluation in unpacked.items():
+        results[item_id - 1] = evaluation
+    return results
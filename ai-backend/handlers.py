@@ -0,0 +1,923 @@
+"""
+Route logic shared by app.py (Flask) and asgi.py (Quart).
+
+Each handler takes a Call (the request's JSON body and options) and does the
+parsing, validation, prompt building and response shaping for its route.
+Where it needs the model it yields a step instead of calling the client:
+
+- Generate(endpoint, prompt, ...) is one client.generate() call; the handler
+  receives its (value, cache_status), or the exception is raised at the yield
+- Parallel(steps) runs Generate steps and nested handler generators at the
+  same time and sends back their results in order
+- Blocking(function, *args) is local work that blocks: the SQLite stores,
+  the similarity index, callback URL checks; asyncio.to_thread runs it in
+  asgi.py so the event loop is never held by it
+
+The servers drive the generators: app.py runs steps on threads with
+client.generate(), asgi.py as coroutines with client.generate_async(), so
+the two serve the same contracts from one implementation (the same approach
+as the structured-output repair steps). A handler returns (body, status),
+optionally with headers, or a Stream for an SSE response.
+"""
+import types
+
+import evaluation
+import jobs
+import json_extract
+import learning_paths
+import metrics
+import prompt_budget
+import prompts
+import question_bank
+import resume_profiles
+import sessions
+import similarity
+import startup
+import structured
+import summaries
+
+concept_index = similarity.index_from_env()
+question_store = question_bank.bank_from_env()
+profile_store = resume_profiles.store_from_env()
+partial_store = summaries.store_from_env()
+
+
+class Call:
+    """The parts of a request a handler uses; it reports the cache outcome back on the call"""
+
+    def __init__(self, data, use_cache=True, stream=False):
+        self.data = data
+        self.use_cache = use_cache
+        self.stream = stream
+        self.cache_status = None
+        self.cache_similarity = None
+
+
+class Generate:
+    """A model call step: client.generate(endpoint, prompt, ...) -> (value, cache_status)"""
+
+    def __init__(self, endpoint, prompt, parse=None, use_cache=True, spec=None):
+        self.endpoint = endpoint
+        self.prompt = prompt
+        self.parse = parse
+        self.use_cache = use_cache
+        self.spec = spec
+
+
+class Parallel:
+    """
+    Run `steps` (Generate steps or handler generators) concurrently, at most
+    `limit` at a time; results come back in order. With `return_exceptions`
+    a failed step's exception is its result, otherwise the first is raised.
+    """
+
+    def __init__(self, steps, limit=None, return_exceptions=False):
+        self.steps = list(steps)
+        self.limit = limit or len(self.steps) or 1
+        self.return_exceptions = return_exceptions
+
+
+class Blocking:
+    """A blocking local call step: function(*args) -> its return value"""
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def run(self):
+        return self.function(*self.args)
+
+
+class Stream:
+    """
+    An SSE markdown response: generated from `prompt`, or the given `chunks`
+    of finished text. `chunks` may also be a plan that yields text between
+    its steps; each piece is sent as soon as it is yielded, and `metadata`
+    may still be filled in until the plan finishes.
+    """
+
+    def __init__(self, endpoint, prompt, metadata, chunks=None):
+        self.endpoint = endpoint
+        self.prompt = prompt
+        self.metadata = metadata
+        self.chunks = chunks
+
+
+def is_plan(value):
+    return isinstance(value, types.GeneratorType)
+
+
+def collect(plan):
+    """Run a plan that yields text between its steps (see Stream) inside a handler; returns (chunks, its result)"""
+    chunks = []
+    value, failure = None, None
+    while True:
+        try:
+            item = plan.send(value) if failure is None else plan.throw(failure)
+        except StopIteration as done:
+            return chunks, done.value
+        if isinstance(item, str):
+            chunks.append(item)
+            value, failure = None, None
+            continue
+        try:
+            value, failure = (yield item), None
+        except Exception as e:
+            value, failure = None, e
+
+
+def error(message, status, **extra):
+    return dict({'error': message}, **extra), status
+
+
+def parse_error(e):
+    print(f"JSON decode error: {str(e)}")
+    print(f"Response text: {e.doc}")
+    return error('Failed to parse AI response', 500, details=str(e))
+
+
+def readiness(client):
+    """Readiness: 200 once the model client is built, 503 while it is starting (or failed to start)"""
+    state = client.readiness()
+    return {
+        'status': 'ready' if state['ready'] else 'starting',
+        **state,
+        'startup': startup.report()
+    }, 200 if state['ready'] else 503
+
+
+def bank_questions(topic, num_questions, use_cache, generate_questions, subject=None, title=None):
+    """
+    A question set for `topic`: distinct questions sampled from the question bank,
+    with only the shortfall generated by the `generate_questions(count, avoid)` plan,
+    which returns ({"questions": [...], ...}, cache_status). Generated questions that
+    repeat banked ones are dropped and topped up. Returns (data, cache_status, banked).
+    """
+    if not isinstance(num_questions, int):
+        data, status = yield from generate_questions(num_questions, [])
+        return data, status, 0
+    banked = []
+    if question_store is not None and use_cache:
+        banked = yield Blocking(question_store.sample, topic, num_questions)
+    if len(banked) >= num_questions:
+        return {'questions': question_bank.merge(banked, [], num_questions)}, question_bank.CACHE_BANK, len(banked)
+    # The whole bank in a fixed order rather than this sample, so the prompt is cached and coalesced
+    avoid = (yield Blocking(question_store.texts, topic)) if banked else []
+    data, status = yield from generate_questions(num_questions - len(banked), avoid)
+    generated = list(data['questions'])
+    questions = question_bank.merge(banked, generated, num_questions)
+    for _ in range(question_bank.MAX_TOP_UPS):
+        if len(questions) >= num_questions:
+            break
+        more, _ = yield from generate_questions(num_questions - len(questions), question_bank.avoid_list(questions))
+        generated.extend(more['questions'])
+        questions = question_bank.merge(questions, more['questions'], num_questions)
+    if question_store is not None:
+        yield Blocking(lambda: question_store.add(topic, generated, subject=subject, title=title))
+    return dict(data, questions=questions), status, len(banked)
+
+
+def session_assessment(title, subject, description, num_questions, use_cache):
+    """A session's assessment, drawing on the question bank; returns (assessment, cache_status, banked)"""
+    def generate_questions(count, avoid):
+        prompt = prompts.session_assessment_prompt(title, subject, description, count, avoid=avoid)
+        parsed, status = yield Generate(
+            'generate-session-assessment', prompt, parse=json_extract.parse_assessment,
+            use_cache=use_cache, spec=structured.assessment_spec(count)
+        )
+        return parsed['assessment'], status
+
+    assessment, status, banked = yield from bank_questions(
+        question_bank.assessment_topic(subject, title), num_questions, use_cache, generate_questions,
+        subject=subject, title=title
+    )
+    return dict({'title': title, 'subject': subject}, **assessment), status, banked
+
+
+def summarize_chunks(note_title, chunks, use_cache):
+    """
+    Map step for large notes: summarize each chunk, at most AI_SUMMARY_MAX_PARALLEL
+    at a time. Returns a (text, cache_status) pair per chunk, in order.
+    """
+    return (yield Parallel(
+        (Generate('summarize-notes-chunk', prompts.chunk_summary_prompt(note_title, chunk), use_cache=use_cache)
+         for chunk in chunks),
+        limit=summaries.MAX_PARALLEL_CHUNKS
+    ))
+
+
+def summarize_packs(note_title, packs, stored):
+    """
+    Map step for incremental notes: `stored` holds each pack's partial summary
+    from the partial store, or None; only packs without one are generated (and
+    then stored). Returns (partials, reused) in pack order.
+    """
+    missing = [pack for pack, partial in zip(packs, stored) if partial is None]
+    results = []
+    if missing:
+        results = yield Parallel(
+            (Generate('summarize-notes-chunk', prompts.chunk_summary_prompt(note_title, pack['text']), use_cache=False)
+             for pack in missing),
+            limit=summaries.MAX_PARALLEL_CHUNKS
+        )
+    fresh = iter(results)
+    partials, new = [], []
+    for pack, partial in zip(packs, stored):
+        if partial is None:
+            partial, _ = next(fresh)
+            if partial:
+                new.append((pack['fingerprint'], partial))
+        partials.append(partial)
+    if new:
+        yield Blocking(store_partials, new)
+    return partials, [partial is not None for partial in stored]
+
+
+def stored_partials(packs):
+    return [partial_store.get(pack['fingerprint']) for pack in packs]
+
+
+def store_partials(partials):
+    for fingerprint, partial in partials:
+        partial_store.set(fingerprint, partial)
+
+
+def compose_learning_path(topic, level, duration, goal, use_cache, metadata):
+    """
+    A learning path scheduled from the cached module library for the topic and level,
+    plus a short personalization for a non-default goal. Yields the Markdown as it is
+    ready: the weekly plan right after the library, the personalization once it is
+    generated. Sets metadata['composition'] and returns the cache status.
+    """
+    weeks = learning_paths.parse_weeks(duration)
+    library_topic, library_level = learning_paths.library_key(topic, level)
+    library, library_status = yield Generate(
+        'generate-learning-path-modules', prompts.learning_modules_prompt(library_topic, library_level),
+        parse=json_extract.parse_learning_modules, use_cache=use_cache, spec=structured.learning_modules_spec()
+    )
+    plan = learning_paths.schedule(library['modules'], weeks)
+    sections = learning_paths.render_plan(topic, level, goal, plan)
+    yield sections[0]
+    for section in sections[1:]:
+        yield '\n\n' + section
+    personalization, personalization_status = None, None
+    if learning_paths.PERSONALIZE and not learning_paths.is_default_goal(goal):
+        prompt = prompts.learning_path_personalization_prompt(
+            library_topic, library_level, plan['weeks'], goal, learning_paths.outline(plan)
+        )
+        try:
+            personalization, personalization_status = yield Generate(
+                'generate-learning-path-personalize', prompt, use_cache=use_cache
+            )
+        except Exception as e:
+            # The path is still complete without it
+            print(f"Error personalizing learning path: {str(e)}")
+        if personalization:
+            yield '\n\n' + personalization.strip()
+    for section in learning_paths.render_tail(plan):
+        yield '\n\n' + section
+    metadata['composition'] = learning_paths.composition(plan, bool(personalization))
+    return learning_paths.combined_status(library_status, personalization_status)
+
+
+def learning_path_chunks(topic, level, duration, goal, use_cache, metadata):
+    """
+    The composed learning path as text chunks between steps; a duration the scheduler does not
+    recognize or a module library that cannot be parsed falls back to a full generation
+    """
+    try:
+        return (yield from compose_learning_path(topic, level, duration, goal, use_cache, metadata))
+    except ValueError as e:
+        print(f"Error composing learning path: {str(e)}")
+    prompt = prompts.learning_path_prompt(topic, level, duration, goal)
+    learning_path, cache_status = yield Generate('generate-learning-path', prompt, use_cache=use_cache)
+    if learning_path:
+        yield learning_path
+    return cache_status
+
+
+def extract_resume_profile(resume_id, resume, use_cache):
+    """Extract the skill profile of a resume and store it; None when extraction fails"""
+    prompt, _, _ = prompt_budget.fit('extract-resume-profile', resume, prompts.resume_profile_prompt)
+    try:
+        profile, _ = yield Generate(
+            'extract-resume-profile', prompt, parse=json_extract.parse_resume_profile,
+            use_cache=use_cache, spec=structured.resume_profile_spec()
+        )
+    except Exception as e:
+        # The interview still has its questions; the next one for this resume tries again
+        metrics.RESUME_PROFILE_EXTRACTIONS.inc('failed')
+        print(f"Error extracting resume profile: {str(e)}")
+        return None
+    metrics.RESUME_PROFILE_EXTRACTIONS.inc('ok')
+    yield Blocking(profile_store.set, resume_id, profile)
+    return profile
+
+
+def evaluation_profile(data):
+    """The rendered profile named by `resumeProfileId` (or the fingerprint of `resume`) in an evaluation request"""
+    if profile_store is None or not resume_profiles.IN_EVALUATION:
+        return None
+    resume_id = data.get('resumeProfileId')
+    if not resume_id and isinstance(data.get('resume'), str):
+        resume_id = resume_profiles.fingerprint(data['resume'])
+    if not isinstance(resume_id, str) or not resume_id:
+        return None
+    profile = yield Blocking(profile_store.get, resume_id)
+    return resume_profiles.render(profile) if profile else None
+
+
+def summarize_notes(call):
+    """
+    Summarize notes and extract important information
+    Expected request body:
+    {
+        "content": "note content here",
+        "title": "note title (optional)",
+        "incremental": true (optional; reuse summaries of unchanged sections)
+    }
+    """
+    try:
+        data = call.data
+
+        if not data or 'content' not in data:
+            return error('Missing required field: content', 400)
+
+        note_content = data['content']
+        note_title = data.get('title', 'Untitled Note')
+
+        if not note_content.strip():
+            return error('Note content cannot be empty', 400)
+
+        # Notes over the prompt budget are compacted before they are chunked or summarized
+        _, note_content, budget_report = prompt_budget.fit(
+            'summarize-notes', note_content, lambda text: prompts.summarize_notes_prompt(note_title, text)
+        )
+
+        metadata = {
+            'note_title': note_title,
+            'timestamp': data.get('timestamp'),
+            'prompt_budget': budget_report
+        }
+
+        packs = summaries.incremental_packs(note_content) if data.get('incremental') else []
+        if len(packs) > 1:
+            # Incremental, whatever the note's size: packs left unchanged by an edit reuse their
+            # stored partial summaries, and the first request stores them. A single pack has nothing to reuse
+            stored = (yield Blocking(stored_partials, packs)) if call.use_cache else [None] * len(packs)
+            partials, reused = yield from summarize_packs(note_title, packs, stored)
+            partials = [text for text in partials if text]
+            metadata['chunks'] = len(packs)
+            metadata['sections'] = summaries.section_report(packs, reused)
+            metadata['reused_sections'] = sum(section['reused'] for section in metadata['sections'])
+        elif summaries.needs_chunking(note_content):
+            # Large notes: summarize chunks in parallel, then merge them into the usual sections
+            chunks = summaries.split_note(note_content)
+            results = yield from summarize_chunks(note_title, chunks, call.use_cache)
+            partials = [text for text, _ in results if text]
+            metadata['chunks'] = len(chunks)
+        else:
+            partials = None
+
+        if partials is not None:
+            if not partials:
+                return error('Failed to generate summary from AI', 500)
+            prompt = prompts.summary_reduce_prompt(note_title, partials)
+        else:
+            # Create a comprehensive prompt for Gemini
+            prompt = prompts.summarize_notes_prompt(note_title, note_content)
+
+        if call.stream:
+            return Stream('summarize-notes', prompt, metadata)
+
+        # Generate content using Gemini
+        summary_text, call.cache_status = yield Generate('summarize-notes', prompt, use_cache=call.use_cache)
+
+        if not summary_text:
+            return error('Failed to generate summary from AI', 500)
+
+        # Return the structured response
+        return {
+            'success': True,
+            'summary': summary_text,
+            **metadata
+        }, 200
+
+    except ValueError as ve:
+        return error(f'Invalid input: {str(ve)}', 400)
+
+    except Exception as e:
+        print(f"Error in summarize_notes: {str(e)}")
+        return error(f'An error occurred while processing your request: {str(e)}', 500)
+
+
+def explain_concept(call):
+    """
+    Explain a specific concept from notes
+    Expected request body:
+    {
+        "concept": "concept to explain",
+        "context": "surrounding context (optional)"
+    }
+    """
+    try:
+        data = call.data
+
+        if not data or 'concept' not in data:
+            return error('Missing required field: concept', 400)
+
+        concept = data['concept']
+        context = data.get('context', '')
+
+        # Reworded questions about a concept already explained are answered from the similarity index
+        match = None
+        if concept_index and call.use_cache:
+            match = yield Blocking(concept_index.lookup, concept, context)
+        if match is not None:
+            call.cache_status, call.cache_similarity = similarity.CACHE_SIMILAR, match.similarity
+            explanation = match.value
+        else:
+            prompt = prompts.explain_concept_prompt(concept, context)
+            explanation, call.cache_status = yield Generate('explain-concept', prompt, use_cache=call.use_cache)
+            if concept_index is not None:
+                yield Blocking(concept_index.add, concept, context, explanation)
+
+        return {
+            'success': True,
+            'explanation': explanation,
+            'concept': concept
+        }, 200
+
+    except Exception as e:
+        print(f"Error in explain_concept: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def generate_quiz(call):
+    """
+    Generate quiz questions from notes
+    Expected request body:
+    {
+        "content": "note content",
+        "num_questions": 5
+    }
+    """
+    try:
+        data = call.data
+
+        if not data or 'content' not in data:
+            return error('Missing required field: content', 400)
+
+        content = data['content']
+        num_questions = data.get('num_questions', 5)
+
+        _, content, budget_report = prompt_budget.fit(
+            'generate-quiz', content, lambda text: prompts.quiz_prompt(text, num_questions)
+        )
+
+        def generate_questions(count, avoid):
+            prompt = prompts.quiz_prompt(content, count, avoid=avoid)
+            return (yield Generate(
+                'generate-quiz', prompt, parse=json_extract.parse_quiz,
+                use_cache=call.use_cache, spec=structured.quiz_spec(count)
+            ))
+
+        quiz_data, call.cache_status, banked = yield from bank_questions(
+            question_bank.quiz_topic(content), num_questions, call.use_cache, generate_questions
+        )
+
+        return {
+            'success': True,
+            'quiz': quiz_data,
+            'num_questions': num_questions,
+            'banked_questions': banked,
+            'prompt_budget': budget_report
+        }, 200
+
+    except json_extract.ModelOutputError as e:
+        return parse_error(e)
+
+    except Exception as e:
+        print(f"Error in generate_quiz: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def generate_session_notes(call):
+    """
+    Generate comprehensive notes from study session details
+    Expected request body:
+    {
+        "title": "Session title",
+        "subject": "Subject name",
+        "description": "Session description"
+    }
+    """
+    try:
+        data = call.data
+
+        if not data or 'title' not in data or 'subject' not in data:
+            return error('Missing required fields: title and subject', 400)
+
+        title = data['title']
+        subject = data['subject']
+        description = data.get('description', '')
+
+        prompt = prompts.session_notes_prompt(title, subject, description)
+
+        if call.stream:
+            return Stream('generate-session-notes', prompt, {
+                'title': title,
+                'subject': subject
+            })
+
+        notes, call.cache_status = yield Generate('generate-session-notes', prompt, use_cache=call.use_cache)
+
+        if not notes:
+            return error('Failed to generate notes from AI', 500)
+
+        return {
+            'success': True,
+            'content': notes,
+            'title': title,
+            'subject': subject
+        }, 200
+
+    except Exception as e:
+        print(f"Error in generate_session_notes: {str(e)}")
+        return error(f'An error occurred while generating notes: {str(e)}', 500)
+
+
+def generate_session_assessment(call):
+    """
+    Generate assessment questions from study session details
+    Expected request body:
+    {
+        "title": "Session title",
+        "subject": "Subject name",
+        "description": "Session description",
+        "num_questions": 5
+    }
+    """
+    try:
+        data = call.data
+
+        if not data or 'title' not in data or 'subject' not in data:
+            return error('Missing required fields: title and subject', 400)
+
+        title = data['title']
+        subject = data['subject']
+        description = data.get('description', '')
+        num_questions = data.get('num_questions', 5)
+
+        assessment, call.cache_status, banked = yield from session_assessment(
+            title, subject, description, num_questions, call.use_cache
+        )
+
+        return {
+            'success': True,
+            'assessment': assessment,
+            'banked_questions': banked
+        }, 200
+
+    except json_extract.ModelOutputError as e:
+        return parse_error(e)
+
+    except Exception as e:
+        print(f"Error in generate_session_assessment: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def complete_session(call):
+    """
+    Generate session notes and an assessment at the same time from one set of session details
+    Expected request body:
+    {
+        "title": "Session title",
+        "subject": "Subject name",
+        "description": "Session description",
+        "num_questions": 5
+    }
+    Returns {"notes": {"content": ...}, "assessment": {...}}; a part that failed
+    is null and its message is in "errors", while the other part is still returned.
+    """
+    try:
+        data = call.data
+
+        if not data or 'title' not in data or 'subject' not in data:
+            return error('Missing required fields: title and subject', 400)
+
+        title = data['title']
+        subject = data['subject']
+        description = data.get('description', '')
+        num_questions = data.get('num_questions', 5)
+
+        def notes():
+            prompt = prompts.session_notes_prompt(title, subject, description)
+            text, _ = yield Generate('generate-session-notes', prompt, use_cache=call.use_cache)
+            return sessions.notes_part(text)
+
+        def assessment():
+            part, _, _ = yield from session_assessment(title, subject, description, num_questions, call.use_cache)
+            return part
+
+        results = yield Parallel([notes(), assessment()], return_exceptions=True)
+
+        return sessions.completion_response(title, subject, results)
+
+    except Exception as e:
+        print(f"Error in complete_session: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def generate_interview_questions(call):
+    """
+    Generate interview questions based on resume and job role
+    Expected request body:
+    {
+        "resume": "Resume text",
+        "jobRole": "Job role/position"
+    }
+    The response's `resume_profile.id` can be sent as `resumeProfileId` to the
+    evaluation routes. Questions are generated from the resume's profile
+    (extracted first, then cached) instead of the full resume.
+    """
+    try:
+        data = call.data
+
+        if not data or 'resume' not in data or 'jobRole' not in data:
+            return error('Missing required fields: resume and jobRole', 400)
+
+        resume = data['resume']
+        job_role = data['jobRole']
+
+        resume_id = resume_profiles.fingerprint(resume)
+        profile, cached = None, False
+        if profile_store is not None:
+            profile = (yield Blocking(profile_store.get, resume_id)) if call.use_cache else None
+            cached = profile is not None
+            if not cached:
+                # Extracted before the questions, so the same request always builds the same prompt
+                profile = yield from extract_resume_profile(resume_id, resume, call.use_cache)
+
+        if profile is not None:
+            prompt, _, budget_report = prompt_budget.fit(
+                'generate-interview-questions', resume_profiles.render(profile),
+                lambda text: prompts.interview_questions_prompt(text, job_role, label='Candidate Profile')
+            )
+        else:
+            prompt, resume, budget_report = prompt_budget.fit(
+                'generate-interview-questions', resume, lambda text: prompts.interview_questions_prompt(text, job_role)
+            )
+
+        questions_data, call.cache_status = yield Generate(
+            'generate-interview-questions', prompt, parse=json_extract.parse_interview_questions,
+            use_cache=call.use_cache, spec=structured.interview_spec()
+        )
+
+        response = dict(questions_data, prompt_budget=budget_report)
+        if profile_store is not None:
+            response['resume_profile'] = resume_profiles.report(
+                resume_id, data['resume'], profile, cached, profile is not None
+            )
+        return response, 200
+
+    except json_extract.ModelOutputError as e:
+        return parse_error(e)
+
+    except Exception as e:
+        print(f"Error in generate_interview_questions: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def evaluate_answer(call):
+    """
+    Evaluate an interview answer
+    Expected request body:
+    {
+        "question": "Interview question",
+        "answer": "Candidate's answer",
+        "expectedPoints": ["point1", "point2"],
+        "jobRole": "Job role",
+        "resumeProfileId": "resume_profile.id from /api/generate-interview-questions (optional)"
+    }
+    """
+    try:
+        data = call.data
+
+        if not data or 'question' not in data or 'answer' not in data:
+            return error('Missing required fields: question and answer', 400)
+
+        question = data['question']
+        answer = data['answer']
+        expected_points = data.get('expectedPoints', [])
+        job_role = data.get('jobRole', '')
+
+        profile = yield from evaluation_profile(data)
+
+        prompt = prompts.evaluate_answer_prompt(question, answer, expected_points, job_role, profile)
+
+        evaluation_data, call.cache_status = yield Generate(
+            'evaluate-answer', prompt, parse=json_extract.parse_evaluation,
+            use_cache=call.use_cache, spec=structured.evaluation_spec()
+        )
+
+        return dict(evaluation_data, resume_profile_used=profile is not None), 200
+
+    except json_extract.ModelOutputError as e:
+        return parse_error(e)
+
+    except Exception as e:
+        print(f"Error in evaluate_answer: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def evaluate_answers(call):
+    """
+    Evaluate several interview answers with one (or a few) packed model calls
+    Expected request body:
+    {
+        "jobRole": "Job role",
+        "resumeProfileId": "resume_profile.id from /api/generate-interview-questions (optional)",
+        "answers": [
+            {"question": "Interview question", "answer": "Candidate's answer", "expectedPoints": ["point1"]}
+        ]
+    }
+    Evaluations are returned in request order; an answer that could not be
+    evaluated gets {"error": "..."} instead of failing the whole batch.
+    """
+    try:
+        data = call.data
+
+        if not data or not isinstance(data.get('answers'), list):
+            return error('Missing required field: answers', 400)
+
+        if len(data['answers']) > evaluation.MAX_ANSWERS:
+            return error(f'Too many answers: at most {evaluation.MAX_ANSWERS} per request', 400)
+
+        job_role = data.get('jobRole', '')
+        profile = yield from evaluation_profile(data)
+        results, batches = evaluation.prepare_batches(data['answers'])
+
+        def evaluate_batch(batch):
+            prompt = prompts.evaluate_answers_prompt(batch, job_role, profile)
+            try:
+                parsed, _ = yield Generate(
+                    'evaluate-answers', prompt, parse=json_extract.parse_evaluations,
+                    use_cache=call.use_cache, spec=structured.evaluations_spec()
+                )
+                return evaluation.unpack_evaluations(batch, parsed)
+            except json_extract.ModelOutputError as e:
+                print(f"JSON decode error in evaluate_answers: {str(e)}")
+                return evaluation.batch_failed(batch, 'Failed to parse AI response')
+            except Exception as e:
+                print(f"Error in evaluate_answers: {str(e)}")
+                return evaluation.batch_failed(batch, f'An error occurred: {str(e)}')
+
+        if batches:
+            unpacked = yield Parallel(
+                [evaluate_batch(batch) for batch in batches], limit=evaluation.MAX_PARALLEL_BATCHES
+            )
+            for batch_results in unpacked:
+                evaluation.fill_results(results, batch_results)
+
+        return {
+            'success': True,
+            'evaluations': results,
+            'jobRole': job_role,
+            'resume_profile_used': profile is not None
+        }, 200
+
+    except Exception as e:
+        print(f"Error in evaluate_answers: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def generate_learning_path(call):
+    """
+    Generate a personalized learning path
+    Expected request body:
+    {
+        "topic": "topic to learn",
+        "skillLevel": "beginner|intermediate|advanced",
+        "duration": "duration in weeks",
+        "goal": "learning goal"
+    }
+    """
+    try:
+        data = call.data
+
+        if not data or 'topic' not in data:
+            return error('Missing required field: topic', 400)
+
+        topic = data['topic']
+        level = data.get('skillLevel', 'beginner')
+        duration = data.get('duration', '4 weeks')
+        goal = data.get('goal', learning_paths.DEFAULT_GOAL)
+
+        metadata = {
+            'topic': topic,
+            'level': level,
+            'duration': duration,
+            'goal': goal
+        }
+
+        if learning_paths.COMPOSE:
+            chunks = learning_path_chunks(topic, level, duration, goal, call.use_cache, metadata)
+            if call.stream:
+                # Modules go out as soon as the library is ready, before the personalization
+                return Stream('generate-learning-path', None, metadata, chunks=chunks)
+            parts, call.cache_status = yield from collect(chunks)
+            if not parts:
+                return error('Failed to generate learning path from AI', 500)
+            return {
+                'success': True,
+                'content': ''.join(parts),
+                **metadata
+            }, 200
+
+        prompt = prompts.learning_path_prompt(topic, level, duration, goal)
+
+        if call.stream:
+            return Stream('generate-learning-path', prompt, metadata)
+
+        learning_path, call.cache_status = yield Generate('generate-learning-path', prompt, use_cache=call.use_cache)
+
+        if not learning_path:
+            return error('Failed to generate learning path from AI', 500)
+
+        return {
+            'success': True,
+            'content': learning_path,
+            **metadata
+        }, 200
+
+    except Exception as e:
+        print(f"Error in generate_learning_path: {str(e)}")
+        return error(f'An error occurred while generating learning path: {str(e)}', 500)
+
+
+def submit_job(call, job_queue, request_id):
+    """
+    Queue a generation as a background job and return its id immediately
+    Expected request body:
+    {
+        "endpoint": "generate-session-notes",
+        "payload": {"title": "...", "subject": "..."},
+        "priority": "high" | "normal" | "low" (optional),
+        "callback_url": "http://..." (optional; receives the finished job)
+    }
+    """
+    try:
+        data = call.data
+
+        # Resolves the callback URL's host
+        message = yield Blocking(jobs.validate_submission, data)
+        if message:
+            return error(message, 400)
+
+        job = yield Blocking(lambda: job_queue.submit(
+            data['endpoint'], data['payload'], data.get('priority'), data.get('callback_url'),
+            request_id=request_id
+        ))
+
+        return {
+            'success': True,
+            'job': job.view()
+        }, 202, {'Location': f'/api/jobs/{job.id}'}
+
+    except jobs.QueueFull as e:
+        return error(str(e), 503)
+
+    except Exception as e:
+        print(f"Error in submit_job: {str(e)}")
+        return error(f'An error occurred: {str(e)}', 500)
+
+
+def job_status(job_queue, job_id):
+    """Status of a background job"""
+    job = yield Blocking(job_queue.get, job_id)
+    if job is None:
+        return error('Job not found', 404)
+
+    return {
+        'success': True,
+        'job': job.view()
+    }, 200
+
+
+def job_result(job_queue, job_id):
+    """Result of a background job: 202 while it is queued or running, 200 with the route's response once finished"""
+    job = yield Blocking(job_queue.get, job_id)
+    if job is None:
+        return error('Job not found', 404)
+
+    if job.finished_at is None:
+        return {
+            'success': True,
+            'job': job.view()
+        }, 202
+
+    return {
+        'success': True,
+        'job': job.view(include_result=True)
+    }, 200
@@ -0,0 +1,154 @@
+"""
+Request hooks shared by app.py (Flask) and asgi.py (Quart).
+
+Both frameworks give hooks the same `request`, `g` and response attributes,
+so each app registers thin hooks around these functions and keeps only what
+really differs between them: reading and replacing the body (awaited in
+Quart), how a client disconnect is noticed, and whether handler plans run on
+threads or as coroutines. Responses come back in the handlers' (body, status
+[, headers]) form for the app's respond().
+"""
+import time
+
+import admission
+import codec
+import handlers
+import metrics
+import resilience
+import startup
+import tracing
+
+
+def cache_bypassed(request):
+    """A request skips the cache read with `Cache-Control: no-cache` or `?nocache=1`"""
+    if 'no-cache' in request.headers.get('Cache-Control', ''):
+        return True
+    return request.args.get('nocache') in ('1', 'true')
+
+
+def wants_stream(request):
+    """Streaming is requested with `?stream=1` or `Accept: text/event-stream`"""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def call(request, data):
+    """The handlers.Call for a request with JSON body `data`"""
+    return handlers.Call(data, use_cache=not cache_bypassed(request), stream=wants_stream(request))
+
+
+def start(request, g):
+    """
+    Assign the request ID and start timing the request's phases (Server-Timing,
+    slow-request log) and its metrics; upstream calls and retries for it stop
+    at the caller's X-Deadline-Ms
+    """
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.trace = tracing.begin(request.headers.get(tracing.REQUEST_ID_HEADER), request.method, route)
+    g.request_started = time.perf_counter()
+    g.metrics_route = route
+    metrics.HTTP_IN_FLIGHT.inc(route)
+    resilience.set_deadline(request.headers.get(resilience.DEADLINE_HEADER))
+
+
+def admission_target(request, admission_control):
+    """(client key, endpoint) for a POST /api/* request when admission control is on, otherwise None"""
+    if admission_control is None or request.method != 'POST' or not request.path.startswith('/api/'):
+        return None
+    client_key = admission.client_id(request.headers.get(admission.CLIENT_ID_HEADER), request.remote_addr)
+    return client_key, request.path[len('/api/'):]
+
+
+def rejection(e):
+    """The 429/503 response, with Retry-After, for an admission.Rejected"""
+    body, status = handlers.error(
+        'Too many requests' if e.status == 429 else 'Server is busy, please retry later', e.status
+    )
+    return body, status, {'Retry-After': str(e.retry_after)}
+
+
+def request_encoding(request):
+    """The request body's Content-Encoding, lowercased; '' when the body is not encoded"""
+    encoding = request.headers.get('Content-Encoding', '').strip().lower()
+    return '' if encoding == 'identity' else encoding
+
+
+def decompress(encoding, body):
+    """
+    Decode a request body sent with `Content-Encoding: gzip` (large note uploads);
+    returns (data, None), or (None, error response) for a body that is refused
+    """
+    if encoding != 'gzip':
+        return None, handlers.error(f'Unsupported Content-Encoding: {encoding}', 415)
+    try:
+        with tracing.phase('decode'):
+            return codec.gunzip(body), None
+    except codec.BodyTooLarge as e:
+        return None, handlers.error(str(e), 413)
+    except ValueError as e:
+        return None, handlers.error(str(e), 400)
+
+
+def encode(request, response, data):
+    """
+    ETag (and 304 for a matching If-None-Match) on successful /api/ GET and HEAD
+    results, then gzip/br compression as the client's Accept-Encoding allows.
+    Returns the body to send, or None to send `data` as it is.
+    """
+    if response.status_code == 200 and request.method in codec.CONDITIONAL_METHODS and request.path.startswith('/api/'):
+        with tracing.phase('encode'):
+            tag = codec.etag(data)
+        response.headers['ETag'] = tag
+        if codec.etag_matches(request.headers.get('If-None-Match'), tag):
+            response.status_code = 304
+            return b''
+    response.vary.add('Accept-Encoding')
+    encoding = codec.response_encoding(request.headers.get('Accept-Encoding'), response.mimetype, len(data))
+    if not encoding:
+        return None
+    response.headers['Content-Encoding'] = encoding
+    with tracing.phase('encode'):
+        return codec.compress(data, encoding)
+
+
+def finish_response(g, response, size=None):
+    """
+    Record the status and add the X-Cache, request ID and Server-Timing headers;
+    runs after encode() so a 304 is what gets recorded. `size` is the length of
+    a body that is not streamed.
+    """
+    g.response_status = response.status_code
+    cache_status = g.get('cache_status')
+    if cache_status:
+        response.headers['X-Cache'] = cache_status
+    if g.get('cache_similarity') is not None:
+        response.headers['X-Cache-Similarity'] = str(g.cache_similarity)
+    trace = g.get('trace')
+    if trace is None:
+        return
+    response.headers[tracing.REQUEST_ID_HEADER] = trace.request_id
+    response.headers['Server-Timing'] = trace.server_timing()
+    if size is not None:
+        trace.response_bytes = size
+
+
+def disconnected(g):
+    """Record a client that disconnected while its request was being worked on"""
+    g.response_status = 499
+    metrics.CLIENT_DISCONNECTS.inc(g.get('metrics_route', 'unmatched'), 'waiting')
+
+
+def finish(request, g, admission_control):
+    """Close the request's trace, admission slot, deadline and metrics"""
+    tracing.finish(g.pop('trace', None), g.get('response_status', 500))
+    admitted_at = g.pop('admitted_at', None)
+    if admitted_at is not None:
+        admission_control.release(time.perf_counter() - admitted_at)
+    resilience.clear_deadline()
+    route = g.get('metrics_route')
+    if route is None:
+        return
+    startup.mark('first_request')
+    metrics.HTTP_IN_FLIGHT.dec(route)
+    metrics.record_request(route, request.method, g.get('response_status', 500), time.perf_counter() - g.request_started)
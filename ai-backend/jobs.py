@@ -0,0 +1,349 @@
+"""
+Background jobs for long-running generations.
+
+POST /api/jobs queues a request for one of the generation routes and returns
+a job id at once; a fixed pool of worker threads runs queued jobs in priority
+order by dispatching the route internally, so a job's result is exactly the
+JSON the route would have returned. Clients poll /api/jobs/<id> (status) and
+/api/jobs/<id>/result, or pass a callback URL that receives the finished job.
+Finished jobs are kept for AI_JOB_RETENTION seconds. A job runs, and calls
+back, under the request ID of the request that submitted it.
+
+Callbacks only go to hosts in AI_JOB_CALLBACK_HOSTS when it is set, and
+otherwise only to hosts whose every address is public: private, loopback,
+link-local, multicast and reserved addresses are refused after DNS
+resolution, both when the job is submitted and again before the callback is
+sent. Redirects are not followed. Callbacks are sent from their own small
+thread pool with a short timeout, so a slow receiver never holds a job worker.
+
+Jobs are queued and run in the process that accepted them. With AI_JOB_DB
+set, each job's status and result are also written to that SQLite file, so
+any worker process sharing it can answer /api/jobs/<id>; serve.py sets it
+when it runs more than one worker.
+"""
+import heapq
+import ipaddress
+import itertools
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import codec
+import tracing
+from cache import SQLiteCache
+
+# Worker threads per process; at most this many jobs run at the same time
+WORKERS = int(os.getenv('AI_JOB_WORKERS', 4))
+
+# Seconds a finished job and its result are kept
+RETENTION = int(os.getenv('AI_JOB_RETENTION', 3600))
+
+# Queued jobs beyond this are rejected
+MAX_QUEUED = int(os.getenv('AI_JOB_MAX_QUEUED', 1000))
+
+# Seconds a callback may take to connect and answer
+CALLBACK_TIMEOUT = float(os.getenv('AI_JOB_CALLBACK_TIMEOUT', 3))
+
+# Threads that send callbacks
+CALLBACK_WORKERS = 2
+
+# Hosts (comma-separated) callbacks may go to, e.g. "localhost,backend.internal";
+# unset allows any host that resolves only to public addresses
+CALLBACK_HOSTS = frozenset(
+    host.strip().lower() for host in os.getenv('AI_JOB_CALLBACK_HOSTS', '').split(',') if host.strip()
+)
+
+# SQLite file holding job status and results for every worker process; unset keeps them in this process only
+DB_PATH = os.getenv('AI_JOB_DB')
+
+KEY_PREFIX = 'job:'
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# Routes that can run as jobs
+JOB_ENDPOINTS = (
+    'summarize-notes',
+    'explain-concept',
+    'generate-quiz',
+    'generate-session-notes',
+    'generate-session-assessment',
+    'generate-interview-questions',
+    'evaluate-answer',
+    'evaluate-answers',
+    'generate-learning-path',
+    'complete-session',
+)
+
+
+class QueueFull(Exception):
+    """The job queue is at AI_JOB_MAX_QUEUED"""
+
+
+class Job:
+    def __init__(self, endpoint, payload, priority, callback_url, request_id=None):
+        self.id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.endpoint = endpoint
+        self.payload = payload
+        self.priority = priority
+        self.callback_url = callback_url
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.status_code = None
+        self.result = None
+        self.error = None
+
+    @classmethod
+    def restore(cls, data):
+        """A job read back from the shared store, as written by view(include_result=True)"""
+        job = cls(data['endpoint'], None, data['priority'], None, data.get('request_id'))
+        job.id = data['id']
+        job.status = data['status']
+        job.created_at = data['created_at']
+        job.started_at = data.get('started_at')
+        job.finished_at = data.get('finished_at')
+        job.status_code = data.get('status_code')
+        job.result = data.get('result')
+        job.error = data.get('error')
+        return job
+
+    def view(self, include_result=False):
+        data = {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'status': self.status,
+            'priority': self.priority,
+            'request_id': self.request_id,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status in (SUCCEEDED, FAILED):
+            data['status_code'] = self.status_code
+            if self.error:
+                data['error'] = self.error
+            if include_result:
+                data['result'] = self.result
+        return data
+
+
+def parse_priority(value):
+    """Map "high"/"normal"/"low" to a queue rank; raises ValueError for anything else"""
+    if value is None:
+        return 'normal', PRIORITIES['normal']
+    if value not in PRIORITIES:
+        raise ValueError(f'priority must be one of: {", ".join(PRIORITIES)}')
+    return value, PRIORITIES[value]
+
+
+class JobQueue:
+    """
+    Priority queue of jobs served by a fixed pool of worker threads.
+
+    `run(endpoint, payload, request_id)` executes one job and returns (status_code, body).
+    Workers are started with the first submitted job. With a `store` (a
+    SQLiteCache shared by the worker processes), job status and results are
+    written there too, so get() finds jobs another process accepted.
+    """
+
+    def __init__(self, run, workers=WORKERS, retention=RETENTION, max_queued=MAX_QUEUED, store=None):
+        self.run = run
+        self.store = store
+        self.workers = workers
+        self.retention = retention
+        self.max_queued = max_queued
+        self.jobs = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def submit(self, endpoint, payload, priority=None, callback_url=None, request_id=None):
+        name, rank = parse_priority(priority)
+        job = Job(endpoint, payload, name, callback_url, request_id)
+        with self._condition:
+            self._purge()
+            if len(self._heap) >= self.max_queued:
+                raise QueueFull('Job queue is full')
+            self.jobs[job.id] = job
+            # Equal priorities run first come, first served
+            heapq.heappush(self._heap, (rank, next(self._sequence), job))
+            self._start_workers()
+            self._save(job)
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        with self._condition:
+            self._purge()
+            job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            # Accepted by another worker process
+            try:
+                data = self.store.get(KEY_PREFIX + job_id)
+            except sqlite3.Error as e:
+                print(f"Error reading job {job_id}: {str(e)}")
+                data = None
+            if data is not None:
+                job = Job.restore(codec.loads(data))
+        return job
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        try:
+            self.store.set(KEY_PREFIX + job.id, codec.dumps(job.view(include_result=True)), ttl=self.retention)
+        except sqlite3.Error as e:
+            print(f"Error saving job {job.id}: {str(e)}")
+
+    def depth(self):
+        with self._condition:
+            return len(self._heap)
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'job-worker-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                _, _, job = heapq.heappop(self._heap)
+                job.status = RUNNING
+                job.started_at = time.time()
+            self._save(job)
+            self._execute(job)
+
+    def _execute(self, job):
+        try:
+            status_code, body = self.run(job.endpoint, job.payload, job.request_id)
+        except Exception as e:
+            print(f"Error in job {job.id}: {str(e)}")
+            status_code, body = 500, {'error': f'An error occurred: {str(e)}'}
+        job.status_code = status_code
+        job.result = body
+        if not 200 <= status_code < 300:
+            job.error = body.get('error') if isinstance(body, dict) else None
+        job.finished_at = time.time()
+        job.status = SUCCEEDED if 200 <= status_code < 300 else FAILED
+        self._save(job)
+        if job.callback_url:
+            notify(job)
+
+
+def queue_from_env(run):
+    """The job queue, sharing job status and results through AI_JOB_DB when it is set"""
+    store = SQLiteCache(DB_PATH, ttl=RETENTION, max_rows=MAX_QUEUED * 10) if DB_PATH else None
+    return JobQueue(run, store=store)
+
+
+def _public(address):
+    address = ipaddress.ip_address(address.split('%')[0])
+    if getattr(address, 'ipv4_mapped', None):
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def callback_error(url, hosts=None):
+    """
+    Why `url` may not receive callbacks, or None when it may: it must be
+    http(s), and its host either in `hosts` (AI_JOB_CALLBACK_HOSTS) or, with
+    no allowlist, resolve only to public addresses.
+    """
+    hosts = CALLBACK_HOSTS if hosts is None else hosts
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        return 'callback_url must be an http(s) URL'
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        return 'callback_url is not a valid URL'
+    host = (parts.hostname or '').lower()
+    if not host:
+        return 'callback_url must name a host'
+    if hosts:
+        return None if host in hosts else 'callback_url host is not allowed'
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except (OSError, UnicodeError):
+        return 'callback_url host does not resolve'
+    if not addresses or not all(_public(address) for address in addresses):
+        return 'callback_url must resolve to a public address'
+    return None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """A redirect could point the callback at an address that was never checked"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+_callbacks = ThreadPoolExecutor(max_workers=CALLBACK_WORKERS, thread_name_prefix='job-callback')
+
+
+def notify(job):
+    """Queue the finished job, with its result, for a POST to its callback URL"""
+    _callbacks.submit(send_callback, job)
+
+
+def send_callback(job):
+    """POST the finished job to its callback URL, checking the URL again first (DNS may have changed)"""
+    problem = callback_error(job.callback_url)
+    if problem:
+        print(f"Error in job callback for {job.id}: {problem}")
+        return
+    data = codec.dumps(job.view(include_result=True)).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if job.request_id:
+        headers[tracing.REQUEST_ID_HEADER] = job.request_id
+    req = urllib.request.Request(job.callback_url, data=data, headers=headers)
+    try:
+        with _opener.open(req, timeout=CALLBACK_TIMEOUT) as resp:
+            resp.read()
+    except Exception as e:
+        print(f"Error in job callback for {job.id}: {str(e)}")
+
+
+def validate_submission(data):
+    """Check a POST /api/jobs body; returns an error message or None"""
+    if not data or 'endpoint' not in data:
+        return 'Missing required field: endpoint'
+    if data['endpoint'] not in JOB_ENDPOINTS:
+        return f'Unknown endpoint: {data["endpoint"]}'
+    if not isinstance(data.get('payload'), dict):
+        return 'Missing required field: payload'
+    callback_url = data.get('callback_url')
+    if callback_url is not None:
+        problem = callback_error(callback_url)
+        if problem:
+            return problem
+    try:
+        parse_priority(data.get('priority'))
+    except ValueError as e:
+        return str(e)
+    return None
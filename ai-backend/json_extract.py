@@ -0,0 +1,383 @@
+"""
+Extraction of JSON from model output.
+
+Models wrap JSON in code fences, add prose around it, leave trailing commas or
+use smart quotes. parse_model_json() scans code fences first and then the
+whole text for balanced top-level JSON values, applies cheap local repairs
+when a value does not parse as-is, and the per-endpoint validators check
+(and where possible fix up) the expected shape; a value the validator
+rejects is skipped in favour of the next one. A response is only rejected,
+and regenerated by the client, when none of that works.
+"""
+import json
+import re
+
+SMART_OPEN = '“'
+SMART_CLOSE = '”'
+
+# A fenced block, with or without a language tag
+FENCE = re.compile(r'```[A-Za-z0-9_-]*[ \t]*\n?(.*?)```', re.DOTALL)
+
+
+class ModelOutputError(ValueError):
+    """Model output did not contain the expected JSON; `doc` holds the raw text"""
+
+    def __init__(self, message, doc):
+        super().__init__(message)
+        self.doc = doc
+
+
+def find_json_value(text, start=0):
+    """
+    Return (begin, end) of the first balanced {...} or [...] at or after
+    `start`, or None. Quotes are only tracked inside a candidate, so stray
+    quotes in surrounding prose do not throw off the scan.
+    """
+    depth = 0
+    begin = None
+    closing = None
+    escape = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if closing:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == closing:
+                closing = None
+            continue
+        if depth and c == '"':
+            closing = '"'
+        elif depth and c == SMART_OPEN:
+            closing = SMART_CLOSE
+        elif c in '{[':
+            if depth == 0:
+                begin = i
+            depth += 1
+        elif c in '}]' and depth:
+            depth -= 1
+            if depth == 0:
+                return begin, i + 1
+    return None
+
+
+def repair_json(candidate):
+    """
+    Cheap, string-aware repairs in one pass: smart quotes used as string
+    delimiters, trailing commas before } or ], and Python literals.
+    """
+    out = []
+    closing = None
+    escape = False
+    i = 0
+    n = len(candidate)
+    while i < n:
+        c = candidate[i]
+        if closing:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == closing:
+                closing = None
+                c = '"'
+            elif c == '"' and closing == SMART_CLOSE:
+                # A straight quote inside a smart-quoted string must be escaped
+                c = '\\"'
+            out.append(c)
+            i += 1
+            continue
+        if c == '"':
+            closing = '"'
+        elif c == SMART_OPEN:
+            closing = SMART_CLOSE
+            c = '"'
+        elif c == ',':
+            j = i + 1
+            while j < n and candidate[j] in ' \t\r\n':
+                j += 1
+            if j < n and candidate[j] in '}]':
+                i += 1
+                continue
+        elif c.isalpha():
+            j = i
+            while j < n and candidate[j].isalpha():
+                j += 1
+            word = candidate[i:j]
+            out.append({'True': 'true', 'False': 'false', 'None': 'null'}.get(word, word))
+            i = j
+            continue
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+def _candidates(text):
+    """Balanced JSON values in the text, those inside code fences first"""
+    seen = set()
+    for region in [match.group(1) for match in FENCE.finditer(text)] + [text]:
+        position = 0
+        while True:
+            span = find_json_value(region, position)
+            if span is None:
+                break
+            position = span[1]
+            candidate = region[span[0]:span[1]]
+            if candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+
+def parse_model_json(text, validate=None):
+    """
+    Parse the first valid JSON object or array in model output, preferring
+    code fences. With `validate`, candidates it rejects are skipped (prose
+    such as "see section [1]" is valid JSON) and its result is returned.
+    """
+    error = 'No JSON object found in AI response'
+    rejected = None
+    for candidate in _candidates(text):
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            try:
+                data = json.loads(repair_json(candidate))
+            except json.JSONDecodeError as e:
+                error = f'Invalid JSON in AI response: {str(e)}'
+                continue
+        if validate is None:
+            return data
+        try:
+            return validate(data, text)
+        except ModelOutputError as e:
+            # The first shape error (fenced JSON comes first) says more than a parse error
+            rejected = rejected or e
+    raise rejected or ModelOutputError(error, text)
+
+
+def _require(condition, message, doc):
+    if not condition:
+        raise ModelOutputError(message, doc)
+
+
+def string_list(value):
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, list):
+        return [str(item) for item in value if item is not None]
+    return []
+
+
+def _fix_question(question, index):
+    """Normalize one multiple-choice question, or return None if it is unusable"""
+    if not isinstance(question, dict) or not isinstance(question.get('question'), str):
+        return None
+    options = question.get('options')
+    if not isinstance(options, list) or len(options) < 2:
+        return None
+    options = [str(option) for option in options]
+    answer = question.get('correct_answer')
+    if answer not in options and isinstance(answer, str):
+        answer = match_option(answer.strip(), options)
+    if answer not in options:
+        return None
+    return dict(question, id=question.get('id', index), options=options, correct_answer=answer)
+
+
+def match_option(answer, options):
+    """Map answers like "B", "B)", "Option B" or a case/whitespace variant onto an option"""
+    letter = answer.upper().replace('OPTION', '').strip(' .):')
+    if len(letter) == 1 and 'A' <= letter <= chr(ord('A') + len(options) - 1):
+        return options[ord(letter) - ord('A')]
+    folded = _strip_letter(answer).casefold()
+    for option in options:
+        # "A) Paris" vs "Paris"
+        if _strip_letter(option).casefold() == folded:
+            return option
+    return None
+
+
+def _strip_letter(option):
+    return re.sub(r'^[A-Da-d][.):]\s+', '', option.strip())
+
+
+def _questions(data, doc):
+    questions = data.get('questions')
+    _require(isinstance(questions, list), 'AI response is missing a "questions" list', doc)
+    fixed = [q for q in (_fix_question(q, i + 1) for i, q in enumerate(questions)) if q]
+    _require(fixed, 'AI response contained no valid questions', doc)
+    return fixed
+
+
+def validate_quiz(data, doc=None):
+    """{"questions": [{question, options, correct_answer, explanation}]}"""
+    if isinstance(data, list):
+        data = {'questions': data}
+    _require(isinstance(data, dict), 'AI response is not a JSON object', doc)
+    return dict(data, questions=_questions(data, doc))
+
+
+def validate_assessment(data, doc=None):
+    """{"assessment": {"title", "subject", "questions": [...]}}"""
+    _require(isinstance(data, dict), 'AI response is not a JSON object', doc)
+    # Accept the assessment without its wrapper object
+    assessment = data.get('assessment', data)
+    _require(isinstance(assessment, dict), 'AI response has an invalid "assessment"', doc)
+    return {'assessment': dict(assessment, questions=_questions(assessment, doc))}
+
+
+INTERVIEW_TYPES = ('technical', 'behavioral', 'situational')
+
+
+def validate_interview_questions(data, doc=None):
+    """{"questions": [{id, question, type, expectedPoints}]}"""
+    if isinstance(data, list):
+        data = {'questions': data}
+    _require(isinstance(data, dict), 'AI response is not a JSON object', doc)
+    questions = data.get('questions')
+    _require(isinstance(questions, list), 'AI response is missing a "questions" list', doc)
+    fixed = []
+    for index, question in enumerate(questions):
+        if not isinstance(question, dict) or not isinstance(question.get('question'), str):
+            continue
+        kind = str(question.get('type', '')).lower()
+        fixed.append(dict(
+            question,
+            id=question.get('id', index + 1),
+            type=kind if kind in INTERVIEW_TYPES else 'technical',
+            expectedPoints=string_list(question.get('expectedPoints'))
+        ))
+    _require(fixed, 'AI response contained no valid questions', doc)
+    return dict(data, questions=fixed)
+
+
+def coerce_score(value):
+    if isinstance(value, str):
+        value = value.split('/')[0].strip()
+    try:
+        return max(0, min(10, round(float(value), 1)))
+    except (TypeError, ValueError):
+        return None
+
+
+def fix_evaluation(data):
+    """Normalize one answer evaluation, or return None if it has no usable score/feedback"""
+    if not isinstance(data, dict):
+        return None
+    score = coerce_score(data.get('score'))
+    if score is None or not isinstance(data.get('feedback'), str):
+        return None
+    if float(score).is_integer():
+        score = int(score)
+    return dict(
+        data,
+        score=score,
+        strengths=string_list(data.get('strengths')),
+        improvements=string_list(data.get('improvements'))
+    )
+
+
+def validate_evaluation(data, doc=None):
+    """{"score": 0-10, "strengths": [...], "improvements": [...], "feedback": "..."}"""
+    fixed = fix_evaluation(data)
+    _require(fixed is not None, 'AI response is not a valid evaluation', doc)
+    return fixed
+
+
+def validate_evaluations(data, doc=None):
+    """{"evaluations": [{id, score, strengths, improvements, feedback}]}; items are checked per answer"""
+    if isinstance(data, list):
+        data = {'evaluations': data}
+    _require(isinstance(data, dict) and isinstance(data.get('evaluations'), list),
+             'AI response is missing an "evaluations" list', doc)
+    return data
+
+
+MODULE_KINDS = ('fundamentals', 'project', 'milestone')
+
+
+def _effort(value, default):
+    try:
+        effort = float(value)
+    except (TypeError, ValueError):
+        return default
+    return effort if 0 <= effort <= 52 else default
+
+
+def validate_learning_modules(data, doc=None):
+    """{"modules": [{kind, title, summary, objectives, resources, effort_weeks, core}]}"""
+    if isinstance(data, list):
+        data = {'modules': data}
+    _require(isinstance(data, dict), 'AI response is not a JSON object', doc)
+    modules = data.get('modules')
+    _require(isinstance(modules, list), 'AI response is missing a "modules" list', doc)
+    fixed = []
+    for module in modules:
+        if not isinstance(module, dict) or not isinstance(module.get('title'), str) or not module['title'].strip():
+            continue
+        kind = str(module.get('kind', '')).lower().rstrip('s')
+        kind = 'fundamentals' if kind == 'fundamental' else kind
+        kind = kind if kind in MODULE_KINDS else 'fundamentals'
+        fixed.append(dict(
+            module,
+            kind=kind,
+            summary=module.get('summary') if isinstance(module.get('summary'), str) else '',
+            objectives=string_list(module.get('objectives')),
+            resources=string_list(module.get('resources')),
+            effort_weeks=0 if kind == 'milestone' else _effort(module.get('effort_weeks'), 1) or 1,
+            core=module.get('core') is not False
+        ))
+    _require(any(module['kind'] != 'milestone' for module in fixed),
+             'AI response contained no valid modules', doc)
+    return dict(data, modules=fixed)
+
+
+def _years(value):
+    try:
+        years = round(float(value), 1)
+    except (TypeError, ValueError):
+        return None
+    return years if 0 <= years <= 70 else None
+
+
+def validate_resume_profile(data, doc=None):
+    """{headline, years_experience, skills, roles: [{title, organization, years, highlights}], projects, education, certifications}"""
+    _require(isinstance(data, dict), 'AI response is not a JSON object', doc)
+    roles = []
+    for role in data.get('roles') if isinstance(data.get('roles'), list) else []:
+        if not isinstance(role, dict) or not isinstance(role.get('title'), str) or not role['title'].strip():
+            continue
+        roles.append({
+            'title': role['title'].strip(),
+            'organization': role.get('organization') if isinstance(role.get('organization'), str) else '',
+            'years': _years(role.get('years')),
+            'highlights': string_list(role.get('highlights')),
+        })
+    fixed = {
+        'headline': data.get('headline') if isinstance(data.get('headline'), str) else '',
+        'years_experience': _years(data.get('years_experience')),
+        'skills': string_list(data.get('skills')),
+        'roles': roles,
+        'projects': string_list(data.get('projects')),
+        'education': string_list(data.get('education')),
+        'certifications': string_list(data.get('certifications')),
+    }
+    _require(fixed['skills'] or roles, 'AI response contained no skills or roles', doc)
+    return fixed
+
+
+def parser(validate):
+    """Build a `parse` callable for ModelClient: extract JSON, then validate its shape"""
+    def parse(text):
+        return parse_model_json(text, validate)
+    return parse
+
+
+parse_quiz = parser(validate_quiz)
+parse_assessment = parser(validate_assessment)
+parse_interview_questions = parser(validate_interview_questions)
+parse_evaluation = parser(validate_evaluation)
+parse_evaluations = parser(validate_evaluations)
+parse_learning_modules = parser(validate_learning_modules)
+parse_resume_profile = parser(validate_resume_profile)
@@ -0,0 +1,272 @@
+"""
+Composed learning paths for /api/generate-learning-path.
+
+Instead of a full generation for every (topic, level, duration, goal), a path
+is assembled from a module library generated once per topic and level:
+fundamentals, projects and milestones, each with an effort estimate in weeks.
+The library prompt depends only on the normalized topic and level, so the
+library is an ordinary cached generation and popular topics are served from
+the response cache.
+
+The requested duration is scheduled locally. Module efforts are scaled to
+the available weeks; when time is short, optional modules move to "Next
+Steps", and time to spare stretches the modules, less a capstone of up to
+MAX_CAPSTONE_WEEKS at the end. Durations in units the scheduler does not
+recognize are left to a full generation. The goal only drives a short
+personalization pass, which is skipped for the default goal and placed
+after the weekly plan, so a streamed path can send its modules first.
+"""
+import math
+import os
+import re
+
+from model_client import CACHE_HIT
+
+COMPOSE = os.getenv('AI_LEARNING_PATH_COMPOSE', '1') not in ('0', 'false')
+
+# With 0, the goal is only quoted in the path; no personalization call is made
+PERSONALIZE = os.getenv('AI_LEARNING_PATH_PERSONALIZE', '1') not in ('0', 'false')
+
+DEFAULT_GOAL = 'Master this topic'
+DEFAULT_WEEKS = 4
+MAX_WEEKS = 52
+
+# Weeks per unit in a duration like "10 days" or "3 months"; units under a week give the minimum
+UNIT_WEEKS = {'day': 1 / 7, 'week': 1, 'month': 52 / 12, 'year': 52, 'hour': 0, 'minute': 0}
+
+# Abbreviations; a bare "m" could mean minutes or months, so it is not recognized
+UNIT_ALIASES = {'d': 'day', 'w': 'week', 'wk': 'week', 'mo': 'month', 'mth': 'month', 'y': 'year', 'yr': 'year',
+                'h': 'hour', 'hr': 'hour', 'min': 'minute'}
+
+# Below this fraction of the library's nominal effort per week, optional modules are left out
+MIN_PACE = 0.5
+
+# Longest capstone; it takes at most half of the weeks beyond the modules' effort
+MAX_CAPSTONE_WEEKS = 2
+
+KIND_LABELS = {'fundamentals': 'Fundamentals', 'project': 'Project', 'milestone': 'Milestone'}
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+}
+
+DURATION = re.compile(
+    r'(\d+(?:\.\d+)?|\b(?:' + '|'.join(NUMBER_WORDS) + r')\b)\s*([a-z]+)?', re.IGNORECASE
+)
+
+
+def normalize(text):
+    return ' '.join(str(text or '').split()).lower()
+
+
+def library_key(topic, level):
+    """The (topic, level) the module library is generated for; equal keys share one library"""
+    return normalize(topic), normalize(level) or 'beginner'
+
+
+def is_default_goal(goal):
+    return not normalize(goal) or normalize(goal) == normalize(DEFAULT_GOAL)
+
+
+def _unit(word):
+    """The UNIT_WEEKS unit a word after a number names ("weeks", "mo"), "week" for none, else None"""
+    word = (word or 'week').lower()
+    for name in (word, word[:-1] if word.endswith('s') else word):
+        if name in UNIT_WEEKS:
+            return name
+        if name in UNIT_ALIASES:
+            return UNIT_ALIASES[name]
+    return None
+
+
+def parse_weeks(duration):
+    """
+    Whole weeks in a duration such as "6 weeks", "2 months", "10 days" or 8.
+    The first number with a recognized unit (or none) counts, so "6 to 8
+    weeks" is 8; raises ValueError when no number has one ("3m", "2 terms").
+    """
+    matches = DURATION.findall(str(duration or ''))
+    if not matches:
+        return DEFAULT_WEEKS
+    for number, word in matches:
+        unit = _unit(word)
+        if unit is None:
+            continue
+        number = number.lower()
+        count = NUMBER_WORDS[number] if number in NUMBER_WORDS else float(number)
+        return max(1, min(MAX_WEEKS, round(count * UNIT_WEEKS[unit])))
+    raise ValueError(f'Unrecognized duration: {duration}')
+
+
+def _week_range(start, end):
+    return f'Week {start}' if start == end else f'Weeks {start}-{end}'
+
+
+def _allocate(efforts, weeks):
+    """
+    Whole weeks per module, at least one each, summing to `weeks`, in
+    proportion to effort (largest remainder)
+    """
+    total = sum(efforts)
+    shares = [effort * weeks / total for effort in efforts]
+    counts = [max(1, math.floor(share)) for share in shares]
+    by_remainder = sorted(range(len(efforts)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[:max(0, weeks - sum(counts))]:
+        counts[i] += 1
+    while sum(counts) > weeks:
+        # Minimums pushed the total over; take weeks back from the longest modules
+        counts[max(range(len(counts)), key=lambda i: counts[i])] -= 1
+    return counts
+
+
+def schedule(modules, weeks):
+    """
+    Place modules on a `weeks`-week calendar, in library order.
+
+    Each module gets whole weeks in proportion to its effort; with fewer
+    weeks than modules, modules share weeks instead. Returns {"weeks",
+    "blocks": [{"start", "end", "module"}], "milestones": [{"week", "after",
+    "module"}], "next_steps": [module], "capstone": (start, end) or None};
+    a milestone comes `after` that many blocks.
+    """
+    work = [module for module in modules if module['kind'] != 'milestone']
+    next_steps = []
+    total = sum(module['effort_weeks'] for module in work)
+    if weeks < total * MIN_PACE:
+        core = [module for module in work if module['core']]
+        if core:
+            next_steps = [module for module in work if not module['core']]
+            work = core
+            total = sum(module['effort_weeks'] for module in work)
+    # Weeks the modules themselves fill: all of them, less a capstone when there is time to spare
+    spare = weeks - max(len(work), round(total))
+    planned = weeks - min(MAX_CAPSTONE_WEEKS, spare // 2) if spare > 0 else weeks
+
+    if planned >= len(work):
+        spans = _allocate([module['effort_weeks'] for module in work], planned)
+    else:
+        spans = None
+    skipped = {id(module) for module in next_steps}
+    blocks, milestones = [], []
+    cursor = 0.0
+    for module in modules:
+        if id(module) in skipped:
+            continue
+        if module['kind'] == 'milestone':
+            week = min(weeks, max(1, math.ceil(round(cursor, 6))))
+            milestones.append({'week': week, 'after': len(blocks), 'module': module})
+            continue
+        if spans is not None:
+            end = cursor + spans[len(blocks)]
+        else:
+            end = cursor + module['effort_weeks'] * planned / total
+        start_week = min(weeks, int(round(cursor, 6)) + 1)
+        end_week = min(weeks, max(start_week, math.ceil(round(end, 6))))
+        blocks.append({'start': start_week, 'end': end_week, 'module': module})
+        cursor = end
+
+    capstone = (planned + 1, weeks) if planned < weeks else None
+    return {'weeks': weeks, 'blocks': blocks, 'milestones': milestones, 'next_steps': next_steps,
+            'capstone': capstone}
+
+
+def outline(plan):
+    """One line per scheduled module, for the personalization prompt"""
+    lines = [f"- {_week_range(block['start'], block['end'])}: {block['module']['title']}"
+             f" ({KIND_LABELS[block['module']['kind']].lower()})" for block in plan['blocks']]
+    if plan['capstone']:
+        lines.append(f"- {_week_range(*plan['capstone'])}: capstone project and review")
+    return '\n'.join(lines)
+
+
+def _plural(count, noun):
+    return f'{count} {noun}' if count == 1 else f'{count} {noun}s'
+
+
+def _overview(topic, level, plan):
+    counts = {}
+    for block in plan['blocks']:
+        counts[block['module']['kind']] = counts.get(block['module']['kind'], 0) + 1
+    return (f"## Overview\n\nThis {plan['weeks']}-week path covers {topic} at the {level} level in "
+            f"{_plural(counts.get('fundamentals', 0), 'fundamentals module')} and "
+            f"{_plural(counts.get('project', 0), 'project')}, with "
+            f"{_plural(len(plan['milestones']), 'milestone')} to check progress along the way.")
+
+
+def _module_section(block):
+    module = block['module']
+    lines = [f"### {_week_range(block['start'], block['end'])}: {module['title']}",
+             '', f"*{KIND_LABELS[module['kind']]}*" + (f": {module['summary']}" if module['summary'] else '')]
+    if module['objectives']:
+        lines += ['', '**Objectives**'] + [f'- {objective}' for objective in module['objectives']]
+    if module['resources']:
+        lines += ['', '**Resources**'] + [f'- {resource}' for resource in module['resources']]
+    return '\n'.join(lines)
+
+
+def _milestone_line(item):
+    module = item['module']
+    return f"**Milestone (end of week {item['week']}):** {module['title']}" + (
+        f" - {module['summary']}" if module['summary'] else ''
+    )
+
+
+def render_plan(topic, level, goal, plan):
+    """The path's Markdown sections up to the end of the weekly plan"""
+    sections = [
+        f'# Learning Path: {topic}',
+        f"**Skill Level:** {level} | **Duration:** {_plural(plan['weeks'], 'week')} | **Goal:** {goal}",
+        _overview(topic, level, plan),
+        '## Weekly Plan',
+    ]
+    for index, block in enumerate(plan['blocks']):
+        sections += [_milestone_line(item) for item in plan['milestones'] if item['after'] == index]
+        sections.append(_module_section(block))
+    sections += [_milestone_line(item) for item in plan['milestones'] if item['after'] == len(plan['blocks'])]
+    if plan['capstone']:
+        projects = [block['module']['title'] for block in plan['blocks'] if block['module']['kind'] == 'project']
+        extend = f" Extend {projects[-1]} or combine the projects above" if projects else ' Build a project of your own'
+        sections.append(f"### {_week_range(*plan['capstone'])}: Capstone and Review\n\n"
+                        f"*Project*:{extend} into a portfolio piece, and revisit the objectives you found hardest.")
+    return sections
+
+
+def render_tail(plan):
+    """The sections after the weekly plan (and the personalization): milestones and next steps"""
+    sections = []
+    if plan['milestones']:
+        sections.append('## Milestones\n\n' + '\n'.join(
+            f"- **Week {item['week']}:** {item['module']['title']}" for item in plan['milestones']
+        ))
+    if plan['next_steps']:
+        sections.append('## Next Steps\n\nOptional modules to continue with once the path is complete:\n\n' + '\n'.join(
+            f"- **{module['title']}**" + (f": {module['summary']}" if module['summary'] else '')
+            for module in plan['next_steps']
+        ))
+    return sections
+
+
+def render(topic, level, goal, plan, personalization=None):
+    """The learning path as Markdown"""
+    sections = render_plan(topic, level, goal, plan)
+    if personalization:
+        sections.append(personalization.strip())
+    return '\n\n'.join(sections + render_tail(plan))
+
+
+def composition(plan, personalized):
+    """What the composed path contains, for the response metadata"""
+    return {
+        'weeks': plan['weeks'],
+        'modules': len(plan['blocks']),
+        'milestones': len(plan['milestones']),
+        'next_steps': len(plan['next_steps']),
+        'capstone_weeks': plan['capstone'][1] - plan['capstone'][0] + 1 if plan['capstone'] else 0,
+        'personalized': personalized,
+    }
+
+
+def combined_status(*statuses):
+    """HIT when every generation behind the path came from the cache, otherwise the first other status"""
+    return next((status for status in statuses if status and status != CACHE_HIT), CACHE_HIT)
@@ -0,0 +1,305 @@
+"""
+Lightweight Prometheus metrics for the AI backend, exposed at /metrics.
+
+Every metric keeps one shard per thread, so recording a value only touches
+the calling thread's own dict; no lock is taken on the hot path. Shards are
+summed when /metrics is scraped. When a thread exits its shard is folded into
+the metric's base totals, so short-lived threads do not accumulate shards.
+"""
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request latencies range from cached hits (ms) to long generations (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Sentinel:
+    """Weak-referenceable marker for a thread's shard"""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._base = {}
+        self._shards = []
+        # Re-entrant: a shard can be retired by garbage collection while the lock is held
+        self._shards_lock = threading.RLock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            # Taken once per thread, not per observation
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            # Only the thread-local holds the sentinel, so it dies with the thread
+            self._local.sentinel = sentinel = _Sentinel()
+            weakref.finalize(sentinel, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        """Fold an exited thread's shard into the base totals"""
+        with self._shards_lock:
+            self._shards = [s for s in self._shards if s is not shard]
+            self._merge(self._base, shard)
+
+    def _snapshots(self):
+        with self._shards_lock:
+            base = {}
+            self._merge(base, self._base)
+            shards = list(self._shards)
+        # dict.copy() is atomic under the GIL, so a writer cannot break the scrape
+        return [base] + [shard.copy() for shard in shards]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    @staticmethod
+    def _merge(totals, shard):
+        for labels, value in list(shard.items()):
+            totals[labels] = totals.get(labels, 0) + value
+
+    def _totals(self):
+        totals = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+        return totals
+
+    def _samples(self):
+        for labels, value in sorted(self._totals().items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels):
+        """Count the enclosed block as in progress"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # [bucket counts..., +Inf count, sum]
+            entry = shard[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[i] += 1
+                break
+        else:
+            entry[len(self.buckets)] += 1
+        entry[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    @staticmethod
+    def _merge(totals, shard):
+        for labels, entry in list(shard.items()):
+            total = totals.setdefault(labels, [0] * len(entry))
+            for i, value in enumerate(list(entry)):
+                total[i] += value
+
+    def _samples(self):
+        totals = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+        for labels, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(entry[-1])}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'ai_http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status')
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    'ai_http_request_duration_seconds', 'HTTP request latency by route', ('route',)
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    'ai_http_requests_in_flight', 'HTTP requests currently being served', ('route',)
+))
+UPSTREAM_LATENCY = REGISTRY.register(Histogram(
+    'ai_upstream_request_duration_seconds', 'Gemini call latency by endpoint and outcome', ('endpoint', 'outcome')
+))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    'ai_upstream_requests_in_flight', 'Gemini calls currently in progress', ('endpoint',)
+))
+PROMPT_CHARS = REGISTRY.register(Counter(
+    'ai_upstream_prompt_chars_total', 'Characters sent to Gemini', ('endpoint',)
+))
+RESPONSE_CHARS = REGISTRY.register(Counter(
+    'ai_upstream_response_chars_total', 'Characters received from Gemini', ('endpoint',)
+))
+CACHE_RESULTS = REGISTRY.register(Counter(
+    'ai_cache_results_total', 'Response cache outcomes by endpoint', ('endpoint', 'status')
+))
+JSON_PARSE_FAILURES = REGISTRY.register(Counter(
+    'ai_json_parse_failures_total', 'Model responses that could not be parsed as the expected JSON', ('endpoint',)
+))
+STRUCTURED_REPAIRS = REGISTRY.register(Counter(
+    'ai_structured_repairs_total', 'Repair requests for structured output by endpoint and kind', ('endpoint', 'kind')
+))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    'ai_admission_rejections_total', 'Requests rejected by admission control by endpoint and reason', ('endpoint', 'reason')
+))
+ADMISSION_QUEUE = REGISTRY.register(Gauge(
+    'ai_admission_queue_depth', 'Requests waiting for an admission slot by traffic class', ('class',)
+))
+UPSTREAM_RETRIES = REGISTRY.register(Counter(
+    'ai_upstream_retries_total', 'Upstream retries and hedges sent, and retries refused by the budget', ('endpoint', 'kind')
+))
+HEDGE_WINS = REGISTRY.register(Counter(
+    'ai_upstream_hedge_wins_total', 'Which call answered first when a request was hedged', ('endpoint', 'winner')
+))
+BREAKER_OPEN = REGISTRY.register(Gauge(
+    'ai_circuit_breaker_open', '1 while the upstream circuit breaker is open or half-open'
+))
+BREAKER_REJECTIONS = REGISTRY.register(Counter(
+    'ai_circuit_breaker_rejections_total', 'Upstream calls failed fast by the open circuit breaker'
+))
+PROMPT_COMPACTIONS = REGISTRY.register(Counter(
+    'ai_prompt_compactions_total', 'Inputs compacted to fit the endpoint prompt budget', ('endpoint',)
+))
+PROMPT_TOKENS_SAVED = REGISTRY.register(Counter(
+    'ai_prompt_tokens_saved_total', 'Estimated prompt tokens removed by compaction', ('endpoint',)
+))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    'ai_startup_seconds', 'Seconds from process start until each start-up phase was reached', ('phase',)
+))
+SIMILAR_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'ai_similar_cache_lookups_total', 'Near-duplicate explain-concept lookups by result', ('result',)
+))
+SIMILAR_CACHE_SIMILARITY = REGISTRY.register(Histogram(
+    'ai_similar_cache_similarity', 'Best candidate similarity per near-duplicate lookup',
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0)
+))
+
+REQUEST_PHASE_SECONDS = REGISTRY.register(Histogram(
+    'ai_request_phase_seconds', 'Time per request spent in each traced phase, by route', ('route', 'phase')
+))
+SLOW_REQUESTS = REGISTRY.register(Counter(
+    'ai_slow_requests_total', 'Requests slower than AI_SLOW_REQUEST_MS by route', ('route',)
+))
+
+SUMMARY_PARTIAL_LOOKUPS = REGISTRY.register(Counter(
+    'ai_summary_partial_lookups_total', 'Stored partial summary lookups for incremental notes by result', ('result',)
+))
+RESUME_PROFILE_LOOKUPS = REGISTRY.register(Counter(
+    'ai_resume_profile_lookups_total', 'Resume profile cache lookups by result', ('result',)
+))
+RESUME_PROFILE_EXTRACTIONS = REGISTRY.register(Counter(
+    'ai_resume_profile_extractions_total', 'Resume profiles extracted by outcome', ('outcome',)
+))
+
+MODEL_POOL_REQUESTS = REGISTRY.register(Counter(
+    'ai_model_pool_requests_total', 'Upstream requests per model pool member by outcome', ('tier', 'member', 'outcome')
+))
+MODEL_POOL_FAILOVERS = REGISTRY.register(Counter(
+    'ai_model_pool_failovers_total', 'Requests sent to a later tier than their route\'s first', ('endpoint', 'from_tier', 'to_tier')
+))
+MODEL_POOL_COOLDOWNS = REGISTRY.register(Counter(
+    'ai_model_pool_cooldowns_total', 'Times a pool member was rested, by reason', ('tier', 'member', 'reason')
+))
+MODEL_POOL_EXHAUSTED = REGISTRY.register(Counter(
+    'ai_model_pool_exhausted_total', 'Calls failed because every member of the route was resting', ('endpoint',)
+))
+CLIENT_DISCONNECTS = REGISTRY.register(Counter(
+    'ai_client_disconnects_total', 'Requests whose client went away before the response was complete', ('route', 'stage')
+))
+UPSTREAM_CANCELLED = REGISTRY.register(Counter(
+    'ai_upstream_cancelled_total', 'Upstream work stopped or not started because nobody was waiting for it',
+    ('endpoint', 'kind')
+))
+
+
+def record_request(route, method, status, seconds):
+    HTTP_REQUESTS.inc(route, method, str(status))
+    HTTP_LATENCY.observe(seconds, route)
+
+
+def record_upstream(endpoint, seconds, prompt, text, error=None, cancelled=False):
+    outcome = 'cancelled' if cancelled else 'error' if error is not None else 'ok'
+    UPSTREAM_LATENCY.observe(seconds, endpoint, outcome)
+    PROMPT_CHARS.inc(endpoint, amount=len(prompt))
+    if text:
+        RESPONSE_CHARS.inc(endpoint, amount=len(text))
@@ -0,0 +1,538 @@
+import asyncio
+import contextlib
+import os
+import threading
+import time
+import warnings
+
+import cancellation
+import metrics
+import startup
+import tracing
+from cache import cache_from_env, make_cache_key
+from concurrency import limits_from_env
+from model_pool import pool_from_env
+from resilience import Resilience, resilience_from_env
+from singleflight import FileLock, SingleFlight, lock_dir_from_env
+from structured import MAX_REPAIRS, STRUCTURED_OUTPUT, run_steps, run_steps_async
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+# Build the model in the background as soon as the server starts; with 0 the first request (or readiness probe) builds it
+WARM_UP = os.getenv('AI_WARM_UP', '1') not in ('0', 'false')
+
+CACHE_HIT = 'HIT'
+CACHE_MISS = 'MISS'
+CACHE_BYPASS = 'BYPASS'
+CACHE_COALESCED = 'COALESCED'
+
+
+class ModelClient:
+    """
+    Wraps the Gemini model so every route goes through one place.
+    Responses are cached by (endpoint, model name, normalized prompt).
+    The async methods additionally hold an upstream slot from `limits`.
+
+    Identical requests that arrive while a generation is in flight wait for
+    it instead of starting their own (single-flight). With `lock_dir` set,
+    worker processes sharing a disk cache also coalesce through lock files.
+
+    Upstream calls run under `resilience`: timeouts, retries, the circuit
+    breaker and hedging.
+
+    With `load` instead of a model, the model is built on first use or by
+    warm_up(), so importing the server stays fast and a missing key does not
+    stop it from answering health checks.
+
+    With a `pool` (model_pool.py), each upstream request goes to the member
+    its endpoint is routed to instead of a single model.
+    """
+
+    def __init__(self, model, model_name, cache=None, limits=None, lock_dir=None, resilience=None, load=None,
+                 pool=None):
+        self._model = model
+        self._load = load
+        self._load_lock = threading.Lock()
+        self._warming = False
+        self.load_seconds = None
+        self.load_error = None
+        self.model_name = model_name
+        self.cache = cache
+        self.limits = limits
+        self.lock_dir = lock_dir
+        self.resilience = resilience or Resilience()
+        self.flights = SingleFlight()
+        self.pool = pool
+
+    @property
+    def model(self):
+        return self._model if self._model is not None else self.warm_up()
+
+    async def _model_async(self):
+        """The model; built on a worker thread when needed so the event loop never waits on the SDK import"""
+        if self._model is not None:
+            return self._model
+        return await asyncio.to_thread(self.warm_up)
+
+    def warm_up(self):
+        """Build the model now if it is not built yet; raises whatever building it raised"""
+        with self._load_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                try:
+                    self._model = self._load()
+                except Exception as e:
+                    self.load_error = str(e)
+                    raise
+                self.load_error = None
+                self.load_seconds = round(time.perf_counter() - start, 4)
+                startup.mark('model_ready')
+        return self._model
+
+    def start_warm_up(self):
+        """Build the model on a background thread, unless it is built or being built"""
+        with self._load_lock:
+            if self._model is not None or self._warming:
+                return
+            self._warming = True
+        threading.Thread(target=self._warm_up_in_background, name='model-warm-up', daemon=True).start()
+
+    def _warm_up_in_background(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            print(f"Error warming up the model client: {str(e)}")
+        finally:
+            self._warming = False
+
+    def readiness(self):
+        """Whether the model is built; starts building it when nothing has yet"""
+        if self._model is None:
+            self.start_warm_up()
+        return {
+            'ready': self._model is not None,
+            'model': self.model_name,
+            'load_seconds': self.load_seconds,
+            'error': self.load_error,
+            'pool': self.pool.status() if self.pool is not None else None,
+        }
+
+    @contextlib.contextmanager
+    def _upstream(self, endpoint):
+        """The model for one upstream request: the pool member routed to, or the single model"""
+        if self.pool is None:
+            yield self.model
+            return
+        with self.pool.lease(endpoint) as lease:
+            yield lease.model
+
+    @contextlib.asynccontextmanager
+    async def _upstream_async(self, endpoint):
+        if self.pool is None:
+            yield await self._model_async()
+            return
+        with await self.pool.lease_async(endpoint) as lease:
+            yield lease.model
+
+    def cache_key(self, endpoint, prompt):
+        return make_cache_key(endpoint, self.model_name, prompt)
+
+    def _cached(self, key, use_cache):
+        if self.cache is None or not use_cache:
+            return None
+        return self.cache.get(key)
+
+    def _store(self, key, text):
+        if self.cache is not None and text:
+            self.cache.set(key, text)
+
+    def _status(self, use_cache):
+        return CACHE_MISS if use_cache else CACHE_BYPASS
+
+    def _process_lock(self, key):
+        if not self.lock_dir:
+            return contextlib.nullcontext()
+        return FileLock(self.lock_dir, key)
+
+    @staticmethod
+    def _flight_status(endpoint, result, shared):
+        text, status = result
+        if shared and status != CACHE_HIT:
+            status = CACHE_COALESCED
+        metrics.CACHE_RESULTS.inc(endpoint, status)
+        return text, status
+
+    def _hit(self, endpoint):
+        metrics.CACHE_RESULTS.inc(endpoint, CACHE_HIT)
+        return CACHE_HIT
+
+    @staticmethod
+    def _validate(endpoint, parse, text):
+        """Run `parse` on fresh model output so invalid output is counted and never cached"""
+        if parse is None:
+            return
+        try:
+            parse(text)
+        except ValueError:
+            metrics.JSON_PARSE_FAILURES.inc(endpoint)
+            raise
+
+    @staticmethod
+    def _request_kwargs(generation_config, timeout=None):
+        kwargs = {'generation_config': generation_config} if generation_config else {}
+        if timeout is not None:
+            kwargs['request_options'] = {'timeout': timeout}
+        return kwargs
+
+    @staticmethod
+    def _repair_config(schema):
+        if not STRUCTURED_OUTPUT:
+            return None
+        return {'response_mime_type': 'application/json', 'response_schema': schema}
+
+    def _call_model(self, endpoint, prompt, generation_config=None):
+        """One upstream generation, with timeouts, retries and hedging"""
+        tracing.note_prompt(prompt)
+        with tracing.phase('model'):
+            text = self.resilience.call(
+                endpoint, lambda timeout: self._attempt(endpoint, prompt, generation_config, timeout)
+            )
+        tracing.note_output(text)
+        return text
+
+    def _attempt(self, endpoint, prompt, generation_config, timeout):
+        """One upstream request, recorded in the upstream metrics"""
+        start = time.perf_counter()
+        text, error = '', None
+        with metrics.UPSTREAM_IN_FLIGHT.track(endpoint):
+            try:
+                with self._upstream(endpoint) as model:
+                    response = model.generate_content(prompt, **self._request_kwargs(generation_config, timeout))
+                    text = response.text.strip() if response and response.text else ''
+                return text
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                metrics.record_upstream(endpoint, time.perf_counter() - start, prompt, text, error)
+
+    async def _call_model_async(self, endpoint, prompt, generation_config=None):
+        tracing.note_prompt(prompt)
+        with tracing.phase('model'):
+            text = await self.resilience.call_async(
+                endpoint, lambda timeout: self._attempt_async(endpoint, prompt, generation_config, timeout)
+            )
+        tracing.note_output(text)
+        return text
+
+    async def _attempt_async(self, endpoint, prompt, generation_config, timeout):
+        start = time.perf_counter()
+        text, error = '', None
+        with metrics.UPSTREAM_IN_FLIGHT.track(endpoint):
+            try:
+                async with self._upstream_async(endpoint) as model:
+                    response = await model.generate_content_async(
+                        prompt, **self._request_kwargs(generation_config, timeout)
+                    )
+                    text = response.text.strip() if response and response.text else ''
+                return text
+            except asyncio.CancelledError as e:
+                # The client went away (or this was a losing hedge); the slot is released as the call unwinds
+                error = e
+                metrics.UPSTREAM_CANCELLED.inc(endpoint, 'cancelled')
+                raise
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                metrics.record_upstream(endpoint, time.perf_counter() - start, prompt, text, error,
+                                        cancelled=isinstance(error, asyncio.CancelledError))
+
+    def _structure(self, endpoint, structured, text):
+        """Run the spec's repair requests on fresh output; returns the repaired text"""
+        if structured is None or not text or MAX_REPAIRS <= 0:
+            return text
+
+        def ask(prompt, schema):
+            cancellation.check(endpoint + '-repair')
+            return self._call_model(endpoint + '-repair', prompt, self._repair_config(schema))
+
+        return run_steps(structured.repair_steps(text), ask)
+
+    async def _structure_async(self, endpoint, structured, text):
+        if structured is None or not text or MAX_REPAIRS <= 0:
+            return text
+
+        async def ask(prompt, schema):
+            async with self.limits.slot(endpoint):
+                return await self._call_model_async(endpoint + '-repair', prompt, self._repair_config(schema))
+
+        return await run_steps_async(structured.repair_steps(text), ask)
+
+    def generate(self, endpoint, prompt, parse=None, use_cache=True, structured=None):
+        """
+        Generate text for a prompt, serving repeats from the cache.
+
+        When `parse` is given it is applied to the text and its result is
+        returned; empty output and output that fails to parse are never cached.
+        `structured` is a spec from structured.py: its response schema is sent
+        with the request and its repair steps run before validation.
+        Concurrent identical calls share one generation, and its errors.
+        Returns a (value, cache_status) tuple.
+        """
+        if parse is not None:
+            parse = tracing.traced('extract')(parse)
+        key = self.cache_key(endpoint, prompt)
+        cached = self._cached(key, use_cache)
+        if cached is not None:
+            return (parse(cached) if parse else cached), self._hit(endpoint)
+
+        # Nothing is started for a client that has gone, and waiting on a shared generation stops when it goes
+        cancellation.check(endpoint)
+        text, status = self._flight_status(endpoint, *self.flights.do(
+            key, lambda: self._generate_once(endpoint, key, prompt, parse, use_cache, structured),
+            wait=lambda done: cancellation.wait(endpoint, done),
+        ))
+        return (parse(text) if parse else text), status
+
+    def _generate_once(self, endpoint, key, prompt, parse, use_cache, structured):
+        # Retries and repairs stop for a disconnected client, unless another request shares the generation
+        with self._process_lock(key), cancellation.shared(lambda: self.flights.shared(key)):
+            # Another worker process may have finished this generation while we waited
+            cached = self._cached(key, use_cache)
+            if cached is not None:
+                return cached, CACHE_HIT
+
+            text = self._call_model(endpoint, prompt, structured and structured.generation_config())
+            text = self._structure(endpoint, structured, text)
+            # Validate before caching; a parse error reaches every waiter
+            self._validate(endpoint, parse, text)
+            self._store(key, text)
+            return text, self._status(use_cache)
+
+    def stream(self, endpoint, prompt, use_cache=True):
+        """
+        Stream a generation as text chunks.
+
+        Returns a (chunks, cache_status) tuple. A cache hit yields the stored
+        text as a single chunk; otherwise chunks come straight from the model
+        and the complete text is cached once the stream finishes.
+        """
+        key = self.cache_key(endpoint, prompt)
+        cached = self._cached(key, use_cache)
+        if cached is not None:
+            return iter([cached]), self._hit(endpoint)
+
+        cancellation.check(endpoint)
+        status = self._status(use_cache)
+        metrics.CACHE_RESULTS.inc(endpoint, status)
+        return self._stream_from_model(endpoint, key, prompt), status
+
+    def _stream_from_model(self, endpoint, key, prompt):
+        parts = []
+        # Streams are not retried or hedged (chunks are already sent), but respect the breaker
+        self.resilience.breaker.allow()
+        start = time.perf_counter()
+        error, response = None, None
+        with metrics.UPSTREAM_IN_FLIGHT.track(endpoint):
+            try:
+                with self._upstream(endpoint) as model:
+                    response = model.generate_content(prompt, stream=True)
+                    for chunk in response:
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            # Chunks without text parts (e.g. the final finish-reason chunk)
+                            continue
+                        if text:
+                            parts.append(text)
+                            yield text
+            except GeneratorExit as e:
+                # The response was closed early: stop reading (and generating) the rest
+                error = e
+                metrics.UPSTREAM_CANCELLED.inc(endpoint, 'stream')
+                _close_stream(response)
+                raise
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                cancelled = isinstance(error, GeneratorExit)
+                if cancelled:
+                    # No answer either way; a half-open breaker lets another call probe
+                    self.resilience.breaker.abandon()
+                else:
+                    self.resilience.record(error)
+                metrics.record_upstream(endpoint, time.perf_counter() - start, prompt, ''.join(parts), error,
+                                        cancelled=cancelled)
+                # Includes the time the client took to read each chunk
+                tracing.add('model', time.perf_counter() - start)
+                tracing.note_prompt(prompt)
+                tracing.note_output(''.join(parts))
+
+        self._store(key, ''.join(parts).strip())
+
+    async def generate_async(self, endpoint, prompt, parse=None, use_cache=True, structured=None):
+        """Async variant of generate() that waits for an upstream slot instead of a thread"""
+        if parse is not None:
+            parse = tracing.traced('extract')(parse)
+        key = self.cache_key(endpoint, prompt)
+        cached = self._cached(key, use_cache)
+        if cached is not None:
+            return (parse(cached) if parse else cached), self._hit(endpoint)
+
+        text, status = self._flight_status(endpoint, *await self.flights.do_async(
+            key, lambda: self._generate_once_async(endpoint, key, prompt, parse, use_cache, structured)
+        ))
+        return (parse(text) if parse else text), status
+
+    async def _generate_once_async(self, endpoint, key, prompt, parse, use_cache, structured):
+        lock = self._process_lock(key)
+        acquiring = asyncio.ensure_future(asyncio.to_thread(lock.__enter__))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The thread still takes the lock; give it back as soon as it has
+            acquiring.add_done_callback(lambda _: lock.__exit__(None, None, None))
+            raise
+        try:
+            cached = self._cached(key, use_cache)
+            if cached is not None:
+                return cached, CACHE_HIT
+
+            async with self.limits.slot(endpoint):
+                text = await self._call_model_async(endpoint, prompt, structured and structured.generation_config())
+            text = await self._structure_async(endpoint, structured, text)
+            self._validate(endpoint, parse, text)
+            self._store(key, text)
+            return text, self._status(use_cache)
+        finally:
+            lock.__exit__(None, None, None)
+
+    def stream_async(self, endpoint, prompt, use_cache=True):
+        """Async variant of stream(); returns an async iterator of text chunks"""
+        key = self.cache_key(endpoint, prompt)
+        cached = self._cached(key, use_cache)
+        if cached is not None:
+            return _single_chunk(cached), self._hit(endpoint)
+
+        status = self._status(use_cache)
+        metrics.CACHE_RESULTS.inc(endpoint, status)
+        return self._stream_from_model_async(endpoint, key, prompt), status
+
+    async def _stream_from_model_async(self, endpoint, key, prompt):
+        parts = []
+        async with self.limits.slot(endpoint):
+            # Taken once the slot is held, so a stream cancelled while queued never holds the probe
+            self.resilience.breaker.allow()
+            start = time.perf_counter()
+            error, response = None, None
+            with metrics.UPSTREAM_IN_FLIGHT.track(endpoint):
+                try:
+                    async with self._upstream_async(endpoint) as model:
+                        response = await model.generate_content_async(prompt, stream=True)
+                        async for chunk in response:
+                            try:
+                                text = chunk.text
+                            except ValueError:
+                                continue
+                            if text:
+                                parts.append(text)
+                                yield text
+                except (GeneratorExit, asyncio.CancelledError) as e:
+                    # The response was closed early or the client went away; the slot is released below
+                    error = e
+                    metrics.UPSTREAM_CANCELLED.inc(endpoint, 'stream')
+                    _close_stream(response)
+                    raise
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    cancelled = isinstance(error, (GeneratorExit, asyncio.CancelledError))
+                    if cancelled:
+                        self.resilience.breaker.abandon()
+                    else:
+                        self.resilience.record(error)
+                    metrics.record_upstream(endpoint, time.perf_counter() - start, prompt, ''.join(parts), error,
+                                            cancelled=cancelled)
+                    tracing.add('model', time.perf_counter() - start)
+                    tracing.note_prompt(prompt)
+                    tracing.note_output(''.join(parts))
+
+        self._store(key, ''.join(parts).strip())
+
+
+async def _single_chunk(text):
+    yield text
+
+
+def _close_stream(response):
+    """Stop an upstream stream nobody reads any more: cancel the RPC (or close the generator) behind it"""
+    for target in (getattr(response, '_iterator', None), response):
+        for name in ('cancel', 'close'):
+            method = getattr(target, name, None)
+            if callable(method):
+                try:
+                    method()
+                except Exception as e:
+                    print(f"Error closing upstream stream: {str(e)}")
+                return
+
+
+def model_backend():
+    """
+    The model backend selected by AI_MODEL_BACKEND: `gemini` (default) or
+    `stub`, an offline stand-in that needs no API key. Returns a
+    (load, model_name) tuple; the SDK is only imported when `load()` runs.
+    """
+    backend = os.getenv('AI_MODEL_BACKEND', 'gemini')
+    if backend == 'stub':
+        from stub_model import STUB_MODEL_NAME, stub_from_env
+        return stub_from_env, STUB_MODEL_NAME
+    if backend != 'gemini':
+        raise ValueError(f"Unknown AI_MODEL_BACKEND: {backend}")
+    return _load_gemini, MODEL_NAME
+
+
+def _load_gemini():
+    import google.generativeai as genai
+
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+    # Suppress the warnings about private imports
+    warnings.filterwarnings("ignore", module="google.generativeai")
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+def create_model():
+    """Build the selected model backend now; returns a (model, model_name) tuple"""
+    load, model_name = model_backend()
+    return load(), model_name
+
+
+def create_client():
+    """
+    Build the shared client with its response cache, upstream limits and
+    failure policy. The model backend itself is built lazily (see warm_up);
+    with AI_MODEL_POOL set, it is the configured pool of models and keys.
+    """
+    pool = pool_from_env()
+    if pool is not None:
+        load, model_name = pool.warm_up, pool.name
+    else:
+        load, model_name = model_backend()
+    return ModelClient(
+        None,
+        model_name,
+        cache=cache_from_env(),
+        limits=limits_from_env(),
+        lock_dir=lock_dir_from_env(),
+        resilience=resilience_from_env(pool),
+        load=load,
+        pool=pool
+    )
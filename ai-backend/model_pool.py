@@ -0,0 +1,435 @@
+"""
+A pool of models and API keys behind one ModelClient, selected with AI_MODEL_POOL.
+
+AI_MODEL_POOL is the path of a JSON file (or the JSON itself) with tiers and
+a routing table:
+
+    {
+      "tiers": {
+        "quality": {"model": "gemini-2.5-flash", "keys": ["GEMINI_API_KEY", "GEMINI_API_KEY_2"],
+                    "max_in_flight": 8, "rpm": 60},
+        "fast": {"model": "gemini-2.5-flash-lite", "keys": ["GEMINI_API_KEY"], "max_in_flight": 16},
+        "local": {"backend": "stub", "latency": "fixed:0.05"}
+      },
+      "routes": {
+        "default": ["quality", "fast"],
+        "explain-concept": ["fast", "quality"]
+      }
+    }
+
+Keys are named by environment variable, so the file holds no secrets. Each
+(tier, key) pair is a member with its own model, in-flight count, requests
+per minute and health:
+
+- a request goes to the first tier in its route with an available member,
+  and within a tier to the member with the fewest requests in flight
+- a member is saturated at `max_in_flight` requests or `rpm` requests in the
+  last minute; when a whole tier is, requests fail over to the next tier
+- a quota error (429 / ResourceExhausted) rests the key for AI_POOL_QUOTA_COOLDOWN
+  seconds
+- each member has its own circuit breaker: AI_POOL_FAILURE_THRESHOLD
+  transient failures in a row open it for AI_POOL_FAILURE_COOLDOWN seconds,
+  then one probe request decides whether the member is healthy again, so a
+  failing key never stops the healthy ones (the upstream-wide breaker in
+  resilience.py is not used with a pool)
+- when every member is saturated the least loaded one still takes the
+  request; only when every member is resting does the call fail (and is
+  retried by resilience.py like any transient error)
+
+Routes are looked up by endpoint, then without a `-repair` suffix, then
+`default`; without a `default` route every tier is used in file order.
+
+The SDK only takes an API key process-wide (genai.configure). A pool whose
+members all use one key uses exactly that; giving members different keys
+relies on the SDK's private per-model client, so it is limited to the
+google-generativeai versions in KEYED_SDK_VERSIONS and refused on others.
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+
+import metrics
+from resilience import CircuitBreaker, is_transient
+
+# Seconds a key rests after a quota error
+QUOTA_COOLDOWN = float(os.getenv('AI_POOL_QUOTA_COOLDOWN', 60))
+
+# Consecutive transient failures that open a member's breaker, and for how many seconds
+FAILURE_THRESHOLD = int(os.getenv('AI_POOL_FAILURE_THRESHOLD', 3))
+FAILURE_COOLDOWN = float(os.getenv('AI_POOL_FAILURE_COOLDOWN', 15))
+
+QUOTA_ERRORS = ('ResourceExhausted', 'TooManyRequests')
+
+# Requests per minute are counted over this many seconds
+RATE_WINDOW = 60.0
+
+DEFAULT_ROUTE = 'default'
+
+# SDK versions whose private per-model client attributes _KeyedModel sets
+KEYED_SDK_VERSIONS = ('0.8.3',)
+
+
+class PoolExhausted(RuntimeError):
+    """Every member the endpoint routes to is resting"""
+
+
+def is_quota_error(error):
+    return type(error).__name__ in QUOTA_ERRORS
+
+
+class _KeyedModel:
+    """
+    A Gemini model whose requests use one API key instead of the process-wide
+    genai.configure() key. The SDK has no public way to do this; the model's
+    private clients are set from a private client manager, which is only done
+    on KEYED_SDK_VERSIONS (see _client_manager).
+    """
+
+    def __init__(self, model, manager):
+        self._model = model
+        self._manager = manager
+
+    def generate_content(self, prompt, **kwargs):
+        if self._model._client is None:
+            self._model._client = self._manager.get_default_client('generative')
+        return self._model.generate_content(prompt, **kwargs)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        # The async client is created on the event loop that uses it
+        if self._model._async_client is None:
+            self._model._async_client = self._manager.get_default_client('generative_async')
+        return await self._model.generate_content_async(prompt, **kwargs)
+
+
+def _client_manager(api_key):
+    """The SDK's private client manager, configured with one key; raises ValueError on an unsupported SDK"""
+    from importlib import metadata
+
+    version = metadata.version('google-generativeai')
+    if version not in KEYED_SDK_VERSIONS:
+        raise ValueError(
+            f'A model pool with several API keys needs google-generativeai {", ".join(KEYED_SDK_VERSIONS)}, '
+            f'found {version}; use one key per pool'
+        )
+    from google.generativeai.client import _ClientManager
+
+    manager = _ClientManager()
+    manager.configure(api_key=api_key)
+    return manager
+
+
+def _load_gemini(model_name, key_env, own_key):
+    import google.generativeai as genai
+
+    api_key = os.getenv(key_env)
+    if not api_key:
+        raise ValueError(f"{key_env} not found in environment variables")
+
+    warnings.filterwarnings("ignore", module="google.generativeai")
+
+    if not own_key:
+        # Every member uses this key: the public, process-wide configuration is enough
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name)
+    return _KeyedModel(genai.GenerativeModel(model_name), _client_manager(api_key))
+
+
+def _load_stub(settings):
+    from stub_model import StubModel
+
+    return StubModel(
+        latency=settings.get('latency', 'fixed:0'),
+        failure_rate=float(settings.get('failure_rate', 0)),
+        seed=settings.get('seed')
+    )
+
+
+class Member:
+    """One (tier, API key) pair: its model, load and health (quota rest and circuit breaker)"""
+
+    def __init__(self, tier, index, load, max_in_flight=None, rpm=None):
+        self.tier = tier
+        # Metric label and status name; never the key itself
+        self.name = f'{tier}/{index}'
+        self._load = load
+        self._model = None
+        self._load_lock = threading.Lock()
+        self.max_in_flight = max_in_flight
+        self.rpm = rpm
+        self.in_flight = 0
+        self.requests = collections.deque()
+        self.breaker = CircuitBreaker(FAILURE_THRESHOLD, FAILURE_COOLDOWN, tracked=False)
+        self.resting_until = 0.0
+        self.last_error = None
+
+    def model(self):
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._load()
+        return self._model
+
+    def loaded(self):
+        return self._model is not None
+
+    def _prune(self, now):
+        while self.requests and now - self.requests[0] >= RATE_WINDOW:
+            self.requests.popleft()
+
+    def resting(self, now):
+        """Resting after a quota error or a failed build, or with its breaker open"""
+        return now < self.resting_until or not self.breaker.available()
+
+    def saturated(self, now):
+        self._prune(now)
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            return True
+        return self.rpm is not None and len(self.requests) >= self.rpm
+
+    def rest(self, seconds, reason, now):
+        self.resting_until = max(self.resting_until, now + seconds)
+        metrics.MODEL_POOL_COOLDOWNS.inc(self.tier, self.name, reason)
+
+    def status(self, now):
+        return {
+            'member': self.name,
+            'loaded': self.loaded(),
+            'in_flight': self.in_flight,
+            'requests_last_minute': len(self.requests),
+            'resting_seconds': round(max(0.0, self.resting_until - now), 1),
+            'breaker': self.breaker.state,
+            'last_error': self.last_error,
+        }
+
+
+class Lease:
+    """One upstream request on a built member; leaving the `with` block records its outcome"""
+
+    def __init__(self, pool, member):
+        self.pool = pool
+        self.member = member
+        self.model = member.model()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.member, exc)
+        return False
+
+
+class ModelPool:
+    """Members grouped into tiers, and the routing table from endpoints to tiers"""
+
+    def __init__(self, tiers, routes, name):
+        self.tiers = tiers
+        self.routes = routes
+        self.name = name
+        self._lock = threading.Lock()
+
+    def route(self, endpoint):
+        for name in (endpoint, endpoint.removesuffix('-repair'), DEFAULT_ROUTE):
+            if name in self.routes:
+                return self.routes[name]
+        return list(self.tiers)
+
+    def _pick(self, endpoint, now):
+        """(member, tier) to send `endpoint` to, or (None, None) when every member is resting"""
+        route = self.route(endpoint)
+        overflow = None
+        for tier in route:
+            awake = [member for member in self.tiers[tier] if not member.resting(now)]
+            available = [member for member in awake if not member.saturated(now)]
+            if available:
+                return min(available, key=lambda m: (m.in_flight, len(m.requests))), tier
+            if awake and overflow is None:
+                overflow = min(awake, key=lambda m: (m.in_flight / (m.max_in_flight or 1), len(m.requests))), tier
+        return overflow or (None, None)
+
+    def lease(self, endpoint):
+        """
+        A Lease on the member `endpoint` is routed to, built if needed; a member
+        that cannot be built rests and the next one is tried. Raises
+        PoolExhausted when every member of the route is resting.
+        """
+        while True:
+            member = self._take(endpoint)
+            try:
+                return Lease(self, member)
+            except Exception as e:
+                self._unavailable(member, e)
+
+    async def lease_async(self, endpoint):
+        while True:
+            member = self._take(endpoint)
+            try:
+                if not member.loaded():
+                    # Building a Gemini member imports the SDK; keep that off the event loop
+                    await asyncio.to_thread(member.model)
+                return Lease(self, member)
+            except Exception as e:
+                self._unavailable(member, e)
+
+    def _unavailable(self, member, error):
+        print(f"Model pool member {member.name} unavailable: {str(error)}")
+        with self._lock:
+            member.in_flight -= 1
+            member.breaker.abandon()
+            member.last_error = f'{type(error).__name__}: {str(error)[:200]}'
+            member.rest(FAILURE_COOLDOWN, 'unavailable', time.monotonic())
+        metrics.MODEL_POOL_REQUESTS.inc(member.tier, member.name, 'unavailable')
+
+    def _take(self, endpoint):
+        now = time.monotonic()
+        with self._lock:
+            member, tier = self._pick(endpoint, now)
+            if member is None:
+                metrics.MODEL_POOL_EXHAUSTED.inc(endpoint)
+                raise PoolExhausted(f'Every model the {endpoint} route uses is resting, please retry later')
+            # Takes the probe when the member's breaker is half open
+            member.breaker.allow()
+            member.in_flight += 1
+            member.requests.append(now)
+        primary = self.route(endpoint)[0]
+        if tier != primary:
+            metrics.MODEL_POOL_FAILOVERS.inc(endpoint, primary, tier)
+        return member
+
+    def release(self, member, error):
+        now = time.monotonic()
+        with self._lock:
+            member.in_flight -= 1
+            if error is None:
+                member.breaker.record_success()
+                outcome = 'ok'
+            elif isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+                # The caller stopped reading or went away; says nothing about the member
+                member.breaker.abandon()
+                outcome = 'cancelled'
+            elif is_quota_error(error):
+                # The key is out of quota, not broken: it rests, and its breaker is left alone
+                member.breaker.abandon()
+                member.rest(QUOTA_COOLDOWN, 'quota', now)
+                outcome = 'quota'
+            elif is_transient(error):
+                if member.breaker.record_failure():
+                    metrics.MODEL_POOL_COOLDOWNS.inc(member.tier, member.name, 'failures')
+                outcome = 'error'
+            else:
+                # The request itself was bad; the member answered, so it is healthy
+                member.breaker.record_success()
+                outcome = 'rejected'
+            if error is not None:
+                member.last_error = f'{type(error).__name__}: {str(error)[:200]}'
+        metrics.MODEL_POOL_REQUESTS.inc(member.tier, member.name, outcome)
+
+    def warm_up(self):
+        """Build every member's model; raises only when none could be built"""
+        errors = []
+        for member in self.members():
+            try:
+                member.model()
+            except Exception as e:
+                member.last_error = f'{type(e).__name__}: {str(e)[:200]}'
+                member.rest(FAILURE_COOLDOWN, 'unavailable', time.monotonic())
+                errors.append(f'{member.name}: {str(e)}')
+        if len(errors) == len(self.members()):
+            raise ValueError('No model in the pool could be built (' + '; '.join(errors) + ')')
+        for error in errors:
+            print(f"Model pool member unavailable: {error}")
+        return self
+
+    def members(self):
+        return [member for members in self.tiers.values() for member in members]
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'routes': self.routes,
+                'tiers': {tier: [member.status(now) for member in members] for tier, members in self.tiers.items()},
+            }
+
+
+def _positive(value, field, tier):
+    if value is None:
+        return None
+    if not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(f'Model pool tier "{tier}": "{field}" must be a positive number')
+    return value
+
+
+def _members(tier, settings, own_keys=False):
+    backend = settings.get('backend', 'gemini')
+    limits = {
+        'max_in_flight': _positive(settings.get('max_in_flight'), 'max_in_flight', tier),
+        'rpm': _positive(settings.get('rpm'), 'rpm', tier),
+    }
+    if backend == 'stub':
+        copies = int(settings.get('copies', 1))
+        return [Member(tier, i + 1, lambda: _load_stub(settings), **limits) for i in range(copies)]
+    if backend != 'gemini':
+        raise ValueError(f'Model pool tier "{tier}": unknown backend "{backend}"')
+    model_name = settings.get('model')
+    if not model_name:
+        raise ValueError(f'Model pool tier "{tier}" needs a "model"')
+    return [
+        Member(tier, i + 1, lambda key_env=key_env: _load_gemini(model_name, key_env, own_keys), **limits)
+        for i, key_env in enumerate(_keys(settings))
+    ]
+
+
+def _keys(settings):
+    return settings.get('keys') or ['GEMINI_API_KEY']
+
+
+def _describe(settings):
+    """What the tier generates with, for the cache namespace"""
+    if settings.get('backend', 'gemini') == 'stub':
+        return 'stub'
+    return settings.get('model')
+
+
+def parse_pool(config):
+    """Build a ModelPool from the parsed AI_MODEL_POOL JSON; raises ValueError when it is inconsistent"""
+    tiers_config = config.get('tiers') if isinstance(config, dict) else None
+    if not isinstance(tiers_config, dict) or not tiers_config:
+        raise ValueError('Model pool config needs a non-empty "tiers" object')
+    # Only a pool with several keys needs each member to carry its own
+    keys = {
+        key for settings in tiers_config.values() if settings.get('backend', 'gemini') == 'gemini'
+        for key in _keys(settings)
+    }
+    tiers = {tier: _members(tier, settings, len(keys) > 1) for tier, settings in tiers_config.items()}
+    routes = {}
+    for endpoint, route in (config.get('routes') or {}).items():
+        if isinstance(route, str):
+            route = [route]
+        unknown = [tier for tier in route if tier not in tiers]
+        if not route or unknown:
+            raise ValueError(f'Model pool route "{endpoint}" must list known tiers, got {route}')
+        routes[endpoint] = list(route)
+    # Responses are cached per model; a different routing table gets its own cache entries
+    layout = json.dumps({
+        'tiers': {tier: _describe(settings) for tier, settings in tiers_config.items()},
+        'routes': routes,
+    }, sort_keys=True)
+    name = 'pool-' + hashlib.sha256(layout.encode('utf-8')).hexdigest()[:12]
+    return ModelPool(tiers, routes, name)
+
+
+def pool_from_env():
+    """The model pool configured by AI_MODEL_POOL (a JSON file path or inline JSON), or None when unset"""
+    spec = os.getenv('AI_MODEL_POOL')
+    if not spec:
+        return None
+    if spec.lstrip().startswith('{'):
+        config = json.loads(spec)
+    else:
+        with open(spec) as f:
+            config = json.load(f)
+    return parse_pool(config)
@@ -0,0 +1,205 @@
+"""
+Token budgets for prompts that embed user input: the resume in
+/api/generate-interview-questions and the note content in
+/api/generate-quiz and /api/summarize-notes.
+
+The assembled prompt's size is estimated (about four characters per token
+for ASCII text, one token per other character). When it exceeds the
+endpoint's budget, the input is compacted until the prompt fits:
+
+1. whitespace is collapsed (runs of spaces, trailing spaces, blank lines)
+2. repeated lines are dropped (pasted twice, repeated headers and footers)
+3. the highest-information blocks (paragraphs, code blocks) are kept in
+   their original order, ranked by how many distinct, rarely repeated words
+   they carry per token; omitted stretches are marked with "[...]"
+
+so a long input loses its least informative parts instead of its end.
+Every response reports the sizes before and after under `prompt_budget`.
+"""
+import math
+import os
+import re
+
+import metrics
+import tracing
+
+# Characters per token for ASCII text; other characters count one token each
+CHARS_PER_TOKEN = 4
+
+# Default prompt budgets in tokens, overridden by AI_PROMPT_BUDGETS="endpoint=tokens,..."
+DEFAULT_BUDGETS = {
+    'generate-interview-questions': 6000,
+    'extract-resume-profile': 6000,
+    'generate-quiz': 12000,
+    # Large notes are summarized in chunks; this bounds how many chunks one note fans out to
+    'summarize-notes': 50000,
+}
+
+# Lines shorter than this (closing braces, fences, "---") are never treated as duplicates
+MIN_DUPLICATE_CHARS = 8
+
+OMITTED = '[...]'
+
+WORD = re.compile(r'[a-z0-9]+')
+FENCE = re.compile(r'^\s*(```|~~~)')
+
+
+def parse_budgets(spec):
+    """Parse "endpoint=tokens,endpoint=tokens" into {endpoint: tokens}"""
+    budgets = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        endpoint, tokens = item.split('=', 1)
+        budgets[endpoint.strip()] = int(tokens)
+    return budgets
+
+
+BUDGETS = dict(DEFAULT_BUDGETS, **parse_budgets(os.getenv('AI_PROMPT_BUDGETS')))
+
+
+def estimate_tokens(text):
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return math.ceil(ascii_chars / CHARS_PER_TOKEN) + (len(text) - ascii_chars)
+
+
+def collapse_whitespace(text):
+    """Collapse runs of spaces and blank lines; leading indentation is kept for code"""
+    lines = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        body = line.lstrip()
+        lines.append(line[:len(line) - len(body)] + re.sub(r'[ \t]{2,}', ' ', body))
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def drop_duplicate_lines(text):
+    """Drop lines that already appeared earlier (ignoring case and spacing)"""
+    seen = set()
+    lines = []
+    for line in text.split('\n'):
+        key = ' '.join(line.lower().split())
+        if len(key) >= MIN_DUPLICATE_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def split_blocks(text):
+    """Paragraphs separated by blank lines; a fenced code block stays one block"""
+    blocks = []
+    current = []
+    in_fence = False
+    for line in text.split('\n'):
+        if FENCE.match(line):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+
+def _densities(blocks):
+    """Information per token of each block: summed IDF of its distinct words"""
+    words = [set(WORD.findall(block.lower())) for block in blocks]
+    frequency = {}
+    for block_words in words:
+        for word in block_words:
+            frequency[word] = frequency.get(word, 0) + 1
+    total = len(blocks)
+    return [
+        sum(math.log(1 + total / frequency[word]) for word in block_words) / max(1, estimate_tokens(block))
+        for block, block_words in zip(blocks, words)
+    ]
+
+
+def select_blocks(text, max_tokens):
+    """Keep the densest blocks that fit in max_tokens, in their original order"""
+    blocks = split_blocks(text)
+    densities = _densities(blocks)
+    # The opening block (title, summary line) is kept first; then by density
+    ranked = [0] + sorted(range(1, len(blocks)), key=lambda i: densities[i], reverse=True)
+    chosen = set()
+    used = 0
+    for i in ranked:
+        # Each block may need a separator and an omission marker next to it
+        cost = estimate_tokens(blocks[i]) + estimate_tokens(OMITTED) + 1
+        if used + cost <= max_tokens:
+            chosen.add(i)
+            used += cost
+    parts = []
+    for i, block in enumerate(blocks):
+        if i in chosen:
+            parts.append(block)
+        elif not parts or parts[-1] != OMITTED:
+            parts.append(OMITTED)
+    return '\n\n'.join(parts)
+
+
+def truncate(text, max_tokens):
+    """Last resort when even one block is over budget: cut at a line or word boundary"""
+    cut = text[:max(0, max_tokens) * CHARS_PER_TOKEN]
+    while cut and estimate_tokens(cut) > max_tokens:
+        cut = cut[:-CHARS_PER_TOKEN * 16]
+    boundary = max(cut.rfind('\n'), cut.rfind(' '))
+    return cut[:boundary] if boundary > len(cut) // 2 else cut
+
+
+def compact(text, max_tokens):
+    """Compact text to at most max_tokens; returns (text, names of the steps applied)"""
+    steps = []
+    for name, step in (('whitespace', collapse_whitespace), ('duplicates', drop_duplicate_lines)):
+        if estimate_tokens(text) <= max_tokens:
+            return text, steps
+        text = step(text)
+        steps.append(name)
+    if estimate_tokens(text) > max_tokens:
+        text = select_blocks(text, max_tokens)
+        steps.append('sections')
+    if estimate_tokens(text) > max_tokens:
+        text = truncate(text, max_tokens)
+        steps.append('truncate')
+    return text, steps
+
+
+def fit(endpoint, text, build):
+    """
+    Build the prompt for `endpoint` from `text` with `build(text)`, compacting
+    `text` when the prompt is over the endpoint's budget. Returns
+    (prompt, text, report); `text` is the input actually used.
+    """
+    prompt = build(text)
+    prompt_tokens = estimate_tokens(prompt)
+    input_tokens = estimate_tokens(text)
+    budget = BUDGETS.get(endpoint)
+    report = {
+        'budget_tokens': budget,
+        'original_tokens': prompt_tokens,
+        'prompt_tokens': prompt_tokens,
+        'original_chars': len(text),
+        'compacted_chars': len(text),
+        'compacted': False,
+    }
+    if budget is None or prompt_tokens <= budget:
+        return prompt, text, report
+    # Whatever the template itself costs is not available to the input
+    allowance = max(0, budget - (prompt_tokens - input_tokens))
+    with tracing.phase('prompt'):
+        text, steps = compact(text, allowance)
+    prompt = build(text)
+    report.update({
+        'prompt_tokens': estimate_tokens(prompt),
+        'compacted_chars': len(text),
+        'compacted': True,
+        'steps': steps,
+    })
+    metrics.PROMPT_COMPACTIONS.inc(endpoint)
+    metrics.PROMPT_TOKENS_SAVED.inc(endpoint, amount=report['original_tokens'] - report['prompt_tokens'])
+    return prompt, text, report
@@ -0,0 +1,452 @@
+"""Prompt templates shared by the Flask (app.py) and asyncio (asgi.py) servers"""
+from tracing import traced
+
+SUMMARY_FORMAT = """Please provide your response in the following structured format:
+
+## Important Theory
+[Extract and explain the key theoretical concepts, definitions, and foundational knowledge from the notes. Make it clear and easy to understand.]
+
+## Real-World Examples
+[Provide 3-5 practical, real-world examples that demonstrate how these concepts are applied in everyday life or professional scenarios. Be specific and relatable.]
+
+## Key Points
+[List 5-10 most important takeaways, facts, or points that students must remember. Use bullet points for clarity.]
+
+## Study Tips
+[Provide 2-3 actionable study tips or memory techniques to help students retain this information better.]
+
+Make your response educational, engaging, and easy to understand for students.
+"""
+
+@traced('prompt')
+def summarize_notes_prompt(note_title, note_content):
+    """Prompt for the four-section note summary"""
+    return f"""
+You are an educational assistant helping students understand their notes better. 
+Analyze the following notes and provide a comprehensive summary with these sections:
+
+Note Title: {note_title}
+
+Note Content:
+{note_content}
+
+{SUMMARY_FORMAT}"""
+
+@traced('prompt')
+def chunk_summary_prompt(note_title, chunk):
+    """Map step for large notes: condensed notes for one chunk, merged later by summary_reduce_prompt"""
+    # The chunk's position is left out so an unchanged chunk keeps its cache entry when others move
+    return f"""
+You are an educational assistant. The following is one part of a student's notes titled "{note_title}".
+
+Notes (one part):
+{chunk}
+
+Write condensed study notes for this part only, in at most 300 words, using these headings:
+
+### Theory
+[Key concepts and definitions from this part]
+
+### Examples
+[Any examples or applications this part mentions or clearly implies]
+
+### Key Facts
+[Bullet points of facts worth remembering]
+
+Do not add an introduction or conclusion; another step will combine all parts.
+"""
+
+@traced('prompt')
+def summary_reduce_prompt(note_title, partial_summaries):
+    """Reduce step for large notes: merge per-chunk notes into the four-section summary"""
+    parts = '\n\n'.join(
+        f"--- Part {i} ---\n{summary}" for i, summary in enumerate(partial_summaries, start=1)
+    )
+    return f"""
+You are an educational assistant helping students understand their notes better.
+The notes titled "{note_title}" were too long to read at once, so each part was condensed separately.
+Combine the condensed parts below into one comprehensive summary of the whole note, merging duplicates.
+
+Note Title: {note_title}
+
+Condensed Parts:
+{parts}
+
+{SUMMARY_FORMAT}"""
+
+@traced('prompt')
+def explain_concept_prompt(concept, context):
+    """Prompt for a student-friendly concept explanation"""
+    return f"""
+Explain the following concept in a simple, student-friendly way:
+
+Concept: {concept}
+
+{"Context: " + context if context else ""}
+
+Provide:
+1. A clear definition
+2. Why it's important
+3. A simple example
+4. Common misconceptions (if any)
+
+Keep the explanation concise but thorough.
+"""
+
+def avoid_questions(questions):
+    """Prompt suffix listing questions the model must not repeat (empty without any)"""
+    if not questions:
+        return ''
+    listed = '\n'.join(f'- {question}' for question in questions)
+    return f"""
+Do not repeat or rephrase any of these existing questions:
+{listed}
+"""
+
+@traced('prompt')
+def quiz_prompt(content, num_questions, avoid=None):
+    """Prompt for multiple-choice quiz questions in JSON; `avoid` lists question texts not to repeat"""
+    return f"""
+Based on the following notes, generate {num_questions} multiple-choice quiz questions to test understanding:
+
+{content}
+
+Provide the response in EXACT JSON format with this structure:
+{{
+  "questions": [
+    {{
+      "id": 1,
+      "question": "The question text here",
+      "options": [
+        "Option A",
+        "Option B", 
+        "Option C",
+        "Option D"
+      ],
+      "correct_answer": "Option A",
+      "explanation": "Explanation of why this is correct"
+    }}
+  ]
+}}
+
+Requirements:
+1. Generate EXACTLY {num_questions} questions
+2. Each question MUST have exactly 4 options (A, B, C, D)
+3. The correct_answer field MUST match exactly one of the options
+4. Provide a clear explanation for each answer
+5. Return ONLY valid JSON, no markdown formatting or additional text
+6. Make questions educational and thought-provoking
+{avoid_questions(avoid)}"""
+
+@traced('prompt')
+def session_notes_prompt(title, subject, description):
+    """Prompt for comprehensive study session notes"""
+    return f"""
+You are an educational assistant helping students by creating comprehensive, reference-supported study notes.
+
+Based on the following study session information, create detailed, well-structured notes that students can use for learning and revision:
+
+Session Title: {title}
+Subject: {subject}
+Session Description: {description}
+
+Please generate comprehensive notes with the following structure:
+
+# {title}
+
+## Overview
+[Provide a brief introduction to the topic and its importance]
+
+## Key Concepts
+[List and explain the main concepts, theories, and principles related to this topic]
+
+## Detailed Explanation
+[Provide in-depth explanation of the topic with clear subsections]
+
+## Important Definitions
+[List important terms and their definitions]
+
+## Real-World Applications
+[Explain how this topic is applied in real-world scenarios with examples]
+
+## Common Misconceptions
+[Address common misunderstandings students might have]
+
+## Study Tips
+[Provide tips for understanding and remembering this material]
+
+## Practice Questions
+[Suggest 3-5 questions students should be able to answer after studying this material]
+
+## Reference Links
+List 5–8 trusted, **clickable reference links** that students can use for further learning.
+
+Each resource should be written in **Markdown link format**:
+[Resource Title](https://example.com) – with a short description (1–2 lines) explaining what the link offers.
+
+Include a mix of:
+- Official documentation or reference sites (e.g., Oracle, IEEE, W3C, etc.)
+- Educational websites (.edu, .org, or high-quality learning platforms)
+- Online tutorials or blogs
+- Recommended books (include purchase or preview links if available)
+- Coding practice or interactive learning platforms
+
+⚠️ Make sure all links:
+- Are **specific and direct** (not homepages or search result pages)
+- Open educational content relevant to the topic
+- Are **clickable** in Markdown format
+
+Make the notes clear, educational, well-organized, and suitable for student learning.
+Ensure all reference links are live and clickable.
+"""
+
+@traced('prompt')
+def session_assessment_prompt(title, subject, description, num_questions, avoid=None):
+    """Prompt for a study session assessment in JSON; `avoid` lists question texts not to repeat"""
+    return f"""
+You are an educational assessment expert. Based on the following study session information, create {num_questions} high-quality multiple-choice questions to evaluate student understanding.
+
+Session Title: {title}
+Subject: {subject}
+Session Description: {description}
+
+Provide the assessment in EXACT JSON format with this structure:
+{{
+  "assessment": {{
+    "title": "{title}",
+    "subject": "{subject}",
+    "questions": [
+      {{
+        "id": 1,
+        "question": "The question text here",
+        "options": [
+          "Option A",
+          "Option B", 
+          "Option C",
+          "Option D"
+        ],
+        "correct_answer": "Option A",
+        "explanation": "Explanation of why this is correct"
+      }}
+    ]
+  }}
+}}
+
+Requirements:
+1. Generate EXACTLY {num_questions} questions
+2. Each question MUST have exactly 4 options
+3. The correct_answer field MUST match exactly one of the options
+4. Provide a clear, educational explanation for each answer
+5. Return ONLY valid JSON, no markdown formatting or additional text
+6. Make questions challenging but fair, testing true understanding
+7. Cover different aspects of the topic described
+{avoid_questions(avoid)}"""
+
+@traced('prompt')
+def interview_questions_prompt(resume, job_role, label='Resume'):
+    """Prompt for 10 interview questions in JSON; `label` names what `resume` holds (e.g. a candidate profile)"""
+    return f"""Based on the following resume and job role, generate exactly 10 interview questions.
+The questions should be relevant to the candidate's experience and the target role.
+Mix technical, behavioral, and situational questions.
+
+Job Role: {job_role}
+
+{label}:
+{resume}
+
+Generate 10 questions in JSON format with this exact structure:
+{{
+  "questions": [
+    {{
+      "id": 1,
+      "question": "Question text here",
+      "type": "technical",
+      "expectedPoints": ["key point 1", "key point 2", "key point 3"]
+    }},
+    {{
+      "id": 2,
+      "question": "Question text here",
+      "type": "behavioral",
+      "expectedPoints": ["key point 1", "key point 2"]
+    }}
+  ]
+}}
+
+Types should be one of: "technical", "behavioral", or "situational"
+Return ONLY valid JSON, no additional text or markdown."""
+
+def candidate_profile(profile):
+    """Candidate profile section for evaluation prompts; empty without a profile"""
+    if not profile:
+        return ''
+    return f"""
+Candidate Profile (from their resume):
+{profile}
+
+Judge the answer against what this candidate's background should let them say.
+"""
+
+@traced('prompt')
+def evaluate_answer_prompt(question, answer, expected_points, job_role, profile=None):
+    """Prompt for scoring one interview answer in JSON"""
+    return f"""Evaluate the following interview answer for the job role: {job_role}
+{candidate_profile(profile)}
+Question: {question}
+
+Expected Key Points: {', '.join(expected_points)}
+
+Candidate's Answer: {answer}
+
+Provide an evaluation in JSON format with this exact structure:
+{{
+  "score": 8,
+  "strengths": ["strength 1", "strength 2"],
+  "improvements": ["improvement 1", "improvement 2"],
+  "feedback": "Overall feedback paragraph explaining the score and key observations"
+}}
+
+Score should be 0-10 based on:
+- Relevance and completeness of answer
+- Clarity of communication
+- Coverage of expected key points
+- Specific examples or details provided
+
+Return ONLY valid JSON, no additional text or markdown."""
+
+@traced('prompt')
+def evaluate_answers_prompt(items, job_role, profile=None):
+    """Prompt for scoring several interview answers in one JSON response"""
+    answers = '\n\n'.join(
+        f"""### Answer {item['id']}
+Question: {item['question']}
+
+Expected Key Points: {', '.join(item.get('expectedPoints') or [])}
+
+Candidate's Answer: {item['answer']}"""
+        for item in items
+    )
+    return f"""Evaluate each of the following interview answers for the job role: {job_role}
+{candidate_profile(profile)}
+{answers}
+
+Provide the evaluations in JSON format with this exact structure, one entry per answer, using the answer's number as "id":
+{{
+  "evaluations": [
+    {{
+      "id": 1,
+      "score": 8,
+      "strengths": ["strength 1", "strength 2"],
+      "improvements": ["improvement 1", "improvement 2"],
+      "feedback": "Overall feedback paragraph explaining the score and key observations"
+    }}
+  ]
+}}
+
+Score each answer independently, 0-10, based on:
+- Relevance and completeness of answer
+- Clarity of communication
+- Coverage of expected key points
+- Specific examples or details provided
+
+Return ONLY valid JSON, no additional text or markdown."""
+
+@traced('prompt')
+def learning_path_prompt(topic, level, duration, goal):
+    """Prompt for a markdown learning path"""
+    return f"""You are an educational expert helping students create effective learning paths.
+Create a detailed, structured learning path for the following:
+
+Topic: {topic}
+Skill Level: {level}
+Duration: {duration}
+Goal: {goal}
+
+Make sure the learning path is:
+- Logical and progressive (from fundamentals to mastery)
+- Action-oriented (learn by doing)
+- Realistic for the given duration
+- Clear, structured, and visually easy to follow
+
+Provide your response in Markdown format with proper headings and structure.
+"""
+
+@traced('prompt')
+def learning_modules_prompt(topic, level):
+    """Prompt for the reusable module library of a topic and level, in JSON"""
+    return f"""You are an educational expert designing a reusable curriculum.
+Break the following topic into learning modules for a {level} learner.
+
+Topic: {topic}
+Skill Level: {level}
+
+Provide the modules in learning order, in JSON format with this exact structure:
+{{
+  "modules": [
+    {{
+      "kind": "fundamentals",
+      "title": "Module title",
+      "summary": "One or two sentences on what the module covers",
+      "objectives": ["objective 1", "objective 2", "objective 3"],
+      "resources": ["resource or activity 1", "resource or activity 2"],
+      "effort_weeks": 1,
+      "core": true
+    }}
+  ]
+}}
+
+Requirements:
+1. "kind" is one of "fundamentals", "project" or "milestone"
+2. Start with fundamentals, move on to hands-on projects; place a milestone (a checkpoint the learner can verify) after each stage
+3. "effort_weeks" is the time the module takes at about 5-8 hours per week (0 for milestones)
+4. Mark the modules a learner cannot skip with "core": true and stretch material with "core": false
+5. Provide 6-12 modules in total
+6. Do not assume any particular duration or personal goal; the modules are scheduled separately
+7. Return ONLY valid JSON, no markdown formatting or additional text"""
+
+@traced('prompt')
+def learning_path_personalization_prompt(topic, level, weeks, goal, outline):
+    """Prompt for the short goal-specific introduction of a composed learning path"""
+    return f"""A {level} learner is following this {weeks}-week learning path for {topic}:
+
+{outline}
+
+Their goal: {goal}
+
+In at most 150 words of Markdown, explain how this path serves their goal and which weeks to
+emphasize or adapt for it. Use this heading:
+
+## How This Path Fits Your Goal
+
+Do not repeat the weekly plan."""
+
+@traced('prompt')
+def resume_profile_prompt(resume):
+    """Prompt for the compact skill profile of a resume, in JSON"""
+    return f"""Extract a compact profile of the candidate from the following resume.
+
+Resume:
+{resume}
+
+Provide the profile in JSON format with this exact structure:
+{{
+  "headline": "One line summary, e.g. Backend engineer focused on payments",
+  "years_experience": 5,
+  "skills": ["skill 1", "skill 2"],
+  "roles": [
+    {{
+      "title": "Job title",
+      "organization": "Company",
+      "years": 2,
+      "highlights": ["achievement or responsibility 1", "achievement or responsibility 2"]
+    }}
+  ],
+  "projects": ["short project description"],
+  "education": ["degree, institution"],
+  "certifications": ["certification"]
+}}
+
+Requirements:
+1. Keep only facts stated in the resume; use null for unknown numbers and [] for empty lists
+2. List the most relevant skills first, at most 30
+3. At most 3 short highlights per role, most recent role first
+4. Return ONLY valid JSON, no markdown formatting or additional text"""
@@ -0,0 +1,165 @@
+"""
+Persistent question bank for /api/generate-quiz and
+/api/generate-session-assessment (also the assessment part of
+/api/complete-session).
+
+Validated questions are stored in a SQLite file (AI_QUESTION_BANK_DB) under
+a topic key: the subject and title of a session assessment, or a
+fingerprint of the notes a quiz is generated from. A later request for the
+same topic samples distinct questions from the bank and only asks the model
+for the shortfall, telling it which questions it already has so it does not
+repeat them. That list is every banked question in a fixed order (by hash,
+capped at MAX_AVOID), so identical shortfall requests share a cached
+generation. Each question is stored once per topic (by a hash of its
+normalized text), so samples never contain duplicates; generated questions
+that repeat one anyway are dropped and the set is topped up, so a response
+has the requested number of questions.
+
+Like the SQLite response cache tier, the file can be shared by every worker
+process.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file of the bank; unset disables it
+DB_PATH = os.getenv('AI_QUESTION_BANK_DB')
+
+# Questions kept per topic; the oldest are dropped beyond this
+MAX_PER_TOPIC = int(os.getenv('AI_QUESTION_BANK_MAX_PER_TOPIC', 200))
+
+CACHE_BANK = 'BANK'
+
+# Existing questions listed in a shortfall prompt as ones not to repeat
+MAX_AVOID = 40
+
+# Further generations when repeats leave a question set short
+MAX_TOP_UPS = 2
+
+
+def _normalize(text):
+    return ' '.join(str(text or '').lower().split())
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(_normalize(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:32]
+
+
+def assessment_topic(subject, title):
+    return 'assessment:' + _digest(subject, title)
+
+
+def quiz_topic(content):
+    return 'quiz:' + _digest(content)
+
+
+def question_hash(question):
+    return _digest(question.get('question'))
+
+
+def merge(banked, generated, count):
+    """Banked then generated questions without repeats, at most `count`, renumbered from 1"""
+    questions = []
+    seen = set()
+    for question in list(banked) + list(generated):
+        digest = question_hash(question)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        questions.append(dict(question, id=len(questions) + 1))
+        if len(questions) == count:
+            break
+    return questions
+
+
+def avoid_list(questions):
+    """Question texts not to repeat, in a fixed order so the same set gives the same prompt"""
+    return [question['question'] for question in sorted(questions, key=question_hash)][:MAX_AVOID]
+
+
+class QuestionBank:
+    """Questions by topic in SQLite; one connection per thread, WAL mode"""
+
+    def __init__(self, path, max_per_topic=MAX_PER_TOPIC):
+        self.path = path
+        self.max_per_topic = max_per_topic
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS questions ('
+            'id INTEGER PRIMARY KEY, topic TEXT NOT NULL, subject TEXT, title TEXT, '
+            'hash TEXT NOT NULL, question TEXT NOT NULL, created_at REAL NOT NULL, '
+            'UNIQUE (topic, hash))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS questions_subject ON questions (subject, title)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def sample(self, topic, count):
+        """Up to `count` distinct random questions for `topic`; a failing bank yields none"""
+        try:
+            rows = self._connection().execute(
+                'SELECT question FROM questions WHERE topic = ? ORDER BY random() LIMIT ?', (topic, count)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Question bank read failed: {str(e)}")
+            return []
+        return [json.loads(row[0]) for row in rows]
+
+    def texts(self, topic, limit=MAX_AVOID):
+        """Up to `limit` question texts for `topic`, always in the same order (by hash)"""
+        try:
+            rows = self._connection().execute(
+                'SELECT question FROM questions WHERE topic = ? ORDER BY hash LIMIT ?', (topic, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Question bank read failed: {str(e)}")
+            return []
+        return [json.loads(row[0])['question'] for row in rows]
+
+    def add(self, topic, questions, subject=None, title=None):
+        """Store validated questions; ones already in the topic are skipped"""
+        now = time.time()
+        rows = []
+        for question in questions:
+            stored = {key: value for key, value in question.items() if key != 'id'}
+            rows.append((topic, subject, title, question_hash(question), json.dumps(stored), now))
+        try:
+            conn = self._connection()
+            conn.executemany(
+                'INSERT OR IGNORE INTO questions (topic, subject, title, hash, question, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+            conn.execute(
+                'DELETE FROM questions WHERE topic = ? AND id NOT IN ('
+                'SELECT id FROM questions WHERE topic = ? ORDER BY created_at DESC, id DESC LIMIT ?)',
+                (topic, topic, self.max_per_topic)
+            )
+        except sqlite3.Error as e:
+            print(f"Question bank write failed: {str(e)}")
+
+    def count(self, topic):
+        return self._connection().execute('SELECT COUNT(*) FROM questions WHERE topic = ?', (topic,)).fetchone()[0]
+
+
+def bank_from_env():
+    """Build the question bank from AI_QUESTION_BANK_* settings, or None when AI_QUESTION_BANK_DB is unset"""
+    if not DB_PATH:
+        return None
+    return QuestionBank(DB_PATH)
@@ -0,0 +1,438 @@
+"""
+Failure handling around upstream model calls.
+
+- every call has a timeout (AI_CALL_TIMEOUT), shortened to the caller's
+  deadline when the request carries an X-Deadline-Ms header
+- transient failures are retried with capped, jittered exponential backoff,
+  but only while the retry budget has tokens: each call adds AI_RETRY_BUDGET
+  tokens and each retry or hedge spends one, so retries stay a small
+  fraction of traffic during an outage
+- a circuit breaker opens after AI_BREAKER_THRESHOLD consecutive transient
+  failures and fails calls fast for AI_BREAKER_RESET seconds, then lets one
+  probe call through
+- short endpoints (explain-concept, evaluate-answer) are hedged: when the
+  first call has not answered after that endpoint's recent p95 latency, a
+  second identical call is sent and whichever answers first is kept (the
+  losing call is cancelled). The synchronous client runs the first call on
+  the request's thread, so there the hedge only stands in for a first call
+  that fails or times out
+"""
+import asyncio
+import collections
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cancellation
+import metrics
+
+# Seconds one upstream call may take
+CALL_TIMEOUT = float(os.getenv('AI_CALL_TIMEOUT', 60))
+
+# Retries per call after the first attempt, and their backoff in seconds
+MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', 2))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+# Retry tokens earned per call, and the most that can be saved up
+RETRY_BUDGET_RATIO = float(os.getenv('AI_RETRY_BUDGET', 0.1))
+RETRY_BUDGET_RESERVE = 10
+
+BREAKER_THRESHOLD = int(os.getenv('AI_BREAKER_THRESHOLD', 5))
+BREAKER_RESET = float(os.getenv('AI_BREAKER_RESET', 30))
+
+HEDGE_ENABLED = os.getenv('AI_HEDGE', '1') not in ('0', 'false')
+HEDGE_ENDPOINTS = ('explain-concept', 'evaluate-answer')
+HEDGE_PERCENTILE = 95
+# Hedge only once enough latencies are known for a meaningful p95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+DEADLINE_HEADER = 'X-Deadline-Ms'
+
+# Exceptions (by class name, so the SDK need not be imported) worth retrying
+TRANSIENT_ERRORS = (
+    'DeadlineExceeded',
+    'ServiceUnavailable',
+    'ResourceExhausted',
+    'TooManyRequests',
+    'InternalServerError',
+    'GatewayTimeout',
+    'RetryError',
+    'StubUpstreamError',
+    'PoolExhausted',
+)
+
+_deadline = contextvars.ContextVar('ai_deadline', default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit breaker is open; the upstream call was not attempted"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's deadline passed before the model answered"""
+
+
+def is_transient(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in TRANSIENT_ERRORS
+
+
+def set_deadline(header_value):
+    """Set the current request's deadline from an X-Deadline-Ms header value (milliseconds from now)"""
+    try:
+        remaining = float(header_value) / 1000 if header_value else None
+    except ValueError:
+        remaining = None
+    _deadline.set(time.monotonic() + remaining if remaining is not None else None)
+
+
+def clear_deadline():
+    _deadline.set(None)
+
+
+def with_deadline(fn):
+    """
+    Wrap `fn` so it keeps the current request's deadline when run on another
+    thread, along with the rest of the request's context (such as its trace)
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time; each call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def remaining_time():
+    """Seconds left before the request's deadline, or None without one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and, `reset_after` seconds
+    later, lets one probe call through to decide whether to close again.
+    `tracked` breakers are the upstream's own and are counted in
+    ai_circuit_breaker_open / ai_circuit_breaker_rejections_total; model pool
+    members have untracked ones of their own.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET, tracked=True):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.tracked = tracked
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Whether allow() would let a call through now, without taking the probe"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_after
+            return self.state == self.CLOSED or not self._probing
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                # One probe call decides whether to close again
+                self._probing = True
+                return
+        if self.tracked:
+            metrics.BREAKER_REJECTIONS.inc()
+        raise CircuitOpenError('Upstream model is unavailable, please retry later')
+
+    def abandon(self):
+        """A call let through ended without an answer either way (cancelled); another may probe"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED and self.tracked:
+                metrics.BREAKER_OPEN.dec()
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """Count a failure; returns True when it opened the breaker"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                if self.state == self.CLOSED and self.tracked:
+                    metrics.BREAKER_OPEN.inc()
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+                return True
+            return False
+
+
+class NoBreaker:
+    """The breaker of an upstream whose members break individually (model_pool.py): never opens"""
+
+    state = CircuitBreaker.CLOSED
+
+    def available(self):
+        return True
+
+    def allow(self):
+        pass
+
+    def abandon(self):
+        pass
+
+    def record_success(self):
+        pass
+
+    def record_failure(self):
+        return False
+
+
+class RetryBudget:
+    """Each call deposits `ratio` tokens (up to `reserve`); each retry or hedge withdraws one"""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, reserve=RETRY_BUDGET_RESERVE):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class LatencyTracker:
+    """Recent successful call latencies per endpoint, for the hedge delay"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, seconds):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, endpoint, pct):
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class Resilience:
+    """Timeouts, retries, circuit breaking and hedging for one upstream"""
+
+    def __init__(self, timeout=CALL_TIMEOUT, max_retries=MAX_RETRIES, breaker=None, budget=None,
+                 hedge_endpoints=HEDGE_ENDPOINTS if HEDGE_ENABLED else ()):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.hedge_endpoints = hedge_endpoints
+        self.latency = LatencyTracker()
+        self._hedge_pool = None
+        self._hedge_pool_lock = threading.Lock()
+
+    def _call_timeout(self):
+        remaining = remaining_time()
+        if remaining is None:
+            return self.timeout
+        if remaining <= 0:
+            raise DeadlineExceeded('Request deadline exceeded')
+        return min(self.timeout, remaining)
+
+    def _backoff(self, attempt):
+        return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _retry_delay(self, endpoint, error, attempt):
+        """Seconds to wait before retrying, or None when the error should be raised"""
+        if attempt >= self.max_retries or not is_transient(error):
+            return None
+        delay = self._backoff(attempt)
+        remaining = remaining_time()
+        if remaining is not None and remaining <= delay:
+            # A retry could not finish before the caller gives up
+            return None
+        if not self.budget.withdraw():
+            metrics.UPSTREAM_RETRIES.inc(endpoint, 'budget_exhausted')
+            return None
+        metrics.UPSTREAM_RETRIES.inc(endpoint, 'retry')
+        return delay
+
+    def _hedge_delay(self, endpoint, timeout):
+        if endpoint not in self.hedge_endpoints:
+            return None
+        delay = self.latency.percentile(endpoint, HEDGE_PERCENTILE)
+        if delay is None or delay >= timeout:
+            return None
+        return delay
+
+    def record(self, error):
+        # Non-transient errors (a rejected prompt, a bad key) still mean upstream answered
+        if error is not None and is_transient(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def call(self, endpoint, attempt):
+        """Run `attempt(timeout)` (one upstream call returning text) under the policy"""
+        self.budget.deposit()
+        retries = 0
+        while True:
+            timeout = self._call_timeout()
+            self.breaker.allow()
+            start = time.monotonic()
+            try:
+                delay = self._hedge_delay(endpoint, timeout)
+                text = attempt(timeout) if delay is None else self._hedged(endpoint, attempt, timeout, delay)
+            except Exception as e:
+                self.record(e)
+                wait_for = self._retry_delay(endpoint, e, retries)
+                if wait_for is None:
+                    raise
+                # No retry for a client that has gone
+                cancellation.check(endpoint)
+                time.sleep(wait_for)
+                retries += 1
+                continue
+            except BaseException:
+                # Cancelled without an answer either way; a half-open breaker must not keep waiting for it
+                self.breaker.abandon()
+                raise
+            self.record(None)
+            self.latency.observe(endpoint, time.monotonic() - start)
+            return text
+
+    def _pool(self):
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='hedge')
+            return self._hedge_pool
+
+    def _hedged(self, endpoint, attempt, timeout, delay):
+        """
+        Run `attempt` on the calling thread and, when it has not answered
+        after `delay`, a second identical call on the hedge pool. A blocking
+        call cannot be abandoned, so here the hedge stands in for a first call
+        that fails or times out.
+        """
+        answered = threading.Event()
+        launched = threading.Event()
+
+        def hedge():
+            # Never started once the first call has answered
+            if answered.wait(delay) or cancellation.disconnected() or not self.budget.withdraw():
+                return None
+            launched.set()
+            metrics.UPSTREAM_RETRIES.inc(endpoint, 'hedge')
+            return attempt(timeout - delay)
+
+        # The hedge keeps the request's trace, deadline and disconnect watch
+        second = self._pool().submit(with_deadline(hedge))
+        try:
+            text = attempt(timeout)
+        except Exception as e:
+            error = e
+        else:
+            if launched.is_set():
+                metrics.HEDGE_WINS.inc(endpoint, 'primary')
+            return text
+        finally:
+            answered.set()
+        # second.exception() waits for the hedge, or for it to decide not to start
+        if second.exception() is not None or not launched.is_set():
+            raise error
+        metrics.HEDGE_WINS.inc(endpoint, 'hedge')
+        return second.result()
+
+    async def call_async(self, endpoint, attempt):
+        """Async variant of call(); `attempt(timeout)` returns a coroutine"""
+        self.budget.deposit()
+        retries = 0
+        while True:
+            timeout = self._call_timeout()
+            self.breaker.allow()
+            start = time.monotonic()
+            try:
+                delay = self._hedge_delay(endpoint, timeout)
+                if delay is None:
+                    text = await asyncio.wait_for(attempt(timeout), timeout)
+                else:
+                    text = await self._hedged_async(endpoint, attempt, timeout, delay)
+            except Exception as e:
+                self.record(e)
+                wait_for = self._retry_delay(endpoint, e, retries)
+                if wait_for is None:
+                    raise
+                await asyncio.sleep(wait_for)
+                retries += 1
+                continue
+            except BaseException:
+                # Cancelled (client gone, deadline) without an answer either way
+                self.breaker.abandon()
+                raise
+            self.record(None)
+            self.latency.observe(endpoint, time.monotonic() - start)
+            return text
+
+    async def _hedged_async(self, endpoint, attempt, timeout, delay):
+        first = asyncio.ensure_future(asyncio.wait_for(attempt(timeout), timeout))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.budget.withdraw():
+                metrics.UPSTREAM_RETRIES.inc(endpoint, 'hedge')
+                tasks.append(asyncio.ensure_future(asyncio.wait_for(attempt(timeout - delay), timeout - delay)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Both calls can land in `done` together; a success beats a failure
+                winner = next((task for task in tasks if task in done and task.exception() is None), None)
+                if winner is not None:
+                    if len(tasks) > 1:
+                        metrics.HEDGE_WINS.inc(endpoint, 'primary' if winner is first else 'hedge')
+                    return winner.result()
+            # Every call failed
+            return first.result()
+        finally:
+            # The losing call is cancelled
+            for task in tasks:
+                task.cancel()
+
+
+def resilience_from_env(pool=None):
+    """The failure policy; with a model pool, each member has its own breaker instead of one for the upstream"""
+    return Resilience(breaker=NoBreaker() if pool is not None else None)
@@ -0,0 +1,115 @@
+"""
+Resume profiles for /api/generate-interview-questions and the evaluation routes.
+
+A resume is reduced once to a compact, structured skill profile (headline,
+experience, skills, roles, projects, education) keyed by a fingerprint of
+its normalized text. Interviews for the resume send the rendered profile
+instead of the raw resume, and evaluations that name the profile
+(`resumeProfileId`, returned by the interview route) include it so answers
+are judged against the candidate's background.
+
+The first interview for a resume extracts the profile before generating its
+questions, so identical requests always send the same question prompt and
+are answered from the response cache. Only when extraction fails are the
+questions generated from the raw text. Profiles are kept in an LRU with a
+TTL, optionally backed by a SQLite file (AI_RESUME_PROFILE_DB) so every
+worker process can use them.
+"""
+import hashlib
+import json
+import os
+
+import metrics
+from cache import MemoryCache, ResponseCache, SQLiteCache
+
+ENABLED = os.getenv('AI_RESUME_PROFILES', '1') not in ('0', 'false')
+
+# Include the candidate profile in evaluation prompts when the request names one
+IN_EVALUATION = os.getenv('AI_RESUME_PROFILE_IN_EVALUATION', '1') not in ('0', 'false')
+
+MAX_ENTRIES = int(os.getenv('AI_RESUME_PROFILE_MAX_ENTRIES', 1024))
+
+# Profiles only change when the resume does, so they can live longer than responses
+TTL = int(os.getenv('AI_RESUME_PROFILE_TTL', 7 * 24 * 3600))
+
+# SQLite file shared by worker processes; unset keeps profiles in process memory only
+DB_PATH = os.getenv('AI_RESUME_PROFILE_DB')
+
+# Longest list kept per profile field in rendered prompts
+MAX_ITEMS = 12
+
+KEY_PREFIX = 'resume-profile:'
+
+
+def fingerprint(resume):
+    """Content hash of a resume; whitespace and case differences do not change it"""
+    normalized = ' '.join(str(resume or '').split()).lower()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]
+
+
+def _items(values, limit=MAX_ITEMS):
+    return [value for value in values if value][:limit]
+
+
+def render(profile):
+    """The profile as compact plain text for prompts"""
+    lines = []
+    if profile.get('headline'):
+        lines.append(f"Headline: {profile['headline']}")
+    if profile.get('years_experience') is not None:
+        lines.append(f"Experience: about {profile['years_experience']:g} years")
+    if profile.get('skills'):
+        lines.append(f"Skills: {', '.join(_items(profile['skills'], 30))}")
+    roles = _items(profile.get('roles') or [])
+    if roles:
+        lines.append('Roles:')
+        for role in roles:
+            where = f", {role['organization']}" if role.get('organization') else ''
+            years = f" ({role['years']:g} years)" if role.get('years') is not None else ''
+            highlights = '; '.join(_items(role.get('highlights') or [], 3))
+            lines.append(f"- {role['title']}{where}{years}" + (f": {highlights}" if highlights else ''))
+    for field, label in (('projects', 'Projects'), ('education', 'Education'), ('certifications', 'Certifications')):
+        if profile.get(field):
+            lines.append(f"{label}: {'; '.join(_items(profile[field]))}")
+    return '\n'.join(lines)
+
+
+class ProfileStore:
+    """Profiles by resume fingerprint, stored as JSON in a response-cache style LRU (plus optional SQLite tier)"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, resume_fingerprint):
+        try:
+            text = self.cache.get(KEY_PREFIX + resume_fingerprint)
+        except Exception as e:
+            print(f"Resume profile read failed: {str(e)}")
+            text = None
+        metrics.RESUME_PROFILE_LOOKUPS.inc('hit' if text is not None else 'miss')
+        return json.loads(text) if text is not None else None
+
+    def set(self, resume_fingerprint, profile):
+        self.cache.set(KEY_PREFIX + resume_fingerprint, json.dumps(profile))
+
+
+def store_from_env():
+    """Build the profile store from AI_RESUME_PROFILE_* settings, or None when AI_RESUME_PROFILES=0"""
+    if not ENABLED:
+        return None
+    memory = MemoryCache(max_entries=MAX_ENTRIES, max_bytes=8 * 1024 * 1024, ttl=TTL)
+    disk = SQLiteCache(DB_PATH, ttl=TTL, max_rows=MAX_ENTRIES * 10) if DB_PATH else None
+    return ProfileStore(ResponseCache(memory, disk))
+
+
+def report(resume_fingerprint, resume, profile, cached, used):
+    """The `resume_profile` field of the interview response"""
+    return {
+        'id': resume_fingerprint,
+        'cached': cached,
+        # False when no profile could be extracted: the questions came from the raw text
+        'used_for_questions': used,
+        'resume_chars': len(resume),
+        'profile_chars': len(render(profile)) if profile else None,
+        'profile': profile,
+    }
@@ -0,0 +1,133 @@
+"""
+Production entry point: a prefork Hypercorn server for the AI backend.
+
+    python serve.py                           # asgi:app on 0.0.0.0:$PORT
+    AI_SERVER_APP=app:app python serve.py     # the Flask app, through Hypercorn's WSGI adapter
+
+The master process binds the listening socket and imports the shared
+libraries once, then forks AI_WORKERS workers that inherit both, so a
+worker starts without paying for those imports again. Each worker imports
+the application itself: per-process state (caches, SQLite connections, job
+threads) is never shared across a fork. The Gemini SDK is left to each
+worker's model warm-up unless AI_PRELOAD_SDK=1 moves its import into the
+master as well.
+
+With more than one worker, AI_JOB_DB defaults to data/jobs.db so that any
+worker can report on a background job (see jobs.py).
+
+Workers that die are replaced. SIGINT/SIGTERM stop accepting new
+connections and give in-flight requests AI_GRACEFUL_TIMEOUT seconds.
+"""
+import importlib
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from multiprocessing.connection import wait
+
+from hypercorn.asyncio.run import asyncio_worker
+from hypercorn.config import Config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+WORKERS = int(os.getenv('AI_WORKERS', os.cpu_count() or 1))
+
+APP = os.getenv('AI_SERVER_APP', 'asgi:app')
+
+BIND = os.getenv('AI_BIND', f"0.0.0.0:{os.getenv('PORT', 5001)}")
+
+# Job status and results are shared through this file when there is more than one worker
+DEFAULT_JOB_DB = os.path.join('data', 'jobs.db')
+
+# Seconds in-flight requests get to finish on shutdown
+GRACEFUL_TIMEOUT = float(os.getenv('AI_GRACEFUL_TIMEOUT', 30))
+
+PRELOAD_SDK = os.getenv('AI_PRELOAD_SDK', '0') in ('1', 'true')
+
+# Imported once in the master; forked workers inherit them
+PRELOAD_MODULES = ('flask', 'flask_cors', 'quart', 'quart_cors', 'dotenv', 'orjson', 'sqlite3')
+
+# Seconds between restarts of a worker that keeps dying at start-up
+RESTART_DELAY = 1.0
+
+
+def preload():
+    modules = PRELOAD_MODULES + (('google.generativeai',) if PRELOAD_SDK else ())
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Preload skipped for {name}: {str(e)}")
+
+
+def build_config():
+    config = Config()
+    config.application_path = APP
+    config.bind = [BIND]
+    config.workers = WORKERS
+    config.graceful_timeout = GRACEFUL_TIMEOUT
+    config.accesslog = None
+    config.errorlog = '-'
+    return config
+
+
+def run_worker(config, sockets, shutdown_event):
+    # SIGINT was ignored around the fork; the master coordinates shutdown through the event
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    asyncio_worker(config, sockets, shutdown_event)
+
+
+def main():
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+    if WORKERS > 1:
+        # A job is polled through whichever worker takes the connection, not the one running it
+        os.environ.setdefault('AI_JOB_DB', DEFAULT_JOB_DB)
+    preload()
+    config = build_config()
+    sockets = config.create_sockets()
+    context = multiprocessing.get_context('fork')
+    shutdown_event = context.Event()
+    workers = []
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        shutdown_event.set()
+
+    def spawn():
+        previous = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        process = context.Process(target=run_worker, args=(config, sockets, shutdown_event), daemon=False)
+        process.start()
+        signal.signal(signal.SIGINT, previous)
+        workers.append(process)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Starting AI Backend ({APP}) on {BIND} with {WORKERS} workers...")
+    for _ in range(WORKERS):
+        spawn()
+
+    while not stopping:
+        wait([process.sentinel for process in workers], timeout=1)
+        for process in [p for p in workers if not p.is_alive()]:
+            workers.remove(process)
+            if not stopping:
+                print(f"Worker {process.pid} exited with code {process.exitcode}; starting a new one")
+                time.sleep(RESTART_DELAY)
+                spawn()
+
+    deadline = time.monotonic() + GRACEFUL_TIMEOUT + 5
+    for process in workers:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.terminate()
+    for sock in sockets.insecure_sockets + sockets.secure_sockets:
+        sock.close()
+
+
+if __name__ == '__main__':
+    main()
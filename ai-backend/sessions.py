@@ -0,0 +1,47 @@
+"""
+Helpers for /api/complete-session: the session notes and the assessment are
+generated at the same time from the same session details, and one part
+failing does not discard the other.
+"""
+import json_extract
+
+PARTS = ('notes', 'assessment')
+
+
+def part_error(part, error):
+    """Log a failed part and return the message reported for it"""
+    if isinstance(error, json_extract.ModelOutputError):
+        print(f"JSON decode error in complete_session ({part}): {str(error)}")
+        print(f"Response text: {error.doc}")
+        return 'Failed to parse AI response'
+    print(f"Error in complete_session ({part}): {str(error)}")
+    return f'An error occurred: {str(error)}'
+
+
+def notes_part(notes):
+    if not notes:
+        raise ValueError('Failed to generate notes from AI')
+    return {'content': notes}
+
+
+def completion_response(title, subject, results):
+    """
+    Build the response from one result or exception per part, in PARTS
+    order. Succeeds (200) when at least one part was generated; failed parts
+    are null with a message in `errors`.
+    """
+    body = {'title': title, 'subject': subject}
+    errors = {}
+    for part, result in zip(PARTS, results):
+        if isinstance(result, BaseException):
+            body[part] = None
+            errors[part] = part_error(part, result)
+        else:
+            body[part] = result
+    body['success'] = len(errors) < len(PARTS)
+    if errors:
+        body['errors'] = errors
+    if not body['success']:
+        body['error'] = 'Failed to generate session notes and assessment'
+        return body, 500
+    return body, 200
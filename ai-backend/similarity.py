@@ -0,0 +1,202 @@
+"""
+Near-duplicate lookup for /api/explain-concept.
+
+Students ask about the same concept in different words ("Big-O", "big o
+notation", "what is big O"), which the exact-match response cache treats
+as different prompts. This index keeps recent explanations keyed by their
+normalized concept and context and answers a request from the most similar
+stored one when the similarity reaches AI_SIMILAR_THRESHOLD.
+
+- the concept is lower-cased and split into words with hyphens and
+  punctuation folded away; question filler ("what is", "explain") and
+  plural endings are dropped, and a single letter is joined to the word
+  before it, so "Big-O", "big o" and "BigO" all read as "bigo"
+- descriptor words ("notation", "complexity", "concept") are left out of
+  the concept's core words; only entries with exactly the same core words
+  are candidates, so "unsupervised learning" never answers for "supervised
+  learning" and "non-linear" never answers for "linear"
+- each candidate is scored on word tokens: weighted Jaccard of the concept
+  words (descriptors count DESCRIPTOR_WEIGHT) scaled by CONCEPT_WEIGHT, plus
+  Jaccard of the context words; with different contexts a concept alone
+  cannot reach the default threshold
+- entries expire after AI_SIMILAR_CACHE_TTL seconds and the least recently
+  used are evicted beyond AI_SIMILAR_CACHE_MAX_ENTRIES
+
+The index lives in process memory; every worker builds its own.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+ENABLED = os.getenv('AI_SIMILAR_CACHE', '1') not in ('0', 'false')
+
+# Combined similarity (0-1) a stored explanation needs to be served
+THRESHOLD = float(os.getenv('AI_SIMILAR_THRESHOLD', 0.9))
+
+MAX_ENTRIES = int(os.getenv('AI_SIMILAR_CACHE_MAX_ENTRIES', 2048))
+TTL = int(os.getenv('AI_SIMILAR_CACHE_TTL', 3600))
+
+# Share of the similarity that comes from the concept; the rest from the context
+CONCEPT_WEIGHT = 0.75
+
+# Weight of a descriptor word ("big o notation" vs "big o") in the concept overlap
+DESCRIPTOR_WEIGHT = 0.05
+
+CACHE_SIMILAR = 'SIMILAR'
+
+WORD = re.compile(r'[a-z0-9]+')
+FILLER = frozenset((
+    'a', 'an', 'the', 'what', 'whats', 'is', 'are', 'explain', 'define', 'definition',
+    'meaning', 'of', 'how', 'does', 'do', 'please', 'me', 'about', 'mean', 'work',
+))
+DESCRIPTORS = frozenset((
+    'notation', 'complexity', 'concept', 'term', 'terminology', 'basic', 'introduction',
+    'intro', 'overview', 'in', 'and', 'for', 'to', 'with', 'on',
+))
+
+
+def _words(text):
+    words = []
+    for word in WORD.findall(str(text or '').lower()):
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def concept_words(concept):
+    """'What is Big-O notation?' -> ['bigo', 'notation']"""
+    words = []
+    for word in _words(concept):
+        if len(word) == 1 and word.isalpha() and words and words[-1] not in FILLER:
+            words[-1] += word
+        else:
+            words.append(word)
+    kept = [word for word in words if word not in FILLER]
+    return kept or words
+
+
+def normalize_concept(concept):
+    """'What is Big-O notation?' -> 'bigo notation'"""
+    return ' '.join(concept_words(concept))
+
+
+def core_words(words):
+    """The words that must match exactly: everything but descriptors"""
+    core = frozenset(word for word in words if word not in DESCRIPTORS)
+    return core or frozenset(words)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _weight(words):
+    return sum(DESCRIPTOR_WEIGHT if word in DESCRIPTORS else 1.0 for word in words)
+
+
+def weighted_jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return _weight(a & b) / _weight(a | b)
+
+
+class Match:
+    def __init__(self, value, similarity, concept):
+        self.value = value
+        self.similarity = similarity
+        self.concept = concept
+
+
+class _Entry:
+    def __init__(self, concept, words, core, context, value, expires_at):
+        self.concept = concept
+        self.words = words
+        self.core = core
+        self.context = context
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SimilarityIndex:
+    """Thread-safe LRU of explanations, grouped by the core words of their concepts"""
+
+    def __init__(self, threshold=THRESHOLD, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _features(concept, context):
+        words = concept_words(concept)
+        return frozenset(words), core_words(words), frozenset(_words(context))
+
+    def _similarity(self, words, context, entry):
+        return CONCEPT_WEIGHT * weighted_jaccard(words, entry.words) + (1 - CONCEPT_WEIGHT) * jaccard(context, entry.context)
+
+    def lookup(self, concept, context=''):
+        """The best stored explanation at or above the threshold, as a Match, or None"""
+        words, core, context_words = self._features(concept, context)
+        now = time.time()
+        best, best_key, best_similarity = None, None, 0.0
+        with self._lock:
+            candidates = list(self._groups.get(core, ()))
+            for key in candidates:
+                entry = self._entries[key]
+                if entry.expires_at <= now:
+                    self._remove(key)
+                    continue
+                similarity = self._similarity(words, context_words, entry)
+                if similarity > best_similarity:
+                    best, best_key, best_similarity = entry, key, similarity
+            if best is not None and best_similarity >= self.threshold:
+                self._entries.move_to_end(best_key)
+            else:
+                best = None
+        if candidates:
+            metrics.SIMILAR_CACHE_SIMILARITY.observe(best_similarity)
+        metrics.SIMILAR_CACHE_LOOKUPS.inc('hit' if best is not None else 'miss')
+        if best is None:
+            return None
+        return Match(best.value, round(best_similarity, 3), best.concept)
+
+    def add(self, concept, context, value):
+        if not value:
+            return
+        words, core, context_words = self._features(concept, context)
+        key = (words, context_words)
+        entry = _Entry(str(concept), words, core, context_words, value, time.time() + self.ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._groups.setdefault(core, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        group = self._groups.get(entry.core)
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._groups[entry.core]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def index_from_env():
+    """Build the explain-concept index from AI_SIMILAR_* settings, or None when disabled"""
+    if not ENABLED:
+        return None
+    return SimilarityIndex()
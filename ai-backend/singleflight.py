@@ -0,0 +1,157 @@
+"""
+Single-flight coalescing: concurrent callers asking for the same key share
+one execution of the work, and all of them get its result or its error.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process locking is unavailable
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls within one process"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._async_calls = {}
+
+    def do(self, key, fn, wait=None):
+        """
+        Run fn() once per key at a time. Returns (result, shared) where
+        `shared` is True for callers that waited on another caller's run.
+        Those callers block in wait(event) until the run is done; it may raise
+        to stop waiting early, and the run carries on for the others.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            with self._lock:
+                call.waiters += 1
+            try:
+                (wait or threading.Event.wait)(call.done)
+            finally:
+                with self._lock:
+                    call.waiters -= 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def shared(self, key):
+        """Whether callers besides the one running `key` are waiting for it"""
+        with self._lock:
+            call = self._calls.get(key)
+            return call is not None and call.waiters > 0
+
+    async def do_async(self, key, fn):
+        """
+        Async variant of do(); fn is a coroutine function. The shared call runs
+        as its own task, so a cancelled waiter does not cancel it for the
+        others; it is only cancelled once every waiter has gone.
+        """
+        entry = self._async_calls.get(key)
+        shared = entry is not None
+        if not shared:
+            entry = [asyncio.ensure_future(fn()), 0]
+            self._async_calls[key] = entry
+            entry[0].add_done_callback(lambda _: self._forget(key, entry))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _forget(self, key, entry):
+        if self._async_calls.get(key) is entry:
+            del self._async_calls[key]
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a per-key file, used to coalesce identical
+    calls across worker processes that share a cache. A no-op without fcntl.
+    The holder removes the file when it releases the lock, so the directory
+    only holds files for generations in flight; a waiter that was granted
+    the lock on a file removed meanwhile starts again on the current one.
+    """
+
+    def __init__(self, directory, key):
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        self.path = os.path.join(directory, f'{name}.lock')
+        self._file = None
+
+    def acquire(self):
+        if fcntl is None:
+            return
+        while True:
+            lock_file = open(self.path, 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(lock_file.fileno()).st_ino:
+                self._file = lock_file
+                return
+            lock_file.close()
+
+    def release(self):
+        if self._file is None:
+            return
+        # Removed while still locked, so nobody can be granted the lock on it and also see it as current
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def lock_dir_from_env():
+    """Directory for cross-process lock files (AI_SINGLEFLIGHT_DIR), or None when disabled"""
+    directory = os.getenv('AI_SINGLEFLIGHT_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return directory
@@ -0,0 +1,61 @@
+import asyncio
+
+import codec
+import metrics
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event with a JSON payload"""
+    message = f'event: {event}\n' if event else ''
+    return message + f'data: {codec.dumps(data)}\n\n'
+
+
+def markdown_events(chunks, metadata, route='unmatched'):
+    """
+    Turn a stream of markdown chunks into SSE events.
+
+    Each chunk is sent as a `chunk` event ({"text": ...}). When the stream
+    ends a `done` event carries the same metadata the JSON endpoint returns.
+    Failures mid-stream are reported as an `error` event. When the client
+    disconnects, `chunks` is closed so the model stream behind it stops too.
+    """
+    try:
+        received = False
+        for text in chunks:
+            received = True
+            yield sse_event({'text': text}, event='chunk')
+        if not received:
+            yield sse_event({'error': 'AI returned an empty response'}, event='error')
+            return
+        yield sse_event(dict(metadata, success=True), event='done')
+    except GeneratorExit:
+        metrics.CLIENT_DISCONNECTS.inc(route, 'streaming')
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        raise
+    except Exception as e:
+        print(f"Error while streaming response: {str(e)}")
+        yield sse_event({'error': f'An error occurred while streaming: {str(e)}'}, event='error')
+
+
+async def markdown_events_async(chunks, metadata, route='unmatched'):
+    """Async variant of markdown_events() for the asyncio server"""
+    try:
+        received = False
+        async for text in chunks:
+            received = True
+            yield sse_event({'text': text}, event='chunk')
+        if not received:
+            yield sse_event({'error': 'AI returned an empty response'}, event='error')
+            return
+        yield sse_event(dict(metadata, success=True), event='done')
+    except (GeneratorExit, asyncio.CancelledError):
+        metrics.CLIENT_DISCONNECTS.inc(route, 'streaming')
+        close = getattr(chunks, 'aclose', None)
+        if close is not None:
+            await close()
+        raise
+    except Exception as e:
+        print(f"Error while streaming response: {str(e)}")
+        yield sse_event({'error': f'An error occurred while streaming: {str(e)}'}, event='error')
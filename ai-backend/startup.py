@@ -0,0 +1,51 @@
+"""
+Cold-start timing for one server process.
+
+Phases are measured from the moment the process started (read from /proc on
+Linux, otherwise from the first import of this module), so interpreter
+start-up and imports count too:
+
+- app_loaded: the application module has been imported
+- serving: the server accepts connections (asgi.py)
+- model_ready: the model client has been built (SDK imported, key checked)
+- first_request: the first request has been answered
+
+Each phase is recorded once, returned by /health/ready and exported as
+ai_startup_seconds{phase}.
+"""
+import os
+import time
+
+import metrics
+
+
+def _process_age():
+    """Seconds since this process started, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the parenthesised command name; starttime is field 22 of the line
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+STARTED = time.monotonic() - (_process_age() or 0.0)
+
+_phases = {}
+
+
+def mark(phase):
+    """Record that `phase` was reached, the first time only"""
+    if phase in _phases:
+        return
+    seconds = round(time.monotonic() - STARTED, 4)
+    _phases[phase] = seconds
+    # Set once per phase, so adding to the initial 0 sets the gauge
+    metrics.STARTUP_SECONDS.inc(phase, amount=seconds)
+
+
+def report():
+    return dict(_phases)
@@ -0,0 +1,512 @@
+"""
+Structured-output mode for the JSON endpoints.
+
+Each spec declares a response schema that is sent to Gemini together with the
+JSON MIME type, and checks the result strictly (exact question count, four
+options, correct_answer among the options, ...). When the result falls short,
+the spec issues short repair requests that carry only what is wrong:
+
+- invalid items are sent back alone, with their problems listed
+- missing questions are requested on their own, given only the existing stems
+- surplus questions are trimmed locally
+- output that is not JSON at all is sent back to be converted
+
+The original prompt is never resent. Repair logic is written as a generator
+of (prompt, schema) steps so the sync and async clients can both drive it.
+When a repair request fails, repairs stop and the output is kept as far as
+it got; the endpoint's own validation then decides whether it is usable.
+"""
+import json
+import os
+
+import cancellation
+import metrics
+from json_extract import ModelOutputError, coerce_score, match_option, parse_model_json, string_list
+
+STRUCTURED_OUTPUT = os.getenv('AI_STRUCTURED_OUTPUT', '1') not in ('0', 'false')
+
+# Repair rounds per generation; 0 disables repair requests
+MAX_REPAIRS = int(os.getenv('AI_MAX_REPAIRS', 2))
+
+# Raw output sent back for conversion is capped to keep repair requests short
+MAX_FRAGMENT_CHARS = 6000
+
+STRING = {'type': 'string'}
+STRING_LIST = {'type': 'array', 'items': STRING}
+
+MCQ_ITEM = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'integer'},
+        'question': STRING,
+        'options': {'type': 'array', 'items': STRING, 'min_items': 4, 'max_items': 4},
+        'correct_answer': STRING,
+        'explanation': STRING,
+    },
+    'required': ['id', 'question', 'options', 'correct_answer', 'explanation'],
+}
+
+INTERVIEW_ITEM = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'integer'},
+        'question': STRING,
+        'type': {'type': 'string', 'format': 'enum', 'enum': ['technical', 'behavioral', 'situational']},
+        'expectedPoints': STRING_LIST,
+    },
+    'required': ['id', 'question', 'type', 'expectedPoints'],
+}
+
+EVALUATION_PROPERTIES = {
+    'score': {'type': 'number'},
+    'strengths': STRING_LIST,
+    'improvements': STRING_LIST,
+    'feedback': STRING,
+}
+
+EVALUATION = {
+    'type': 'object',
+    'properties': EVALUATION_PROPERTIES,
+    'required': ['score', 'strengths', 'improvements', 'feedback'],
+}
+
+EVALUATION_ITEM = {
+    'type': 'object',
+    'properties': dict(EVALUATION_PROPERTIES, id={'type': 'integer'}),
+    'required': ['id', 'score', 'strengths', 'improvements', 'feedback'],
+}
+
+LEARNING_MODULE = {
+    'type': 'object',
+    'properties': {
+        'kind': {'type': 'string', 'format': 'enum', 'enum': ['fundamentals', 'project', 'milestone']},
+        'title': STRING,
+        'summary': STRING,
+        'objectives': STRING_LIST,
+        'resources': STRING_LIST,
+        'effort_weeks': {'type': 'number'},
+        'core': {'type': 'boolean'},
+    },
+    'required': ['kind', 'title', 'summary', 'objectives', 'resources', 'effort_weeks', 'core'],
+}
+
+RESUME_ROLE = {
+    'type': 'object',
+    'properties': {
+        'title': STRING,
+        'organization': STRING,
+        'years': {'type': 'number', 'nullable': True},
+        'highlights': STRING_LIST,
+    },
+    'required': ['title', 'organization', 'highlights'],
+}
+
+RESUME_PROFILE = {
+    'type': 'object',
+    'properties': {
+        'headline': STRING,
+        'years_experience': {'type': 'number', 'nullable': True},
+        'skills': STRING_LIST,
+        'roles': {'type': 'array', 'items': RESUME_ROLE},
+        'projects': STRING_LIST,
+        'education': STRING_LIST,
+        'certifications': STRING_LIST,
+    },
+    'required': ['headline', 'skills', 'roles', 'projects', 'education', 'certifications'],
+}
+
+
+def _text(value):
+    return isinstance(value, str) and value.strip()
+
+
+def mcq_problems(item):
+    """Problems with one multiple-choice question; fixes a letter-style correct_answer in place"""
+    problems = []
+    if not _text(item.get('question')):
+        problems.append('"question" must be a non-empty string')
+    options = item.get('options')
+    if not isinstance(options, list) or len(options) != 4 or not all(_text(o) for o in options):
+        problems.append('"options" must be exactly 4 non-empty strings')
+    elif len(set(options)) != 4:
+        problems.append('"options" must all be different')
+    else:
+        answer = item.get('correct_answer')
+        if answer not in options and isinstance(answer, str):
+            matched = match_option(answer.strip(), options)
+            if matched is not None:
+                item['correct_answer'] = answer = matched
+        if answer not in options:
+            problems.append('"correct_answer" must be exactly one of the "options"')
+    if not _text(item.get('explanation')):
+        problems.append('"explanation" must be a non-empty string')
+    return problems
+
+
+def interview_problems(item):
+    problems = []
+    if not _text(item.get('question')):
+        problems.append('"question" must be a non-empty string')
+    if item.get('type') not in INTERVIEW_ITEM['properties']['type']['enum']:
+        problems.append('"type" must be one of "technical", "behavioral", "situational"')
+    points = item.get('expectedPoints')
+    if not isinstance(points, list) or not points or not all(_text(p) for p in points):
+        problems.append('"expectedPoints" must be a non-empty list of strings')
+    return problems
+
+
+def evaluation_problems(item):
+    """Problems with one evaluation; fixes score strings like "8/10" and string-for-list fields in place"""
+    problems = []
+    if 'score' in item and coerce_score(item['score']) is not None:
+        item['score'] = coerce_score(item['score'])
+    for field in ('strengths', 'improvements'):
+        if isinstance(item.get(field), str):
+            item[field] = string_list(item[field])
+    score = item.get('score')
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 10:
+        problems.append('"score" must be a number from 0 to 10')
+    for field in ('strengths', 'improvements'):
+        if not isinstance(item.get(field), list) or not all(isinstance(s, str) for s in item[field]):
+            problems.append(f'"{field}" must be a list of strings')
+    if not _text(item.get('feedback')):
+        problems.append('"feedback" must be a non-empty string')
+    return problems
+
+
+def learning_module_problems(item):
+    problems = []
+    if not _text(item.get('title')):
+        problems.append('"title" must be a non-empty string')
+    if item.get('kind') not in LEARNING_MODULE['properties']['kind']['enum']:
+        problems.append('"kind" must be one of "fundamentals", "project", "milestone"')
+    effort = item.get('effort_weeks')
+    if isinstance(effort, bool) or not isinstance(effort, (int, float)) or effort < 0:
+        problems.append('"effort_weeks" must be a non-negative number')
+    objectives = item.get('objectives')
+    if not isinstance(objectives, list) or not all(isinstance(o, str) for o in objectives):
+        problems.append('"objectives" must be a list of strings')
+    return problems
+
+
+def resume_profile_problems(item):
+    problems = []
+    skills = item.get('skills')
+    if not isinstance(skills, list) or not all(isinstance(s, str) for s in skills):
+        problems.append('"skills" must be a list of strings')
+    roles = item.get('roles')
+    if not isinstance(roles, list) or not all(isinstance(r, dict) and _text(r.get('title')) for r in roles):
+        problems.append('"roles" must be a list of objects with a non-empty "title"')
+    if not skills and not roles:
+        problems.append('the profile must list the skills or roles in the resume')
+    return problems
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False)
+
+
+class ListSpec:
+    """
+    A response whose payload is a list of items at `path`, e.g.
+    {"questions": [...]} or {"assessment": {"questions": [...]}}.
+    `count` is the exact number of items expected, or None for any number.
+    """
+
+    def __init__(self, name, path, item_schema, problems, count=None, describe='items', extra=None):
+        self.name = name
+        self.path = path
+        self.item_schema = item_schema
+        self.problems = problems
+        self.count = count
+        self.describe = describe
+        self.extra = extra or {}
+
+    def _list_schema(self, count):
+        schema = {'type': 'array', 'items': self.item_schema}
+        if count:
+            schema.update(min_items=count, max_items=count)
+        return schema
+
+    def schema(self):
+        """Response schema for the whole payload"""
+        key = self.path[-1]
+        inner = {
+            'type': 'object',
+            'properties': dict(self.extra, **{key: self._list_schema(self.count)}),
+            'required': list(self.extra) + [key],
+        }
+        for outer in reversed(self.path[:-1]):
+            inner = {'type': 'object', 'properties': {outer: inner}, 'required': [outer]}
+        return inner
+
+    def _items_schema(self, count):
+        """Schema for a repair reply: just {key: [count items]}"""
+        key = self.path[-1]
+        return {'type': 'object', 'properties': {key: self._list_schema(count)}, 'required': [key]}
+
+    def generation_config(self):
+        if not STRUCTURED_OUTPUT:
+            return None
+        return {'response_mime_type': 'application/json', 'response_schema': self.schema()}
+
+    def _container(self, data):
+        """The dict holding the item list, tolerating a missing outer wrapper"""
+        for key in self.path[:-1]:
+            if isinstance(data, dict) and isinstance(data.get(key), dict):
+                data = data[key]
+        return data if isinstance(data, dict) else None
+
+    def _wrap(self, data):
+        if isinstance(data, list):
+            data = {self.path[-1]: data}
+        if not isinstance(data, dict):
+            return None
+        if len(self.path) > 1 and self.path[0] not in data:
+            data = {self.path[0]: data}
+        return data
+
+    def _shaped(self, data, doc):
+        """`data` wrapped as the spec's container; rejected unless its list holds an object"""
+        data = self._wrap(data)
+        container = self._container(data) if data is not None else None
+        items = container.get(self.path[-1]) if container is not None else None
+        if not isinstance(items, list) or not any(isinstance(item, dict) for item in items):
+            raise ModelOutputError(f'AI response is missing a "{self.path[-1]}" list', doc)
+        return data
+
+    def repair_steps(self, text):
+        """
+        Generator of repair steps. Yields (prompt, schema) and receives the
+        model's reply, or None when the repair request failed; returns the
+        final JSON text.
+        """
+        try:
+            data = parse_model_json(text, self._shaped)
+        except ModelOutputError:
+            data = None
+        if data is None:
+            metrics.STRUCTURED_REPAIRS.inc(self.name, 'convert')
+            reply = yield (convert_prompt(text, self.schema()), self.schema())
+            data = self._wrap(_parse_or_none(reply))
+            if data is None:
+                return text
+
+        container = self._container(data)
+        if container is None:
+            return text
+        key = self.path[-1]
+        items = container.get(key)
+        items = [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+        for _ in range(MAX_REPAIRS):
+            invalid = [(i, problems) for i, problems in
+                       ((i, self.problems(item)) for i, item in enumerate(items)) if problems]
+            if invalid:
+                metrics.STRUCTURED_REPAIRS.inc(self.name, 'items')
+                reply = yield (fix_items_prompt([items[i] for i, _ in invalid], [p for _, p in invalid]),
+                               self._items_schema(len(invalid)))
+                if reply is None:
+                    break
+                fixed = _items_from(reply, key)
+                for (i, _), item in zip(invalid, fixed):
+                    if isinstance(item, dict) and not self.problems(item):
+                        items[i] = item
+
+            missing = (self.count - len(items)) if self.count else 0
+            if missing > 0:
+                metrics.STRUCTURED_REPAIRS.inc(self.name, 'missing')
+                reply = yield (more_items_prompt(self.describe, missing, items), self._items_schema(missing))
+                if reply is None:
+                    break
+                items.extend(item for item in _items_from(reply, key)[:missing]
+                             if isinstance(item, dict) and not self.problems(item))
+
+            if not any(self.problems(item) for item in items) and \
+                    (not self.count or len(items) >= self.count):
+                break
+
+        if self.count:
+            items = items[:self.count]
+            for index, item in enumerate(items):
+                item['id'] = index + 1
+        container[key] = items
+        return _dumps(data)
+
+
+class ObjectSpec:
+    """A response that is a single JSON object"""
+
+    def __init__(self, name, schema, problems):
+        self.name = name
+        self._schema = schema
+        self.problems = problems
+
+    def schema(self):
+        return self._schema
+
+    def generation_config(self):
+        if not STRUCTURED_OUTPUT:
+            return None
+        return {'response_mime_type': 'application/json', 'response_schema': self._schema}
+
+    def repair_steps(self, text):
+        data = _parse_or_none(text, _object)
+        if not isinstance(data, dict):
+            metrics.STRUCTURED_REPAIRS.inc(self.name, 'convert')
+            reply = yield (convert_prompt(text, self._schema), self._schema)
+            data = _parse_or_none(reply)
+            if not isinstance(data, dict):
+                return text
+
+        for _ in range(MAX_REPAIRS):
+            problems = self.problems(data)
+            if not problems:
+                break
+            metrics.STRUCTURED_REPAIRS.inc(self.name, 'items')
+            reply = yield (fix_items_prompt([data], [problems], single=True), self._schema)
+            if reply is None:
+                break
+            fixed = _parse_or_none(reply)
+            if isinstance(fixed, dict):
+                data = fixed
+        return _dumps(data)
+
+
+def _parse_or_none(text, validate=None):
+    try:
+        return parse_model_json(text or '', validate)
+    except ModelOutputError:
+        return None
+
+
+def _object(data, doc):
+    if not isinstance(data, dict):
+        raise ModelOutputError('AI response is not a JSON object', doc)
+    return data
+
+
+def _items_from(reply, key):
+    data = _parse_or_none(reply)
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        if isinstance(data.get(key), list):
+            return data[key]
+        for value in data.values():
+            if isinstance(value, dict) and isinstance(value.get(key), list):
+                return value[key]
+        return [data]
+    return []
+
+
+def convert_prompt(text, schema):
+    fragment = text[:MAX_FRAGMENT_CHARS]
+    return f"""Convert the following text into valid JSON that matches this schema:
+{_dumps(schema)}
+
+Keep its content; do not add new content.
+
+{fragment}
+
+Return ONLY valid JSON."""
+
+
+def fix_items_prompt(items, problems, single=False):
+    listing = '\n\n'.join(
+        f"Item {n}:\n{_dumps(item)}\nProblems:\n" + '\n'.join(f'- {p}' for p in item_problems)
+        for n, (item, item_problems) in enumerate(zip(items, problems), start=1)
+    )
+    shape = 'the corrected object' if single else 'the corrected items, in the same order, as JSON'
+    return f"""The following JSON failed validation. Fix only the listed problems and keep everything else.
+
+{listing}
+
+Return {shape}. Return ONLY valid JSON."""
+
+
+def more_items_prompt(describe, count, existing):
+    stems = '\n'.join(f"- {item.get('question', '')}" for item in existing)
+    example = f"\n\nUse the same JSON fields as this existing item:\n{_dumps(existing[0])}" if existing else ''
+    return f"""Write {count} more {describe} on the same topic as these existing ones, without repeating them:
+
+{stems}{example}
+
+Return ONLY valid JSON."""
+
+
+def _count(value, default):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def quiz_spec(num_questions):
+    return ListSpec('generate-quiz', ('questions',), MCQ_ITEM, mcq_problems,
+                    count=_count(num_questions, 5), describe='multiple-choice questions')
+
+
+def assessment_spec(num_questions):
+    return ListSpec('generate-session-assessment', ('assessment', 'questions'), MCQ_ITEM, mcq_problems,
+                    count=_count(num_questions, 5), describe='multiple-choice questions',
+                    extra={'title': STRING, 'subject': STRING})
+
+
+def interview_spec(count=10):
+    return ListSpec('generate-interview-questions', ('questions',), INTERVIEW_ITEM, interview_problems,
+                    count=count, describe='interview questions')
+
+
+def evaluation_spec():
+    return ObjectSpec('evaluate-answer', EVALUATION, evaluation_problems)
+
+
+def evaluations_spec():
+    # Answers are matched back by id, so missing evaluations become per-item errors instead
+    return ListSpec('evaluate-answers', ('evaluations',), EVALUATION_ITEM, evaluation_problems)
+
+
+def learning_modules_spec():
+    return ListSpec('generate-learning-path-modules', ('modules',), LEARNING_MODULE, learning_module_problems,
+                    describe='learning path modules')
+
+
+def resume_profile_spec():
+    return ObjectSpec('extract-resume-profile', RESUME_PROFILE, resume_profile_problems)
+
+
+def _failed(error):
+    """A repair request that failed is answered with None; a client that has gone still stops the work"""
+    if cancellation.is_cancellation(error):
+        raise error
+    print(f"Error in repair request: {str(error)}")
+    return None
+
+
+def run_steps(steps, ask):
+    """Drive a repair generator with a synchronous ask(prompt, schema) -> text"""
+    try:
+        step = next(steps)
+        while True:
+            try:
+                reply = ask(*step)
+            except Exception as e:
+                reply = _failed(e)
+            step = steps.send(reply)
+    except StopIteration as done:
+        return done.value
+
+
+async def run_steps_async(steps, ask):
+    """Drive a repair generator with an async ask(prompt, schema) -> text"""
+    try:
+        step = next(steps)
+        while True:
+            try:
+                reply = await ask(*step)
+            except Exception as e:
+                reply = _failed(e)
+            step = steps.send(reply)
+    except StopIteration as done:
+        return done.value
@@ -0,0 +1,279 @@
+"""
+Offline stand-in for genai.GenerativeModel, selected with AI_MODEL_BACKEND=stub.
+
+It answers every prompt with canned, correctly shaped output (markdown for the
+note/path endpoints, JSON for quiz, assessment, interview and evaluation
+prompts) after a configurable simulated latency, and can fail a configurable
+fraction of calls. Useful for load tests and local development without
+spending Gemini quota.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+
+STUB_MODEL_NAME = 'stub'
+
+
+class StubUpstreamError(RuntimeError):
+    """Simulated upstream failure"""
+
+
+class StubTimeout(TimeoutError):
+    """The simulated latency exceeded the request's timeout"""
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _AsyncChunks:
+    def __init__(self, chunks, delays):
+        self._chunks = chunks
+        self._delays = delays
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk, delay in zip(self._chunks, self._delays):
+            await asyncio.sleep(delay)
+            yield StubResponse(chunk)
+
+
+class LatencyDistribution:
+    """
+    Simulated latency in seconds, parsed from a spec string:
+
+        fixed:0.5
+        uniform:0.2:1.5
+        normal:0.8:0.2            (mean, standard deviation)
+        lognormal:0.8:0.5         (median, sigma)
+    """
+
+    def __init__(self, spec='fixed:0', rng=None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, *params = spec.split(':')
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f'Unknown latency distribution: {spec}')
+
+    def sample(self):
+        p = self.params
+        if self.kind == 'fixed':
+            value = p[0] if p else 0.0
+        elif self.kind == 'uniform':
+            value = self.rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            value = self.rng.gauss(p[0], p[1])
+        else:
+            value = self.rng.lognormvariate(0, p[1]) * p[0]
+        return max(0.0, value)
+
+
+def _numbers(pattern, prompt, default):
+    match = re.search(pattern, prompt)
+    return int(match.group(1)) if match else default
+
+
+def _field(pattern, prompt, default):
+    match = re.search(pattern, prompt)
+    return match.group(1).strip() if match else default
+
+
+def _mcq(i, topic):
+    options = [f'{topic} option {letter}' for letter in 'ABCD']
+    return {
+        'id': i,
+        'question': f'Question {i} about {topic}?',
+        'options': options,
+        'correct_answer': options[i % 4],
+        'explanation': f'Option {"ABCD"[i % 4]} is correct for question {i}.'
+    }
+
+
+def _questions_to_avoid(prompt):
+    """How many existing questions the prompt lists as not to be repeated"""
+    _, marker, listed = prompt.partition('Do not repeat or rephrase any of these existing questions:')
+    return len(re.findall(r'^- ', listed, re.MULTILINE)) if marker else 0
+
+
+def _module(kind, title, effort, core=True):
+    return {
+        'kind': kind,
+        'title': title,
+        'summary': f'Placeholder {kind} module from the stub model.',
+        'objectives': [f'{title} objective 1', f'{title} objective 2'],
+        'resources': [f'{title} reading', f'{title} exercises'],
+        'effort_weeks': effort,
+        'core': core
+    }
+
+
+def canned_json(prompt):
+    """Canned JSON shaped like the structure the prompt asks for, or None for markdown prompts"""
+    if '"years_experience"' in prompt:
+        return {
+            'headline': 'Software engineer building web services',
+            'years_experience': 5,
+            'skills': ['Python', 'Flask', 'SQL', 'React', 'AWS'],
+            'roles': [
+                {'title': 'Software Engineer', 'organization': 'Example Corp', 'years': 3,
+                 'highlights': ['Built a REST API serving 1M requests a day', 'Led the move to AWS']},
+                {'title': 'Junior Developer', 'organization': 'Startup Inc', 'years': 2,
+                 'highlights': ['Shipped the React dashboard']},
+            ],
+            'projects': ['Open-source task queue'],
+            'education': ['BSc Computer Science'],
+            'certifications': [],
+        }
+    if '"modules"' in prompt:
+        topic = _field(r'Topic: (.*)', prompt, 'the topic')
+        return {'modules': [
+            _module('fundamentals', f'{topic} basics', 1),
+            _module('fundamentals', f'Core {topic} concepts', 1.5),
+            _module('milestone', 'Explain the core concepts', 0),
+            _module('project', f'First {topic} project', 2),
+            _module('fundamentals', f'Advanced {topic} topics', 1.5, core=False),
+            _module('project', f'Second {topic} project', 2, core=False),
+            _module('milestone', 'Ship a portfolio project', 0),
+        ]}
+    if '"evaluations"' in prompt:
+        ids = [int(i) for i in re.findall(r'### Answer (\d+)', prompt)] or [1]
+        return {'evaluations': [canned_evaluation(i) for i in ids]}
+    if '"assessment"' in prompt:
+        count = _numbers(r'EXACTLY (\d+) questions', prompt, 5)
+        start = _questions_to_avoid(prompt) + 1
+        title = _field(r'Session Title: (.*)', prompt, 'Session')
+        return {'assessment': {
+            'title': title,
+            'subject': _field(r'Subject: (.*)', prompt, 'Subject'),
+            'questions': [_mcq(i, title) for i in range(start, start + count)]
+        }}
+    if '"expectedPoints"' in prompt:
+        count = _numbers(r'generate exactly (\d+)', prompt, 10)
+        types = ('technical', 'behavioral', 'situational')
+        return {'questions': [{
+            'id': i,
+            'question': f'Interview question {i}?',
+            'type': types[i % 3],
+            'expectedPoints': [f'point {i}.1', f'point {i}.2']
+        } for i in range(1, count + 1)]}
+    if '"correct_answer"' in prompt:
+        count = _numbers(r'EXACTLY (\d+) questions', prompt, 5)
+        start = _questions_to_avoid(prompt) + 1
+        return {'questions': [_mcq(i, 'the notes') for i in range(start, start + count)]}
+    if '"score"' in prompt:
+        return canned_evaluation(None)
+    return None
+
+
+def canned_evaluation(item_id):
+    evaluation = {
+        'score': 7,
+        'strengths': ['Clear structure', 'Relevant example'],
+        'improvements': ['Cover more of the expected points'],
+        'feedback': 'A solid answer that could go deeper on the key points.'
+    }
+    if item_id is not None:
+        evaluation = dict(id=item_id, **evaluation)
+    return evaluation
+
+
+def canned_markdown(prompt):
+    """Markdown with the same `#`/`##` headings the prompt asks for"""
+    headings = re.findall(r'^(#{1,2} .+)$', prompt, flags=re.MULTILINE)
+    if not headings:
+        headings = ['## Overview', '## Details', '## Next Steps']
+    paragraph = ('This is placeholder content from the stub model. ' * 6).strip()
+    sections = [f'{heading}\n\n{paragraph}\n\n- First point\n- Second point' for heading in headings]
+    return '\n\n'.join(sections)
+
+
+def canned_response(prompt):
+    data = canned_json(prompt)
+    if data is None:
+        return canned_markdown(prompt)
+    return '```json\n' + json.dumps(data, indent=2) + '\n```'
+
+
+class StubModel:
+    """Drop-in replacement for genai.GenerativeModel backed by canned output"""
+
+    STREAM_CHUNKS = 8
+
+    def __init__(self, latency='fixed:0', failure_rate=0.0, seed=None):
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.latency = LatencyDistribution(latency, rng=self._rng)
+        self.failure_rate = failure_rate
+
+    def _draw(self):
+        with self._rng_lock:
+            return self.latency.sample(), self._rng.random() < self.failure_rate
+
+    def _chunks(self, text):
+        size = max(1, len(text) // self.STREAM_CHUNKS + 1)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _stream_delays(self, latency, count):
+        # About a third of the latency passes before the first chunk
+        first = latency / 3
+        rest = (latency - first) / max(1, count - 1)
+        return [first] + [rest] * (count - 1)
+
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+        latency, fail = self._draw()
+        text = canned_response(prompt)
+        if not stream:
+            # Honor the SDK's request timeout like the real client does
+            timeout = (request_options or {}).get('timeout')
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise StubTimeout(f'Simulated upstream call timed out after {timeout}s')
+            time.sleep(latency)
+            if fail:
+                raise StubUpstreamError('Simulated upstream failure')
+            return StubResponse(text)
+
+        chunks = self._chunks(text)
+
+        def iterate():
+            for chunk, delay in zip(chunks, self._stream_delays(latency, len(chunks))):
+                time.sleep(delay)
+                if fail:
+                    raise StubUpstreamError('Simulated upstream failure')
+                yield StubResponse(chunk)
+
+        return iterate()
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        latency, fail = self._draw()
+        text = canned_response(prompt)
+        if not stream:
+            await asyncio.sleep(latency)
+            if fail:
+                raise StubUpstreamError('Simulated upstream failure')
+            return StubResponse(text)
+
+        if fail:
+            await asyncio.sleep(latency / 3)
+            raise StubUpstreamError('Simulated upstream failure')
+        chunks = self._chunks(text)
+        return _AsyncChunks(chunks, self._stream_delays(latency, len(chunks)))
+
+
+def stub_from_env():
+    """Build the stub model from AI_STUB_* environment variables"""
+    seed = os.getenv('AI_STUB_SEED')
+    return StubModel(
+        latency=os.getenv('AI_STUB_LATENCY', 'fixed:0'),
+        failure_rate=float(os.getenv('AI_STUB_FAILURE_RATE', 0)),
+        seed=int(seed) if seed is not None else None
+    )
@@ -0,0 +1,212 @@
+"""
+Helpers for /api/summarize-notes on large notes: the note is split on markdown
+headings and paragraphs, the chunks are summarized in parallel (map) and the
+partial summaries are merged into the usual four-section summary (reduce).
+Each model call then sees at most one chunk, so latency follows the chunk
+size instead of the size of the whole note.
+
+Incremental mode packs the note's own sections into chunks of up to
+AI_SUMMARY_CHUNK_CHARS whose boundaries depend on the sections' content, not
+their position: a pack ends after a section whose heading line hashes to a
+boundary (about one in AI_SUMMARY_SECTIONS_PER_CHUNK) or before the pack
+would overflow. Editing a section's body therefore changes only the pack it
+is in, and every other pack keeps its fingerprint. Partial summaries are kept in their
+own store keyed by that fingerprint alone (not the title, not the response
+cache), so only changed packs and the merge pass reach the model. A note is
+only summarized this way once a previous version has left partials in the
+store, or when it is long enough to be chunked anyway.
+"""
+import hashlib
+import os
+import re
+
+import metrics
+from cache import MemoryCache, ResponseCache, SQLiteCache
+
+# Notes longer than this many characters are summarized in chunks
+CHUNK_THRESHOLD = int(os.getenv('AI_SUMMARY_CHUNK_THRESHOLD', 24000))
+
+# Target size of one chunk, in characters
+CHUNK_CHARS = int(os.getenv('AI_SUMMARY_CHUNK_CHARS', 8000))
+
+# Chunk summaries for one request that may run at the same time
+MAX_PARALLEL_CHUNKS = int(os.getenv('AI_SUMMARY_MAX_PARALLEL', 4))
+
+# Average sections per incremental pack (packs are also capped at AI_SUMMARY_CHUNK_CHARS)
+SECTIONS_PER_CHUNK = int(os.getenv('AI_SUMMARY_SECTIONS_PER_CHUNK', 4))
+
+# Stored partial summaries of incremental packs
+PARTIALS_MAX_ENTRIES = int(os.getenv('AI_SUMMARY_PARTIALS_MAX_ENTRIES', 4096))
+PARTIALS_TTL = int(os.getenv('AI_SUMMARY_PARTIALS_TTL', 7 * 24 * 3600))
+
+# SQLite file shared by worker processes; unset keeps partials in process memory only
+PARTIALS_DB_PATH = os.getenv('AI_SUMMARY_PARTIALS_DB')
+
+KEY_PREFIX = 'summary-partial:'
+
+HEADING = re.compile(r'^#{1,6}\s')
+FENCE = re.compile(r'^\s*(```|~~~)')
+
+
+def needs_chunking(content, threshold=CHUNK_THRESHOLD):
+    return len(content) > threshold
+
+
+def split_sections(content):
+    """Split markdown into sections, each starting at a heading; headings inside code fences are ignored"""
+    sections = []
+    current = []
+    in_fence = False
+    for line in content.splitlines(keepends=True):
+        if FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and HEADING.match(line) and current:
+            sections.append(''.join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append(''.join(current))
+    return [section for section in sections if section.strip()]
+
+
+def _split_long(text, max_chars):
+    """Split text that exceeds max_chars on paragraphs, then lines, then hard at max_chars"""
+    if len(text) <= max_chars:
+        return [text]
+    for separator in ('\n\n', '\n'):
+        parts = [part for part in text.split(separator) if part]
+        parts = [part + separator for part in parts[:-1]] + parts[-1:]
+        # A separator only at the ends would hand back the same text; fall through instead
+        if len(parts) > 1 and all(len(part) < len(text) for part in parts):
+            pieces = []
+            for part in parts:
+                pieces.extend(_split_long(part, max_chars))
+            return pieces
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def _pack(pieces, max_chars):
+    """Join consecutive pieces into chunks of up to max_chars, keeping their order"""
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def split_note(content, max_chars=CHUNK_CHARS):
+    """
+    Split a note into chunks of about max_chars. Boundaries fall on headings
+    where possible, then on paragraphs; small neighbouring sections share a
+    chunk so short notes with many headings do not fan out into many calls.
+    """
+    pieces = []
+    for section in split_sections(content):
+        pieces.extend(_split_long(section, max_chars))
+    return [chunk.strip() for chunk in _pack(pieces, max_chars) if chunk.strip()]
+
+
+def _heading(section):
+    first = section.lstrip('\n').split('\n', 1)[0]
+    return first.lstrip('#').strip() if HEADING.match(first) else None
+
+
+def fingerprint(section):
+    """Stable id of a section's content; whitespace-only edits keep the fingerprint"""
+    normalized = ' '.join(section.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def incremental_sections(content, max_chars=CHUNK_CHARS):
+    """
+    The note's sections as [{"text", "heading", "fingerprint"}], in order.
+    Sections longer than max_chars are split on paragraphs; the parts keep
+    their section's heading.
+    """
+    sections = []
+    for section in split_sections(content):
+        heading = _heading(section)
+        for part in _split_long(section, max_chars):
+            if part.strip():
+                sections.append({'text': part.strip(), 'heading': heading, 'fingerprint': fingerprint(part)})
+    return sections
+
+
+def _boundary(section, sections_per_chunk):
+    """Whether a pack ends after `section`; decided by its first line, so editing its body never moves a boundary"""
+    first_line = section['text'].split('\n', 1)[0]
+    return int(fingerprint(first_line), 16) % max(1, sections_per_chunk) == 0
+
+
+def _pack_view(sections):
+    return {
+        'text': '\n\n'.join(section['text'] for section in sections),
+        'fingerprint': hashlib.sha256(
+            ' '.join(section['fingerprint'] for section in sections).encode('utf-8')
+        ).hexdigest()[:16],
+        'sections': sections,
+    }
+
+
+def incremental_packs(content, max_chars=CHUNK_CHARS, sections_per_chunk=SECTIONS_PER_CHUNK):
+    """
+    The note's sections packed into chunks as [{"text", "fingerprint", "sections"}].
+    A pack ends after a boundary section (chosen by its heading line) or before
+    it would exceed max_chars, so an edit only moves the boundaries around it.
+    """
+    packs = []
+    current, size = [], 0
+    for section in incremental_sections(content, max_chars):
+        if current and size + len(section['text']) > max_chars:
+            packs.append(_pack_view(current))
+            current, size = [], 0
+        current.append(section)
+        size += len(section['text']) + 2
+        if _boundary(section, sections_per_chunk):
+            packs.append(_pack_view(current))
+            current, size = [], 0
+    if current:
+        packs.append(_pack_view(current))
+    return packs
+
+
+def section_report(packs, reused):
+    """Per-section response metadata: which partial summaries were reused"""
+    return [
+        {'heading': section['heading'], 'fingerprint': section['fingerprint'], 'reused': was_reused}
+        for pack, was_reused in zip(packs, reused)
+        for section in pack['sections']
+    ]
+
+
+class PartialStore:
+    """Partial summaries by pack fingerprint, in a response-cache style LRU (plus optional SQLite tier)"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, pack_fingerprint):
+        try:
+            text = self.cache.get(KEY_PREFIX + pack_fingerprint)
+        except Exception as e:
+            print(f"Summary partial read failed: {str(e)}")
+            text = None
+        metrics.SUMMARY_PARTIAL_LOOKUPS.inc('hit' if text is not None else 'miss')
+        return text
+
+    def set(self, pack_fingerprint, partial):
+        self.cache.set(KEY_PREFIX + pack_fingerprint, partial)
+
+
+def store_from_env():
+    """Build the partial summary store from AI_SUMMARY_PARTIALS_* settings"""
+    memory = MemoryCache(max_entries=PARTIALS_MAX_ENTRIES, max_bytes=16 * 1024 * 1024, ttl=PARTIALS_TTL)
+    disk = None
+    if PARTIALS_DB_PATH:
+        disk = SQLiteCache(PARTIALS_DB_PATH, ttl=PARTIALS_TTL, max_rows=PARTIALS_MAX_ENTRIES * 10)
+    return PartialStore(ResponseCache(memory, disk))
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import admission
+
+PROXY = admission.parse_networks('127.0.0.1,10.0.0.0/8')
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def test_client_id_trusts_header_only_from_proxy():
+    assert admission.client_id('user-1', '127.0.0.1', PROXY) == 'user-1'
+    assert admission.client_id('user-1', '10.2.3.4', PROXY) == 'user-1'
+    assert admission.client_id('user-1', '203.0.113.9', PROXY) == '203.0.113.9'
+    assert admission.client_id('user-1', '127.0.0.1', ()) == '127.0.0.1'
+    assert admission.client_id(None, '127.0.0.1', PROXY) == '127.0.0.1'
+    assert admission.client_id('user-1', 'not-an-ip', PROXY) == 'not-an-ip'
+    assert admission.client_id(None, None, PROXY) == 'unknown'
+
+
+def test_evaluate_answers_is_interactive():
+    assert admission.endpoint_class('evaluate-answers') == admission.INTERACTIVE
+    assert admission.endpoint_class('generate-learning-path') == admission.BATCH
+
+
+def test_parse_endpoint_rates():
+    assert admission.parse_endpoint_rates('complete-session=1:5, generate-learning-path=0.5,bad') == {
+        'complete-session': (1.0, 5),
+        'generate-learning-path': (0.5, 1),
+    }
+
+
+def test_token_bucket_burst_then_wait():
+    bucket = admission.TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0
+
+
+def test_client_limit_is_per_client():
+    control = admission.Admission(admission.AdmissionQueue(), client_limiter=admission.RateLimiter(0.001, 1))
+    control.check_rates('a', 'explain-concept')
+    control.check_rates('b', 'explain-concept')
+    with pytest.raises(admission.Rejected) as rejected:
+        control.check_rates('a', 'explain-concept')
+    assert rejected.value.status == 429
+    assert rejected.value.reason == 'client_rate'
+
+
+def test_queue_grants_interactive_before_batch():
+    queue = admission.AdmissionQueue(capacity=1, max_waiting=8, timeout=5)
+    queue.acquire(admission.INTERACTIVE)
+    order = []
+
+    def wait(priority, name):
+        queue.acquire(priority)
+        order.append(name)
+        queue.release()
+
+    batch = threading.Thread(target=wait, args=(admission.BATCH, 'batch'))
+    batch.start()
+    wait_until(lambda: queue.waiting[admission.BATCH])
+    interactive = threading.Thread(target=wait, args=(admission.INTERACTIVE, 'interactive'))
+    interactive.start()
+    wait_until(lambda: queue.waiting[admission.INTERACTIVE])
+    queue.release()
+    batch.join(5)
+    interactive.join(5)
+    assert order == ['interactive', 'batch']
+    assert queue.active == 0
+
+
+def test_queue_sheds_batch_at_half_full_and_times_out():
+    queue = admission.AdmissionQueue(capacity=1, max_waiting=2, timeout=0.05)
+    queue.acquire(admission.INTERACTIVE)
+    with pytest.raises(admission.Rejected) as timed_out:
+        queue.acquire(admission.BATCH)
+    assert (timed_out.value.status, timed_out.value.reason) == (503, 'timeout')
+    assert queue.waiting == {admission.INTERACTIVE: 0, admission.BATCH: 0}
+
+    async def run():
+        waiter = asyncio.ensure_future(queue.acquire_async(admission.INTERACTIVE))
+        await asyncio.sleep(0.01)
+        with pytest.raises(admission.Rejected) as shed:
+            await queue.acquire_async(admission.BATCH)
+        assert shed.value.reason == 'queue_full'
+        with pytest.raises(admission.Rejected):
+            await waiter
+
+    asyncio.run(run())
+
+
+def test_loopback_proxy_is_trusted_by_default():
+    assert admission.client_id('user-1', '127.0.0.1') == 'user-1'
+    assert admission.client_id('user-1', '::1') == 'user-1'
+    assert admission.client_id('user-1', '203.0.113.9') == '203.0.113.9'
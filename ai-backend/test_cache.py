@@ -0,0 +1,63 @@
+import time
+
+from cache import MemoryCache, ResponseCache, SQLiteCache, make_cache_key, normalize_prompt
+
+
+def test_normalize_prompt_ignores_formatting():
+    assert normalize_prompt('  Explain\t\trecursion  \n\n\n\n  Briefly.  \n') == 'Explain recursion\n\nBriefly.'
+
+
+def test_formatting_only_differences_share_a_key():
+    key = make_cache_key('explain-concept', 'gemini', 'Explain recursion\n\nBriefly.')
+    assert make_cache_key('explain-concept', 'gemini', '  Explain  recursion \n\n\n Briefly.') == key
+
+
+def test_key_depends_on_endpoint_model_and_prompt():
+    key = make_cache_key('explain-concept', 'gemini', 'prompt')
+    assert make_cache_key('generate-quiz', 'gemini', 'prompt') != key
+    assert make_cache_key('explain-concept', 'gemini-lite', 'prompt') != key
+    assert make_cache_key('explain-concept', 'gemini', 'prompt 2') != key
+    # The separator keeps parts from running into each other
+    assert make_cache_key('a', 'bc', 'd') != make_cache_key('ab', 'c', 'd')
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    assert cache.get('a') == '1'
+    cache.set('c', '3')
+    assert cache.get('b') is None
+    assert cache.get('a') == '1'
+    assert len(cache) == 2
+
+
+def test_memory_cache_limits_bytes_and_expires():
+    cache = MemoryCache(max_entries=10, max_bytes=5)
+    cache.set('big', 'x' * 6)
+    assert cache.get('big') is None
+    cache.set('a', 'xxx')
+    cache.set('b', 'yyy')
+    assert cache.get('a') is None
+    assert cache.get('b') == 'yyy'
+    cache.set('short', 'z', ttl=-1)
+    assert cache.get('short') is None
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    disk = SQLiteCache(str(tmp_path / 'cache.db'), ttl=60)
+    disk.set('key', 'value')
+    memory = MemoryCache()
+    cache = ResponseCache(memory, disk)
+    assert cache.get('key') == 'value'
+    assert memory.get('key') == 'value'
+    cache.delete('key')
+    assert cache.get('key') is None
+
+
+def test_sqlite_cache_expires_entries(tmp_path):
+    disk = SQLiteCache(str(tmp_path / 'cache.db'), ttl=60)
+    disk.set('old', 'value', ttl=-1)
+    assert disk.get('old') is None
+    disk.set('new', 'value')
+    assert disk.get('new') == 'value'
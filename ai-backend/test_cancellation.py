@@ -0,0 +1,109 @@
+import contextvars
+import socket
+import threading
+import time
+
+import pytest
+
+import cancellation
+from singleflight import SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def watched(sock):
+    """Begin watching `sock` in a fresh context; returns (watch, context)"""
+    context = contextvars.copy_context()
+    return context.run(cancellation.begin, {'werkzeug.socket': sock}), context
+
+
+def watcher_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'disconnect-watcher']
+
+
+def test_one_watcher_thread_marks_closed_connections():
+    pairs = [socket.socketpair() for _ in range(5)]
+    watched_pairs = [watched(server) for server, _ in pairs]
+    watches = [watch for watch, _ in watched_pairs]
+    try:
+        wait_until(lambda: watcher_threads())
+        pairs[2][1].close()
+        wait_until(lambda: watches[2].disconnected)
+        assert [watch.disconnected for watch in watches] == [False, False, True, False, False]
+        assert len(watcher_threads()) == 1
+    finally:
+        for _, context in watched_pairs:
+            context.run(cancellation.finish)
+        for server, client in pairs:
+            server.close()
+            client.close()
+
+
+def test_data_from_the_client_does_not_count_as_a_disconnect():
+    server, client = socket.socketpair()
+    watch, context = watched(server)
+    client.sendall(b'GET / HTTP/1.1\r\n')
+    time.sleep(0.05)
+    assert not watch.disconnected
+    context.run(cancellation.finish)
+    server.close()
+    client.close()
+
+
+def test_waiting_on_a_shared_generation_stops_when_the_client_goes(monkeypatch):
+    monkeypatch.setattr(cancellation, 'POLL_INTERVAL', 0.01)
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=('key', lambda: release.wait(5)))
+    leader.start()
+    wait_until(lambda: 'key' in flights._calls)
+
+    server, client = socket.socketpair()
+    watch, context = watched(server)
+
+    def follow():
+        return flights.do('key', lambda: None, wait=lambda done: cancellation.wait('explain-concept', done))
+
+    client.close()
+    with pytest.raises(cancellation.ClientDisconnected):
+        context.run(follow)
+    assert watch.disconnected
+    release.set()
+    leader.join(5)
+    context.run(cancellation.finish)
+    server.close()
+
+
+def test_wait_without_a_watch_just_waits():
+    done = threading.Event()
+    threading.Timer(0.01, done.set).start()
+    contextvars.copy_context().run(cancellation.wait, 'explain-concept', done)
+    assert done.is_set()
+
+
+def half_open_client(monkeypatch):
+    from model_client import ModelClient
+    from resilience import CircuitBreaker, Resilience
+    from stub_model import StubModel
+
+    now = [100.0]
+    monkeypatch.setattr('resilience.time.monotonic', lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, reset_after=10, tracked=False)
+    breaker.record_failure()
+    now[0] += 10
+    return ModelClient(StubModel(), 'stub', resilience=Resilience(breaker=breaker, hedge_endpoints=()))
+
+
+def test_closed_stream_releases_the_half_open_probe(monkeypatch):
+    client = half_open_client(monkeypatch)
+    chunks, _ = client.stream('summarize-notes', 'Summarize these notes', use_cache=False)
+    next(chunks)
+    chunks.close()
+    text, _ = client.generate('explain-concept', 'Explain recursion', use_cache=False)
+    assert text
+    assert client.resilience.breaker.state == 'closed'
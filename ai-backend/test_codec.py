@@ -0,0 +1,112 @@
+import gzip
+import types
+
+import pytest
+from werkzeug.wrappers import Response
+
+import codec
+import hooks
+
+JSON = 'application/json'
+
+
+@pytest.fixture
+def with_br(monkeypatch):
+    monkeypatch.setattr(codec, 'ENCODINGS', ('br', 'gzip'))
+
+
+@pytest.mark.parametrize('header, encoding', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('br;q=0', None),
+    ('br;q=0, gzip', 'gzip'),
+    ('*', 'br'),
+    ('*;q=0.1, br;q=0', 'gzip'),
+    ('identity', None),
+    ('', None),
+    (None, None),
+    ('gzip;q=bad', None),
+])
+def test_negotiation(with_br, header, encoding):
+    assert codec.response_encoding(header, JSON, codec.MIN_SIZE) == encoding
+
+
+def test_small_or_binary_responses_are_not_compressed():
+    assert codec.response_encoding('gzip', JSON, codec.MIN_SIZE - 1) is None
+    assert codec.response_encoding('gzip', 'image/png', codec.MIN_SIZE) is None
+    assert codec.response_encoding('gzip', 'text/event-stream', codec.MIN_SIZE) == 'gzip'
+
+
+def test_gzip_output_is_deterministic_and_valid():
+    data = b'{"summary": "' + b'x' * 5000 + b'"}'
+    compressed = codec.compress(data, 'gzip')
+    assert compressed == codec.compress(data, 'gzip')
+    assert gzip.decompress(compressed) == data
+
+
+def test_br_round_trip():
+    brotli = pytest.importorskip('brotli')
+    data = b'y' * 5000
+    assert brotli.decompress(codec.compress(data, 'br')) == data
+
+
+def test_gunzip_limits():
+    assert codec.gunzip(gzip.compress(b'notes')) == b'notes'
+    with pytest.raises(codec.BodyTooLarge):
+        codec.gunzip(gzip.compress(b'z' * 1000), limit=100)
+    with pytest.raises(ValueError, match='truncated'):
+        codec.gunzip(gzip.compress(b'notes' * 100)[:20])
+    with pytest.raises(ValueError, match='Invalid gzip body'):
+        codec.gunzip(b'not gzip')
+
+
+@pytest.mark.parametrize('header, matches', [
+    (None, False),
+    ('*', True),
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('"other", W/"abc"', True),
+    ('"other"', False),
+])
+def test_etag_matching(header, matches):
+    assert codec.etag_matches(header, 'W/"abc"') is matches
+
+
+def request(method='GET', path='/api/jobs/1', **headers):
+    return types.SimpleNamespace(method=method, path=path, headers=headers)
+
+
+def encode(req, data, status=200):
+    response = Response(data, status=status, mimetype=JSON)
+    return response, hooks.encode(req, response, data)
+
+
+def test_get_result_gets_an_etag_and_304_when_it_matches():
+    data = b'{"job": 1}'
+    response, body = encode(request(), data)
+    assert body is None
+    assert response.headers['ETag'] == codec.etag(data)
+    response, body = encode(request(**{'If-None-Match': codec.etag(data)}), data)
+    assert response.status_code == 304
+    assert body == b''
+
+
+def test_post_and_error_results_are_not_conditional():
+    response, _ = encode(request('POST', '/api/explain-concept'), b'{}')
+    assert 'ETag' not in response.headers
+    response, _ = encode(request(), b'{}', status=404)
+    assert 'ETag' not in response.headers
+    response, _ = encode(request(path='/metrics'), b'{}')
+    assert 'ETag' not in response.headers
+
+
+def test_large_result_is_compressed_for_the_client():
+    data = b'{"content": "' + b'a' * 4000 + b'"}'
+    response, body = encode(request(**{'Accept-Encoding': 'gzip'}), data)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(body) == data
+    # The tag is of the uncompressed body, so it holds for every encoding
+    assert response.headers['ETag'] == codec.etag(data)
+    response, body = encode(request(), data)
+    assert body is None and 'Content-Encoding' not in response.headers
@@ -0,0 +1,85 @@
+import re
+
+import evaluation
+import handlers
+from test_handlers import drive
+
+
+def item(number):
+    return {'question': f'Question {number}?', 'answer': f'Answer {number}', 'expectedPoints': ['point']}
+
+
+def evaluations_for(step):
+    """A packed model response scoring every answer numbered in the step's prompt"""
+    ids = sorted({int(found) for found in re.findall(r'### Answer (\d+)', step.prompt)})
+    return {'evaluations': [{'id': i, 'score': 7, 'feedback': f'Feedback {i}'} for i in ids]}, 'MISS'
+
+
+def evaluate(data, answer=evaluations_for):
+    return drive(handlers.evaluate_answers(handlers.Call(data)), answer)
+
+
+def test_prepare_batches_numbers_answers_by_position():
+    results, batches = evaluation.prepare_batches([item(1), {'question': 'No answer?'}, item(3)], batch_size=1)
+    assert results == [None, {'error': 'Missing required fields: question and answer'}, None]
+    assert [[entry['id'] for entry in batch] for batch in batches] == [[1], [3]]
+
+
+def test_unpack_reports_answers_the_model_skipped():
+    batch = [{'id': 1}, {'id': 2}, {'id': 3}]
+    parsed = {'evaluations': [
+        {'id': '1', 'score': '8', 'feedback': 'Good', 'strengths': 'Clear'},
+        {'id': 'two', 'score': 5, 'feedback': 'Bad id'},
+        {'id': 3, 'score': 6},
+    ]}
+    unpacked = evaluation.unpack_evaluations(batch, parsed)
+    assert unpacked[1] == {'score': 8, 'strengths': ['Clear'], 'improvements': [], 'feedback': 'Good'}
+    assert 'error' in unpacked[2] and 'error' in unpacked[3]
+
+
+def test_answers_are_packed_and_returned_in_order():
+    answers = [item(n) for n in range(1, evaluation.BATCH_SIZE + 3)]
+    answers.insert(4, 'not an answer')
+    (body, status), steps = evaluate({'jobRole': 'Engineer', 'answers': answers})
+    assert status == 200
+    assert len(steps) == 2
+    evaluations = body['evaluations']
+    assert len(evaluations) == len(answers)
+    assert evaluations[4] == {'error': 'Missing required fields: question and answer'}
+    assert evaluations[0]['feedback'] == 'Feedback 1'
+    assert evaluations[-1]['feedback'] == f'Feedback {len(answers)}'
+
+
+def test_a_failed_batch_only_fails_its_answers():
+    answers = [item(n) for n in range(1, evaluation.BATCH_SIZE + 2)]
+    plan = handlers.evaluate_answers(handlers.Call({'answers': answers}))
+    step = next(plan)
+    assert isinstance(step, handlers.Parallel)
+    first, second = step.steps
+    results = [drive(first, evaluations_for)[0]]
+    next(second)
+    try:
+        second.throw(RuntimeError('model down'))
+    except StopIteration as done:
+        results.append(done.value)
+    try:
+        plan.send(results)
+    except StopIteration as done:
+        body, status = done.value
+    assert status == 200
+    assert all('score' in result for result in body['evaluations'][:evaluation.BATCH_SIZE])
+    assert body['evaluations'][-1] == {'error': 'An error occurred: model down'}
+
+
+def test_too_many_answers_are_rejected_before_any_model_call():
+    answers = [item(n) for n in range(evaluation.MAX_ANSWERS + 1)]
+    (body, status), steps = evaluate({'answers': answers}, None)
+    assert status == 400
+    assert body == {'error': f'Too many answers: at most {evaluation.MAX_ANSWERS} per request'}
+    assert steps == []
+
+
+def test_answers_must_be_a_list():
+    (body, status), steps = evaluate({'answers': 'one'}, None)
+    assert (body, status) == ({'error': 'Missing required field: answers'}, 400)
+    assert steps == []
@@ -0,0 +1,69 @@
+import handlers
+import jobs
+
+
+def drive(plan, answer):
+    """Run a handler generator, answering each Generate step with answer(step); Blocking steps are run"""
+    if not handlers.is_plan(plan):
+        return plan, []
+    steps = []
+    value = None
+    while True:
+        try:
+            step = plan.send(value)
+        except StopIteration as done:
+            return done.value, steps
+        if isinstance(step, handlers.Parallel):
+            value = [drive(part, answer)[0] if handlers.is_plan(part) else answer(part) for part in step.steps]
+            steps.extend(step.steps)
+        elif isinstance(step, handlers.Blocking):
+            value = step.run()
+        else:
+            value = answer(step)
+            steps.append(step)
+
+
+def test_validation_errors_need_no_model_call():
+    result, steps = drive(handlers.explain_concept(handlers.Call(None)), None)
+    assert result == ({'error': 'Missing required field: concept'}, 400)
+    assert steps == []
+
+
+def test_explain_concept_reports_the_cache_status():
+    call = handlers.Call({'concept': 'Recursion zeta'}, use_cache=False)
+    result, steps = drive(handlers.explain_concept(call), lambda step: ('An explanation', 'MISS'))
+    assert result == ({'success': True, 'explanation': 'An explanation', 'concept': 'Recursion zeta'}, 200)
+    assert [step.endpoint for step in steps] == ['explain-concept']
+    assert call.cache_status == 'MISS'
+
+
+def test_streaming_returns_a_stream():
+    call = handlers.Call({'title': 'Graphs', 'subject': 'CS'}, stream=True)
+    result, steps = drive(handlers.generate_session_notes(call), None)
+    assert isinstance(result, handlers.Stream)
+    assert result.endpoint == 'generate-session-notes'
+    assert result.metadata == {'title': 'Graphs', 'subject': 'CS'}
+
+
+def test_complete_session_keeps_a_part_that_succeeded():
+    call = handlers.Call({'title': 'Graphs', 'subject': 'CS', 'num_questions': 1})
+    plan = handlers.complete_session(call)
+    step = next(plan)
+    assert isinstance(step, handlers.Parallel) and step.return_exceptions
+    try:
+        plan.send([{'content': 'Notes'}, RuntimeError('model down')])
+    except StopIteration as done:
+        body, status = done.value
+    assert body['notes'] == {'content': 'Notes'}
+    assert body['assessment'] is None
+
+
+def test_store_reads_are_blocking_steps():
+    queue = jobs.JobQueue(lambda endpoint, payload, request_id: (200, {}))
+    plan = handlers.job_status(queue, 'missing')
+    step = next(plan)
+    assert isinstance(step, handlers.Blocking)
+    try:
+        plan.send(step.run())
+    except StopIteration as done:
+        assert done.value == ({'error': 'Job not found'}, 404)
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1:5000/callback',
+    'http://10.1.2.3/callback',
+    'http://192.168.0.10/callback',
+    'http://169.254.169.254/latest/meta-data',
+    'http://[::1]/callback',
+    'http://[::ffff:127.0.0.1]/callback',
+    'http://224.0.0.1/callback',
+    'http://0.0.0.0/callback',
+])
+def test_callback_to_non_public_address_is_refused(url):
+    assert jobs.callback_error(url, hosts=frozenset()) == 'callback_url must resolve to a public address'
+
+
+def test_callback_to_public_address_is_allowed():
+    assert jobs.callback_error('https://93.184.216.34/callback', hosts=frozenset()) is None
+
+
+def test_callback_host_resolving_to_private_address_is_refused(monkeypatch):
+    def resolve(host, port, type=0):
+        return [(None, None, None, '', ('10.0.0.7', port))]
+
+    monkeypatch.setattr(jobs.socket, 'getaddrinfo', resolve)
+    assert jobs.callback_error('http://hooks.example.com/x', hosts=frozenset()) == (
+        'callback_url must resolve to a public address'
+    )
+
+
+def test_callback_allowlist():
+    hosts = frozenset(('localhost',))
+    assert jobs.callback_error('http://localhost:5000/api/ai-callback', hosts=hosts) is None
+    assert jobs.callback_error('http://LOCALHOST/x', hosts=hosts) is None
+    assert jobs.callback_error('http://93.184.216.34/x', hosts=hosts) == 'callback_url host is not allowed'
+
+
+def test_callback_url_must_be_http():
+    assert jobs.callback_error('file:///etc/passwd') == 'callback_url must be an http(s) URL'
+    assert jobs.callback_error(42) == 'callback_url must be an http(s) URL'
+    assert jobs.callback_error('http://') == 'callback_url must name a host'
+
+
+def test_validate_submission_checks_callback():
+    data = {'endpoint': 'explain-concept', 'payload': {}, 'callback_url': 'http://169.254.169.254/'}
+    assert jobs.validate_submission(data) is not None
+    del data['callback_url']
+    assert jobs.validate_submission(data) is None
+
+
+def test_slow_callback_does_not_hold_the_worker(monkeypatch):
+    release = threading.Event()
+    sent = []
+
+    def send(job):
+        release.wait(5)
+        sent.append(job.id)
+
+    monkeypatch.setattr(jobs, 'send_callback', send)
+    queue = jobs.JobQueue(lambda endpoint, payload, request_id: (200, {'ok': True}), workers=1)
+    first = queue.submit('explain-concept', {}, callback_url='http://localhost/x')
+    second = queue.submit('explain-concept', {})
+    deadline = time.time() + 5
+    while second.status != jobs.SUCCEEDED and time.time() < deadline:
+        time.sleep(0.01)
+    assert first.status == jobs.SUCCEEDED
+    assert second.status == jobs.SUCCEEDED
+    assert sent == []
+    release.set()
+
+
+def test_job_accepted_by_another_process_is_found_through_the_store(tmp_path):
+    store = jobs.SQLiteCache(str(tmp_path / 'jobs.db'))
+    accepting = jobs.JobQueue(lambda endpoint, payload, request_id: (200, {'ok': True}), workers=1, store=store)
+    other = jobs.JobQueue(lambda endpoint, payload, request_id: (500, {}), store=jobs.SQLiteCache(store.path))
+    job = accepting.submit('explain-concept', {'concept': 'x'})
+    deadline = time.time() + 5
+    while other.get(job.id).status != jobs.SUCCEEDED and time.time() < deadline:
+        time.sleep(0.01)
+    found = other.get(job.id)
+    assert found.view(include_result=True) == job.view(include_result=True)
+    assert found.view(include_result=True)['result'] == {'ok': True}
+    assert other.get('missing') is None
@@ -0,0 +1,49 @@
+import pytest
+
+import json_extract
+
+QUIZ = '{"questions": [{"question": "2+2?", "options": ["3", "4"], "correct_answer": "B"}]}'
+
+
+def test_prefers_fenced_json_over_bracketed_prose():
+    text = f'Per section [1] of the notes:\n```json\n{QUIZ}\n```'
+    quiz = json_extract.parse_quiz(text)
+    assert quiz['questions'][0]['correct_answer'] == '4'
+
+
+def test_skips_candidates_the_validator_rejects():
+    text = f'See [1] and {{"note": "not it"}} then {QUIZ}'
+    assert json_extract.parse_quiz(text)['questions'][0]['options'] == ['3', '4']
+
+
+def test_reports_the_shape_error_when_nothing_validates():
+    with pytest.raises(json_extract.ModelOutputError, match='no valid questions'):
+        json_extract.parse_quiz('```json\n{"questions": [{"question": "x"}]}\n```')
+
+
+def test_no_json():
+    with pytest.raises(json_extract.ModelOutputError, match='No JSON object'):
+        json_extract.parse_model_json('Sorry, I cannot help with that.')
+
+
+def test_repairs_trailing_commas_smart_quotes_and_python_literals():
+    text = 'Here you go: {“ok”: True, "items": [1, 2,], "none": None,}'
+    assert json_extract.parse_model_json(text) == {'ok': True, 'items': [1, 2], 'none': None}
+
+
+def test_braces_inside_strings_do_not_end_the_value():
+    assert json_extract.parse_model_json('x {"a": "}]", "b": 1} y') == {'a': '}]', 'b': 1}
+
+
+@pytest.mark.parametrize('answer, expected', [
+    ('B', 'Paris'), ('b)', 'Paris'), ('Option B', 'Paris'), ('paris', 'Paris'), ('B) Paris', 'Paris'),
+])
+def test_match_option(answer, expected):
+    assert json_extract.match_option(answer, ['London', 'Paris', 'Rome']) == expected
+
+
+def test_evaluation_scores_are_clamped_and_coerced():
+    evaluation = json_extract.parse_evaluation('{"score": "12/10", "feedback": "Good", "strengths": "clear"}')
+    assert evaluation['score'] == 10
+    assert evaluation['strengths'] == ['clear']
+    assert evaluation['improvements'] == []
@@ -0,0 +1,112 @@
+import pytest
+
+import handlers
+import learning_paths
+from test_handlers import drive
+
+
+def module(title, kind='fundamentals', effort=1, core=True):
+    return {'title': title, 'kind': kind, 'effort_weeks': effort, 'core': core,
+            'summary': '', 'objectives': [], 'resources': []}
+
+
+LIBRARY = [
+    module('Basics', effort=2),
+    module('Data', effort=2),
+    module('Checkpoint', kind='milestone'),
+    module('Build an app', kind='project', effort=2),
+    module('Extras', effort=2, core=False),
+]
+
+
+@pytest.mark.parametrize('duration, weeks', [
+    ('6 weeks', 6),
+    ('2 months', 9),
+    ('10 days', 1),
+    (8, 8),
+    ('two weeks', 2),
+    ('1.5 months', 6),
+    ('3 mos', 13),
+    ('6 to 8 weeks', 8),
+    ('12 hours', 1),
+    ('45 minutes', 1),
+    ('5 years', learning_paths.MAX_WEEKS),
+    ('', learning_paths.DEFAULT_WEEKS),
+])
+def test_parse_weeks(duration, weeks):
+    assert learning_paths.parse_weeks(duration) == weeks
+
+
+@pytest.mark.parametrize('duration', ['3m', '2 semesters', 'a few weeks'])
+def test_parse_weeks_rejects_unknown_units(duration):
+    with pytest.raises(ValueError):
+        learning_paths.parse_weeks(duration)
+
+
+def test_schedule_spreads_spare_weeks_over_the_modules():
+    plan = learning_paths.schedule(LIBRARY, 20)
+    assert plan['capstone'] == (19, 20)
+    assert plan['blocks'][-1]['end'] == 18
+    assert [block['end'] - block['start'] + 1 for block in plan['blocks']] == [5, 5, 4, 4]
+
+
+def test_schedule_fills_the_weeks_exactly():
+    for weeks in range(1, 30):
+        plan = learning_paths.schedule(LIBRARY, weeks)
+        last = plan['capstone'][1] if plan['capstone'] else plan['blocks'][-1]['end']
+        assert last == weeks
+
+
+def test_short_schedule_moves_optional_modules_to_next_steps():
+    plan = learning_paths.schedule(LIBRARY, 3)
+    assert [item['title'] for item in plan['next_steps']] == ['Extras']
+    assert plan['capstone'] is None
+
+
+def answer(step):
+    if step.endpoint == 'generate-learning-path-modules':
+        return {'modules': LIBRARY}, 'HIT'
+    return '## How This Path Fits Your Goal\n\nFocus on the project.', 'MISS'
+
+
+def test_composed_path_streams_the_plan_before_the_personalization():
+    call = handlers.Call({'topic': 'Python', 'duration': '8 weeks', 'goal': 'Get a job'}, stream=True)
+    stream, _ = drive(handlers.generate_learning_path(call), answer)
+    assert isinstance(stream, handlers.Stream)
+    (items, _), _ = drive(iter_chunks(stream.chunks), answer)
+    steps = [item.endpoint for item in items if not isinstance(item, str)]
+    first_personalized = next(i for i, item in enumerate(items) if isinstance(item, str) and 'Fits Your Goal' in item)
+    assert steps == ['generate-learning-path-modules', 'generate-learning-path-personalize']
+    assert any(isinstance(item, str) and 'Build an app' in item for item in items[:first_personalized])
+    assert stream.metadata['composition']['personalized'] is True
+
+
+def iter_chunks(plan):
+    """Record a Stream plan's text chunks and steps in the order it yields them"""
+    items = []
+    value = None
+    while True:
+        try:
+            item = plan.send(value)
+        except StopIteration:
+            return items, None
+        items.append(item)
+        value = None if isinstance(item, str) else (yield item)
+
+
+def test_streamed_and_json_paths_match():
+    data = {'topic': 'Python', 'duration': '8 weeks', 'goal': 'Get a job'}
+    (body, status), _ = drive(handlers.generate_learning_path(handlers.Call(dict(data))), answer)
+    stream, _ = drive(handlers.generate_learning_path(handlers.Call(dict(data), stream=True)), answer)
+    (items, _), _ = drive(iter_chunks(stream.chunks), answer)
+    assert status == 200
+    assert body['content'] == ''.join(item for item in items if isinstance(item, str))
+    assert body['composition'] == stream.metadata['composition']
+
+
+def test_unknown_duration_falls_back_to_a_full_generation():
+    call = handlers.Call({'topic': 'Python', 'duration': '3m'})
+    (body, status), steps = drive(handlers.generate_learning_path(call), lambda step: ('# Full path', 'MISS'))
+    assert status == 200
+    assert [step.endpoint for step in steps] == ['generate-learning-path']
+    assert body['content'] == '# Full path'
@@ -0,0 +1,44 @@
+import threading
+
+import metrics
+
+
+def run_threads(count, fn):
+    for _ in range(count):
+        thread = threading.Thread(target=fn)
+        thread.start()
+        thread.join()
+
+
+def test_counter_sums_across_threads():
+    counter = metrics.Counter('test_counter_total', 'Test counter', ('kind',))
+    run_threads(20, lambda: counter.inc('a'))
+    counter.inc('a', amount=2)
+    counter.inc('b')
+    assert counter._totals() == {('a',): 22, ('b',): 1}
+
+
+def test_short_lived_threads_do_not_accumulate_shards():
+    counter = metrics.Counter('test_threads_total', 'Test counter', ('kind',))
+    histogram = metrics.Histogram('test_threads_seconds', 'Test histogram', ('kind',), buckets=(1, 2))
+
+    def record():
+        counter.inc('x')
+        histogram.observe(1.5, 'x')
+
+    run_threads(200, record)
+    assert len(counter._shards) <= 2
+    assert len(histogram._shards) <= 2
+    assert counter._totals() == {('x',): 200}
+    rendered = histogram.render()
+    assert 'test_threads_seconds_bucket{kind="x",le="1"} 0' in rendered
+    assert 'test_threads_seconds_bucket{kind="x",le="2"} 200' in rendered
+    assert 'test_threads_seconds_count{kind="x"} 200' in rendered
+
+
+def test_render_format():
+    gauge = metrics.Gauge('test_gauge', 'Test gauge', ('route',))
+    with gauge.track('/api/x'):
+        assert 'test_gauge{route="/api/x"} 1' in gauge.render()
+    assert 'test_gauge{route="/api/x"} 0' in gauge.render()
+    assert gauge.render().startswith('# HELP test_gauge Test gauge\n# TYPE test_gauge gauge')
@@ -0,0 +1,107 @@
+import pytest
+
+import model_pool
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+def pool(config=None):
+    return model_pool.parse_pool(config or {
+        'tiers': {
+            'quality': {'backend': 'stub', 'copies': 2, 'max_in_flight': 1},
+            'fast': {'backend': 'stub'},
+        },
+        'routes': {'default': ['quality', 'fast'], 'explain-concept': 'fast'},
+    })
+
+
+def test_parse_pool_builds_tiers_and_routes():
+    parsed = pool()
+    assert [member.name for member in parsed.members()] == ['quality/1', 'quality/2', 'fast/1']
+    assert parsed.route('explain-concept') == ['fast']
+    assert parsed.route('generate-quiz-repair') == ['quality', 'fast']
+    assert parsed.name.startswith('pool-')
+    assert parsed.name == pool().name
+
+
+@pytest.mark.parametrize('config, message', [
+    ({}, 'non-empty "tiers"'),
+    ({'tiers': {'a': {'backend': 'stub'}}, 'routes': {'default': ['b']}}, 'known tiers'),
+    ({'tiers': {'a': {'backend': 'other'}}}, 'unknown backend'),
+    ({'tiers': {'a': {}}}, 'needs a "model"'),
+    ({'tiers': {'a': {'backend': 'stub', 'rpm': 0}}}, 'positive number'),
+])
+def test_parse_pool_rejects_bad_config(config, message):
+    with pytest.raises(ValueError, match=message):
+        model_pool.parse_pool(config)
+
+
+def test_saturated_tier_fails_over():
+    parsed = pool()
+    leases = [parsed.lease('generate-quiz') for _ in range(3)]
+    assert [lease.member.name for lease in leases] == ['quality/1', 'quality/2', 'fast/1']
+    for lease in leases:
+        parsed.release(lease.member, None)
+
+
+def test_a_failing_member_opens_only_its_own_breaker():
+    parsed = pool()
+    failing = parsed.tiers['quality'][0]
+    for _ in range(model_pool.FAILURE_THRESHOLD):
+        failing.in_flight += 1
+        parsed.release(failing, ServiceUnavailable('down'))
+    assert failing.breaker.state == failing.breaker.OPEN
+    assert parsed.tiers['quality'][1].breaker.state == failing.breaker.CLOSED
+    with parsed.lease('generate-quiz') as lease:
+        assert lease.member is parsed.tiers['quality'][1]
+
+
+def test_open_breaker_lets_one_probe_through(monkeypatch):
+    parsed = pool({'tiers': {'only': {'backend': 'stub'}}})
+    member = parsed.members()[0]
+    for _ in range(model_pool.FAILURE_THRESHOLD):
+        with pytest.raises(ServiceUnavailable):
+            with parsed.lease('generate-quiz'):
+                raise ServiceUnavailable('down')
+    with pytest.raises(model_pool.PoolExhausted):
+        parsed.lease('generate-quiz')
+    monkeypatch.setattr(member.breaker, 'reset_after', 0)
+    probe = parsed.lease('generate-quiz')
+    with pytest.raises(model_pool.PoolExhausted):
+        parsed.lease('generate-quiz')
+    parsed.release(member, None)
+    assert member.breaker.state == member.breaker.CLOSED
+    assert probe.member is member
+
+
+def test_quota_errors_rest_the_key_without_tripping_its_breaker():
+    parsed = pool({'tiers': {'only': {'backend': 'stub'}}})
+
+    class ResourceExhausted(Exception):
+        pass
+
+    with pytest.raises(ResourceExhausted):
+        with parsed.lease('generate-quiz'):
+            raise ResourceExhausted('quota')
+    member = parsed.members()[0]
+    assert member.breaker.state == member.breaker.CLOSED
+    assert member.status(0)['resting_seconds'] > 0
+
+
+def test_single_key_pool_uses_the_public_sdk_configuration(monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', 'test-key')
+    parsed = pool({'tiers': {'a': {'model': 'gemini-2.5-flash'}, 'b': {'model': 'gemini-2.5-flash-lite'}}})
+    model = parsed.members()[0].model()
+    assert not isinstance(model, model_pool._KeyedModel)
+
+
+def test_keyed_members_need_a_supported_sdk(monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', 'key-1')
+    monkeypatch.setenv('GEMINI_API_KEY_2', 'key-2')
+    parsed = pool({'tiers': {'a': {'model': 'gemini-2.5-flash', 'keys': ['GEMINI_API_KEY', 'GEMINI_API_KEY_2']}}})
+    assert isinstance(parsed.members()[0].model(), model_pool._KeyedModel)
+    monkeypatch.setattr(model_pool, 'KEYED_SDK_VERSIONS', ('0.0.1',))
+    with pytest.raises(ValueError, match='several API keys'):
+        parsed.members()[1].model()
@@ -0,0 +1,73 @@
+import pytest
+
+import prompt_budget
+
+
+def test_parse_budgets():
+    assert prompt_budget.parse_budgets('generate-quiz=100, summarize-notes = 200,bad') == {
+        'generate-quiz': 100,
+        'summarize-notes': 200,
+    }
+    assert prompt_budget.parse_budgets(None) == {}
+
+
+def test_estimate_tokens_counts_non_ascii_characters_one_each():
+    assert prompt_budget.estimate_tokens('abcdefgh') == 2
+    assert prompt_budget.estimate_tokens('abcde') == 2
+    assert prompt_budget.estimate_tokens('日本語') == 3
+
+
+def test_collapse_whitespace_keeps_indentation():
+    text = 'a   b  \n\n\n\n    indented    code\n'
+    assert prompt_budget.collapse_whitespace(text) == 'a b\n\n    indented code'
+
+
+def test_drop_duplicate_lines_ignores_case_and_spacing_but_not_short_lines():
+    text = 'Page header line\nbody one\n}\npage   HEADER line\nbody two\n}'
+    assert prompt_budget.drop_duplicate_lines(text) == 'Page header line\nbody one\n}\nbody two\n}'
+
+
+def test_split_blocks_keeps_code_fences_whole():
+    text = 'intro\n\n```\nline 1\n\nline 2\n```\n\noutro'
+    assert prompt_budget.split_blocks(text) == ['intro', '```\nline 1\n\nline 2\n```', 'outro']
+
+
+def test_select_blocks_keeps_the_opening_and_marks_omissions():
+    filler = 'the the the the the the the the the the the the the the the the'
+    blocks = ['Title of the note', filler, 'Dijkstra relaxes edges using a priority queue', filler]
+    text = prompt_budget.select_blocks('\n\n'.join(blocks), max_tokens=30)
+    assert text == 'Title of the note\n\n[...]\n\nDijkstra relaxes edges using a priority queue\n\n[...]'
+
+
+def test_truncate_cuts_at_a_word_boundary():
+    text = prompt_budget.truncate('word ' * 100, max_tokens=10)
+    assert prompt_budget.estimate_tokens(text) <= 10
+    assert text.endswith('word')
+
+
+@pytest.mark.parametrize('max_tokens, steps', [
+    (16, []),
+    (15, ['whitespace']),
+    (10, ['whitespace', 'duplicates']),
+    (8, ['whitespace', 'duplicates', 'sections']),
+    (1, ['whitespace', 'duplicates', 'sections', 'truncate']),
+])
+def test_compact_applies_only_the_steps_needed(max_tokens, steps):
+    text = 'Repeated header line\n\n\n\nsome    body text\n\nRepeated header line\n'
+    compacted, applied = prompt_budget.compact(text, max_tokens)
+    assert applied == steps
+    assert prompt_budget.estimate_tokens(compacted) <= max_tokens
+
+
+def test_fit_compacts_the_input_to_the_endpoint_budget(monkeypatch):
+    monkeypatch.setitem(prompt_budget.BUDGETS, 'generate-quiz', 60)
+    text = '\n\n'.join(f'Paragraph {i} about topic {i} with details {i * 7}.' for i in range(40))
+    prompt, used, report = prompt_budget.fit('generate-quiz', text, lambda body: f'Write a quiz:\n{body}')
+    assert report['compacted'] is True
+    assert report['prompt_tokens'] <= 60 < report['original_tokens']
+    assert prompt == f'Write a quiz:\n{used}'
+
+
+def test_fit_leaves_prompts_within_budget_alone():
+    prompt, used, report = prompt_budget.fit('generate-quiz', 'short', lambda body: body)
+    assert (prompt, used, report['compacted']) == ('short', 'short', False)
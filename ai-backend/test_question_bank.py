@@ -0,0 +1,64 @@
+import pytest
+
+import handlers
+import question_bank
+from test_handlers import drive
+
+
+def mcq(text):
+    return {'id': 1, 'question': text, 'options': ['a', 'b', 'c', 'd'], 'correct_answer': 'a', 'explanation': 'e'}
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    store = question_bank.QuestionBank(str(tmp_path / 'bank.db'))
+    monkeypatch.setattr(handlers, 'question_store', store)
+    return store
+
+
+def quiz(num_questions, answer):
+    call = handlers.Call({'content': 'Graphs and trees', 'num_questions': num_questions})
+    return drive(handlers.generate_quiz(call), answer)
+
+
+def test_shortfall_prompt_does_not_depend_on_the_sample(bank):
+    topic = question_bank.quiz_topic('Graphs and trees')
+    bank.add(topic, [mcq(f'Banked {i}?') for i in range(4)])
+    prompts = set()
+    for _ in range(5):
+        (body, status), steps = quiz(6, lambda step: ({'questions': [mcq('New A?'), mcq('New B?')]}, 'MISS'))
+        assert status == 200
+        prompts.update(step.prompt for step in steps)
+        bank._connection().execute("DELETE FROM questions WHERE question LIKE '%New%'")
+    assert len(prompts) == 1
+
+
+def test_repeated_questions_are_topped_up(bank):
+    topic = question_bank.quiz_topic('Graphs and trees')
+    bank.add(topic, [mcq('Banked 0?'), mcq('Banked 1?')])
+    replies = [
+        {'questions': [mcq('Banked 0?'), mcq('New 1?'), mcq('new 1?')]},
+        {'questions': [mcq('New 2?'), mcq('New 3?')]},
+    ]
+    (body, status), steps = quiz(5, lambda step: (replies.pop(0), 'MISS'))
+    assert status == 200
+    questions = body['quiz']['questions']
+    assert len(questions) == 5
+    assert len({question_bank.question_hash(q) for q in questions}) == 5
+    assert [q['id'] for q in questions] == [1, 2, 3, 4, 5]
+    assert len(steps) == 2
+
+
+def test_full_bank_needs_no_generation(bank):
+    topic = question_bank.quiz_topic('Graphs and trees')
+    bank.add(topic, [mcq(f'Banked {i}?') for i in range(10)])
+    (body, status), steps = quiz(5, None)
+    assert status == 200
+    assert steps == []
+    assert body['banked_questions'] == 5
+
+
+def test_avoid_list_is_ordered_and_capped():
+    questions = [mcq(f'Question {i}?') for i in range(question_bank.MAX_AVOID + 10)]
+    assert question_bank.avoid_list(questions) == question_bank.avoid_list(list(reversed(questions)))
+    assert len(question_bank.avoid_list(questions)) == question_bank.MAX_AVOID
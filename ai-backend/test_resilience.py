@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import resilience
+
+
+class StubUpstreamError(Exception):
+    pass
+
+
+def hedging(delay=0.01):
+    policy = resilience.Resilience(timeout=5, max_retries=0, hedge_endpoints=('explain-concept',))
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        policy.latency.observe('explain-concept', delay)
+    return policy
+
+
+def test_hedged_async_prefers_success_when_both_finish_together():
+    policy = hedging()
+
+    async def run():
+        gate = asyncio.Event()
+        calls = []
+
+        async def attempt(timeout):
+            calls.append(timeout)
+            if len(calls) == 2:
+                asyncio.get_running_loop().call_later(0.02, gate.set)
+            await gate.wait()
+            if timeout == policy.timeout:
+                raise StubUpstreamError('primary failed')
+            return 'hedge answer'
+
+        return await policy.call_async('explain-concept', attempt), calls
+
+    text, calls = asyncio.run(run())
+    assert text == 'hedge answer'
+    assert len(calls) == 2
+
+
+def test_hedged_sync_prefers_success_when_both_finish_together():
+    policy = hedging()
+    gate = threading.Event()
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 2:
+            threading.Timer(0.02, gate.set).start()
+        gate.wait()
+        if timeout == policy.timeout:
+            raise StubUpstreamError('primary failed')
+        return 'hedge answer'
+
+    assert policy.call('explain-concept', attempt) == 'hedge answer'
+    assert len(calls) == 2
+
+
+def test_hedged_async_raises_when_every_call_fails():
+    policy = hedging()
+
+    async def attempt(timeout):
+        await asyncio.sleep(0.03)
+        raise StubUpstreamError('down')
+
+    with pytest.raises(StubUpstreamError):
+        asyncio.run(policy.call_async('explain-concept', attempt))
+
+
+def test_retry_budget_caps_retries():
+    budget = resilience.RetryBudget(ratio=0.5, reserve=2)
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+    budget.deposit()
+    assert budget.withdraw() is False
+    budget.deposit()
+    assert budget.withdraw() is True
+    for _ in range(10):
+        budget.deposit()
+    assert budget.tokens == 2
+
+
+def test_breaker_opens_then_lets_one_probe_through(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    breaker = resilience.CircuitBreaker(threshold=2, reset_after=10, tracked=False)
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is True
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.allow()
+    assert breaker.available() is False
+
+    now[0] += 10
+    assert breaker.available() is True
+    breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.allow()
+    breaker.abandon()
+    breaker.allow()
+    assert breaker.record_failure() is True
+    assert breaker.state == breaker.OPEN
+
+    now[0] += 10
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    breaker.allow()
+
+
+def no_backoff(policy):
+    policy._backoff = lambda attempt: 0
+    return policy
+
+
+def test_call_retries_transient_errors_within_the_budget():
+    policy = no_backoff(resilience.Resilience(timeout=5, max_retries=3, hedge_endpoints=(),
+                                              budget=resilience.RetryBudget(ratio=0, reserve=1)))
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        raise StubUpstreamError('down')
+
+    with pytest.raises(StubUpstreamError):
+        policy.call('explain-concept', attempt)
+    # One retry from the reserve, then the budget is spent
+    assert len(calls) == 2
+
+
+def test_call_does_not_retry_permanent_errors():
+    policy = no_backoff(resilience.Resilience(timeout=5, max_retries=3, hedge_endpoints=()))
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        raise ValueError('prompt rejected')
+
+    with pytest.raises(ValueError):
+        policy.call('explain-concept', attempt)
+    assert len(calls) == 1
+    assert policy.breaker.failures == 0
+
+
+def test_call_recovers_after_a_transient_error():
+    policy = no_backoff(resilience.Resilience(timeout=5, max_retries=2, hedge_endpoints=()))
+    outcomes = [StubUpstreamError('down'), 'answer']
+
+    def attempt(timeout):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert policy.call('explain-concept', attempt) == 'answer'
+    assert policy.breaker.state == policy.breaker.CLOSED
+
+
+def half_open_policy(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    policy = resilience.Resilience(timeout=5, max_retries=0, hedge_endpoints=(),
+                                   breaker=resilience.CircuitBreaker(threshold=1, reset_after=10, tracked=False))
+    policy.breaker.record_failure()
+    now[0] += 10
+    return policy
+
+
+def test_cancelled_async_probe_releases_the_breaker(monkeypatch):
+    policy = half_open_policy(monkeypatch)
+
+    async def attempt(timeout):
+        raise asyncio.CancelledError()
+
+    async def answer(timeout):
+        return 'answer'
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(policy.call_async('explain-concept', attempt))
+    assert asyncio.run(policy.call_async('explain-concept', answer)) == 'answer'
+    assert policy.breaker.state == policy.breaker.CLOSED
+
+
+def test_interrupted_sync_probe_releases_the_breaker(monkeypatch):
+    policy = half_open_policy(monkeypatch)
+
+    def attempt(timeout):
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        policy.call('explain-concept', attempt)
+    assert policy.call('explain-concept', lambda timeout: 'answer') == 'answer'
+
+
+def test_sync_hedge_runs_the_first_call_on_the_calling_thread():
+    policy = hedging()
+    threads = []
+
+    def attempt(timeout):
+        threads.append(threading.current_thread())
+        if len(threads) == 1:
+            time.sleep(0.05)
+        return 'answer'
+
+    assert policy.call('explain-concept', attempt) == 'answer'
+    assert threads[0] is threading.current_thread()
+    assert threads[1:] and threads[1] is not threading.current_thread()
+
+
+def test_sync_hedge_is_not_started_when_the_first_call_answers():
+    policy = hedging(delay=1)
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        return 'answer'
+
+    assert policy.call('explain-concept', attempt) == 'answer'
+    time.sleep(0.05)
+    assert len(calls) == 1
+
+
+def test_sync_hedge_keeps_the_request_context():
+    policy = hedging()
+    resilience.set_deadline('60000')
+    seen = []
+
+    def attempt(timeout):
+        seen.append(resilience.remaining_time())
+        if len(seen) == 1:
+            time.sleep(0.05)
+            raise StubUpstreamError('primary failed')
+        return 'hedge answer'
+
+    try:
+        assert policy.call('explain-concept', attempt) == 'hedge answer'
+    finally:
+        resilience.clear_deadline()
+    assert all(remaining is not None for remaining in seen)
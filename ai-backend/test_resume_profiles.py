@@ -0,0 +1,115 @@
+import pytest
+
+import handlers
+import resume_profiles
+from cache import MemoryCache, ResponseCache, SQLiteCache
+from test_handlers import drive
+
+RESUME = 'Jane Doe\nBackend engineer, 6 years of Python and PostgreSQL at Acme.'
+
+PROFILE = {
+    'headline': 'Backend engineer',
+    'years_experience': 6,
+    'skills': ['Python', 'PostgreSQL'],
+    'roles': [{'title': 'Backend engineer', 'organization': 'Acme', 'years': 6, 'highlights': ['Scaled the API']}],
+    'projects': [],
+    'education': ['BSc Computer Science'],
+}
+
+QUESTIONS = {'questions': [{'id': 1, 'question': 'Why Python?'}]}
+
+
+def store(path=None):
+    disk = SQLiteCache(path, ttl=60) if path else None
+    return resume_profiles.ProfileStore(ResponseCache(MemoryCache(ttl=60), disk))
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    profiles = store()
+    monkeypatch.setattr(handlers, 'profile_store', profiles)
+    return profiles
+
+
+def answer(step):
+    if step.endpoint == 'extract-resume-profile':
+        return dict(PROFILE), 'MISS'
+    return dict(QUESTIONS), 'MISS'
+
+
+def interview(resume=RESUME):
+    call = handlers.Call({'resume': resume, 'jobRole': 'Backend engineer'})
+    return drive(handlers.generate_interview_questions(call), answer)
+
+
+def test_fingerprint_ignores_whitespace_and_case():
+    reformatted = '  jane DOE   backend engineer, 6 years\tof python and postgresql at acme. '
+    assert resume_profiles.fingerprint(RESUME) == resume_profiles.fingerprint(reformatted)
+    assert resume_profiles.fingerprint(RESUME) != resume_profiles.fingerprint(RESUME + ' Go')
+
+
+def test_render_is_compact_text():
+    text = resume_profiles.render(PROFILE)
+    assert text.splitlines() == [
+        'Headline: Backend engineer',
+        'Experience: about 6 years',
+        'Skills: Python, PostgreSQL',
+        'Roles:',
+        '- Backend engineer, Acme (6 years): Scaled the API',
+        'Education: BSc Computer Science',
+    ]
+
+
+def test_profiles_are_shared_through_the_db(tmp_path):
+    path = str(tmp_path / 'profiles.db')
+    store(path).set('abc', PROFILE)
+    assert store(path).get('abc') == PROFILE
+    assert store(path).get('missing') is None
+
+
+def test_first_interview_extracts_the_profile_then_reuses_it(profiles):
+    (body, status), steps = interview()
+    assert status == 200
+    assert [step.endpoint for step in steps] == ['extract-resume-profile', 'generate-interview-questions']
+    assert 'Candidate Profile' in steps[1].prompt
+    assert RESUME not in steps[1].prompt
+    report = body['resume_profile']
+    assert report['id'] == resume_profiles.fingerprint(RESUME)
+    assert report['cached'] is False and report['used_for_questions'] is True
+
+    (body, status), again = interview(RESUME.upper())
+    assert [step.endpoint for step in again] == ['generate-interview-questions']
+    assert again[0].prompt == steps[1].prompt
+    assert body['resume_profile']['cached'] is True
+
+
+def test_failed_extraction_falls_back_to_the_resume(profiles):
+    plan = handlers.generate_interview_questions(handlers.Call({'resume': RESUME, 'jobRole': 'Backend engineer'}))
+    step = next(plan)
+    step = plan.send(step.run())
+    assert step.endpoint == 'extract-resume-profile'
+    step = plan.throw(RuntimeError('model down'))
+    assert step.endpoint == 'generate-interview-questions'
+    assert RESUME in step.prompt
+    try:
+        plan.send((dict(QUESTIONS), 'MISS'))
+    except StopIteration as done:
+        body, status = done.value
+    assert status == 200
+    assert body['resume_profile']['used_for_questions'] is False
+    assert profiles.get(resume_profiles.fingerprint(RESUME)) is None
+
+
+def test_evaluation_uses_the_named_profile(profiles):
+    profiles.set('abc', PROFILE)
+    data = {'question': 'Why Python?', 'answer': 'Speed of development', 'resumeProfileId': 'abc'}
+    evaluation = {'score': 8, 'feedback': 'Good'}
+    (body, status), steps = drive(handlers.evaluate_answer(handlers.Call(data)), lambda step: (dict(evaluation), 'MISS'))
+    assert status == 200
+    assert body['resume_profile_used'] is True
+    assert 'Backend engineer, Acme' in steps[0].prompt
+
+    data['resumeProfileId'] = 'unknown'
+    (body, _), steps = drive(handlers.evaluate_answer(handlers.Call(data)), lambda step: (dict(evaluation), 'MISS'))
+    assert body['resume_profile_used'] is False
+    assert 'Acme' not in steps[0].prompt
@@ -0,0 +1,88 @@
+import pytest
+
+import handlers
+import json_extract
+import sessions
+from test_handlers import drive
+
+
+def mcq(number):
+    return {'id': number, 'question': f'Question {number}?', 'options': ['a', 'b', 'c', 'd'],
+            'correct_answer': 'a', 'explanation': 'e'}
+
+
+@pytest.fixture(autouse=True)
+def no_bank(monkeypatch):
+    monkeypatch.setattr(handlers, 'question_store', None)
+
+
+def answer(step):
+    if step.endpoint == 'generate-session-notes':
+        return '# Graphs', 'MISS'
+    return {'assessment': {'questions': [mcq(1), mcq(2)]}}, 'MISS'
+
+
+def complete(data, replies):
+    """Run complete_session, answering its one Parallel step with `replies` (a result or exception per part)"""
+    plan = handlers.complete_session(handlers.Call(data))
+    step = next(plan)
+    assert isinstance(step, handlers.Parallel) and step.return_exceptions
+    try:
+        plan.send(replies)
+    except StopIteration as done:
+        return done.value
+
+
+def test_notes_and_assessment_are_generated_together():
+    data = {'title': 'Graphs', 'subject': 'CS', 'description': 'BFS', 'num_questions': 2}
+    endpoints = []
+
+    def record(step):
+        endpoints.append(step.endpoint)
+        return answer(step)
+
+    (body, status), steps = drive(handlers.complete_session(handlers.Call(data)), record)
+    assert status == 200
+    assert len(steps) == 2
+    assert sorted(endpoints) == ['generate-session-assessment', 'generate-session-notes']
+    assert body['success'] is True
+    assert body['notes'] == {'content': '# Graphs'}
+    assert body['assessment']['questions'] == [mcq(1), mcq(2)]
+    assert body['assessment']['title'] == 'Graphs'
+    assert 'errors' not in body
+
+
+def test_missing_fields_need_no_model_call():
+    (body, status), steps = drive(handlers.complete_session(handlers.Call({'title': 'Graphs'})), None)
+    assert status == 400
+    assert body == {'error': 'Missing required fields: title and subject'}
+    assert steps == []
+
+
+def test_failed_assessment_keeps_the_notes():
+    body, status = complete({'title': 'Graphs', 'subject': 'CS'}, [
+        {'content': 'Notes'}, json_extract.ModelOutputError('bad json', 'not json')
+    ])
+    assert status == 200
+    assert body['notes'] == {'content': 'Notes'}
+    assert body['assessment'] is None
+    assert body['errors'] == {'assessment': 'Failed to parse AI response'}
+
+
+def test_empty_notes_are_a_failed_part():
+    with pytest.raises(ValueError):
+        sessions.notes_part('')
+    body, status = complete({'title': 'Graphs', 'subject': 'CS'}, [
+        ValueError('Failed to generate notes from AI'), {'questions': [mcq(1)]}
+    ])
+    assert status == 200
+    assert body['notes'] is None
+    assert body['errors'] == {'notes': 'An error occurred: Failed to generate notes from AI'}
+
+
+def test_both_parts_failing_is_an_error():
+    body, status = complete({'title': 'Graphs', 'subject': 'CS'}, [RuntimeError('down'), RuntimeError('down')])
+    assert status == 500
+    assert body['success'] is False
+    assert body['error'] == 'Failed to generate session notes and assessment'
+    assert set(body['errors']) == set(sessions.PARTS)
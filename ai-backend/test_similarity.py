@@ -0,0 +1,51 @@
+import similarity
+
+
+def index():
+    return similarity.SimilarityIndex(threshold=similarity.THRESHOLD, max_entries=8, ttl=60)
+
+
+def test_normalize_folds_hyphens_spacing_and_filler():
+    assert similarity.normalize_concept('What is Big-O notation?') == 'bigo notation'
+    assert similarity.normalize_concept('big o complexity') == 'bigo complexity'
+    assert similarity.normalize_concept('BigO') == 'bigo'
+    assert similarity.normalize_concept('Binary search trees') == 'binary search tree'
+
+
+def test_rewordings_reuse_the_explanation():
+    idx = index()
+    idx.add('Big O notation', '', 'explanation')
+    for concept in ('Big-O', 'big o complexity', 'what is big O?', 'BigO notation'):
+        match = idx.lookup(concept)
+        assert match is not None, concept
+        assert match.value == 'explanation'
+        assert match.similarity >= similarity.THRESHOLD
+
+
+def test_prefix_and_negation_changes_are_not_reused():
+    idx = index()
+    idx.add('Supervised learning', '', 'supervised')
+    idx.add('Linear regression', '', 'linear')
+    assert idx.lookup('Unsupervised learning') is None
+    assert idx.lookup('Semi-supervised learning') is None
+    assert idx.lookup('Non-linear regression') is None
+    assert idx.lookup('supervised learning').value == 'supervised'
+
+
+def test_different_context_is_not_reused():
+    idx = index()
+    idx.add('Recursion', 'python functions', 'python')
+    assert idx.lookup('recursion', 'python functions').value == 'python'
+    assert idx.lookup('recursion', 'haskell type classes') is None
+
+
+def test_eviction_and_expiry():
+    idx = similarity.SimilarityIndex(max_entries=2, ttl=60)
+    for concept in ('stack', 'queue', 'heap'):
+        idx.add(concept, '', concept)
+    assert len(idx) == 2
+    assert idx.lookup('stack') is None
+    expired = similarity.SimilarityIndex(ttl=-1)
+    expired.add('stack', '', 'stack')
+    assert expired.lookup('stack') is None
+    assert len(expired) == 0
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import FileLock, SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+    results = []
+
+    def work():
+        runs.append(1)
+        release.wait(5)
+        return 'answer'
+
+    def call():
+        results.append(flight.do('key', work))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    wait_until(lambda: flight._calls)
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    wait_until(lambda: flight.shared('key') and flight._calls['key'].waiters == 3)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert len(runs) == 1
+    assert sorted(results) == [('answer', False)] + [('answer', True)] * 3
+    assert not flight.shared('key')
+
+
+def test_waiters_get_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def work():
+        release.wait(5)
+        raise ValueError('bad answer')
+
+    def call():
+        try:
+            flight.do('key', work)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    threads[0].start()
+    wait_until(lambda: flight._calls)
+    threads[1].start()
+    wait_until(lambda: flight.shared('key'))
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ['bad answer', 'bad answer']
+    # A later call runs again
+    assert flight.do('key', lambda: 'fresh') == ('fresh', False)
+
+
+def test_async_callers_share_one_run():
+    flight = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return 'answer'
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async('key', work) for _ in range(4)))
+
+    results = asyncio.run(run())
+    assert len(runs) == 1
+    assert results == [('answer', False)] + [('answer', True)] * 3
+
+
+def test_async_run_survives_one_cancelled_waiter():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return 'answer'
+
+    async def run():
+        first = asyncio.ensure_future(flight.do_async('key', work))
+        second = asyncio.ensure_future(flight.do_async('key', work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == ('answer', True)
+
+
+def test_async_run_is_cancelled_when_every_waiter_leaves():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        waiter = asyncio.ensure_future(flight.do_async('key', work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert cancelled == [True]
+    assert flight._async_calls == {}
+
+
+def test_file_lock_leaves_no_files_behind(tmp_path):
+    for i in range(20):
+        with FileLock(str(tmp_path), f'key-{i}'):
+            pass
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_file_lock_is_exclusive_while_files_come_and_go(tmp_path):
+    holders = []
+    overlaps = []
+
+    def work():
+        for _ in range(20):
+            with FileLock(str(tmp_path), 'key'):
+                holders.append(1)
+                if len(holders) > 1:
+                    overlaps.append(len(holders))
+                time.sleep(0.0005)
+                holders.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert overlaps == []
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import metrics
+import sse
+
+
+def parse(events):
+    """(event, data) pairs from formatted SSE messages"""
+    parsed = []
+    for message in events:
+        assert message.endswith('\n\n')
+        fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+        parsed.append((fields.get('event'), json.loads(fields['data'])))
+    return parsed
+
+
+def disconnects(route):
+    return metrics.CLIENT_DISCONNECTS._totals().get((route, 'streaming'), 0)
+
+
+async def agen(items):
+    for item in items:
+        yield item
+
+
+async def collect(events):
+    return [message async for message in events]
+
+
+def test_event_formatting():
+    assert sse.sse_event({'text': 'hi'}) == 'data: {"text":"hi"}\n\n'
+    assert sse.sse_event({'a': 1}, event='done').startswith('event: done\ndata: ')
+
+
+def test_chunks_then_done_with_metadata():
+    events = parse(sse.markdown_events(iter(['# Title', '\n\nBody']), {'title': 'T'}))
+    assert events == [
+        ('chunk', {'text': '# Title'}),
+        ('chunk', {'text': '\n\nBody'}),
+        ('done', {'title': 'T', 'success': True}),
+    ]
+
+
+def test_empty_stream_is_an_error_event():
+    assert parse(sse.markdown_events(iter([]), {})) == [('error', {'error': 'AI returned an empty response'})]
+
+
+def test_failure_mid_stream_is_an_error_event():
+    def chunks():
+        yield 'first'
+        raise RuntimeError('model down')
+
+    events = parse(sse.markdown_events(chunks(), {}))
+    assert events[0] == ('chunk', {'text': 'first'})
+    assert events[1] == ('error', {'error': 'An error occurred while streaming: model down'})
+
+
+def test_disconnect_closes_the_chunks():
+    closed = []
+
+    def chunks():
+        try:
+            yield 'one'
+            yield 'two'
+        finally:
+            closed.append(True)
+
+    before = disconnects('/test-sse')
+    events = sse.markdown_events(chunks(), {}, route='/test-sse')
+    next(events)
+    events.close()
+    assert closed == [True]
+    assert disconnects('/test-sse') == before + 1
+
+
+def test_async_events_match_the_sync_ones():
+    events = asyncio.run(collect(sse.markdown_events_async(agen(['a', 'b']), {'n': 1})))
+    assert events == list(sse.markdown_events(iter(['a', 'b']), {'n': 1}))
+    empty = asyncio.run(collect(sse.markdown_events_async(agen([]), {})))
+    assert parse(empty) == [('error', {'error': 'AI returned an empty response'})]
+
+
+def test_async_disconnect_closes_the_chunks():
+    closed = []
+
+    async def chunks():
+        try:
+            yield 'one'
+            yield 'two'
+        finally:
+            closed.append(True)
+
+    async def main():
+        events = sse.markdown_events_async(chunks(), {}, route='/test-sse-async')
+        await events.__anext__()
+        await events.aclose()
+
+    before = disconnects('/test-sse-async')
+    asyncio.run(main())
+    assert closed == [True]
+    assert disconnects('/test-sse-async') == before + 1
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+
+import cancellation
+import structured
+
+
+def mcq(n, **changes):
+    item = {'id': n, 'question': f'Question {n}?', 'options': ['A1', 'B1', 'C1', 'D1'],
+            'correct_answer': 'A1', 'explanation': 'Because.'}
+    item.update(changes)
+    return item
+
+
+def drive(steps, replies):
+    """Run a repair generator against canned replies; returns (result, prompts asked)"""
+    prompts = []
+
+    def ask(prompt, schema):
+        prompts.append(prompt)
+        return replies.pop(0)
+
+    return structured.run_steps(steps, ask), prompts
+
+
+def test_valid_output_needs_no_repair():
+    spec = structured.quiz_spec(2)
+    text = json.dumps({'questions': [mcq(1), mcq(2)]})
+    result, prompts = drive(spec.repair_steps(text), [])
+    assert prompts == []
+    assert json.loads(result) == {'questions': [mcq(1), mcq(2)]}
+
+
+def test_letter_answer_is_fixed_locally():
+    spec = structured.quiz_spec(1)
+    result, prompts = drive(spec.repair_steps(json.dumps({'questions': [mcq(1, correct_answer='B')]})), [])
+    assert prompts == []
+    assert json.loads(result)['questions'][0]['correct_answer'] == 'B1'
+
+
+def test_only_invalid_items_are_sent_back():
+    spec = structured.quiz_spec(3)
+    text = json.dumps({'questions': [mcq(1), mcq(2, options=['x', 'y']), mcq(3)]})
+    result, prompts = drive(spec.repair_steps(text), [json.dumps({'questions': [mcq(2)]})])
+    assert len(prompts) == 1
+    assert 'Question 2?' in prompts[0] and 'Question 1?' not in prompts[0]
+    assert json.loads(result)['questions'] == [mcq(1), mcq(2), mcq(3)]
+
+
+def test_missing_items_are_requested_and_surplus_trimmed():
+    spec = structured.quiz_spec(3)
+    result, prompts = drive(spec.repair_steps(json.dumps([mcq(1)])),
+                            [json.dumps({'questions': [mcq(7), mcq(8), mcq(9)]})])
+    assert len(prompts) == 1
+    assert 'Write 2 more' in prompts[0]
+    questions = json.loads(result)['questions']
+    assert [q['question'] for q in questions] == ['Question 1?', 'Question 7?', 'Question 8?']
+    assert [q['id'] for q in questions] == [1, 2, 3]
+
+
+def test_non_json_output_is_converted():
+    spec = structured.quiz_spec(1)
+    result, prompts = drive(spec.repair_steps('Here is a quiz: what is 1+1?'),
+                            [json.dumps({'questions': [mcq(1)]})])
+    assert 'Convert the following text' in prompts[0]
+    assert json.loads(result) == {'questions': [mcq(1)]}
+
+
+def test_unconvertible_output_is_returned_unchanged():
+    spec = structured.quiz_spec(1)
+    result, _ = drive(spec.repair_steps('no json here'), ['still no json'])
+    assert result == 'no json here'
+
+
+def test_nested_path_tolerates_a_missing_wrapper():
+    spec = structured.assessment_spec(1)
+    result, prompts = drive(spec.repair_steps(json.dumps({'title': 'T', 'questions': [mcq(1)]})), [])
+    assert prompts == []
+    assert json.loads(result) == {'assessment': {'title': 'T', 'questions': [mcq(1)]}}
+
+
+def test_object_spec_repairs_problems():
+    spec = structured.evaluation_spec()
+    bad = {'score': '8/10', 'strengths': 'clear', 'improvements': []}
+    result, prompts = drive(spec.repair_steps(json.dumps(bad)), [json.dumps({
+        'score': 8, 'strengths': ['clear'], 'improvements': ['depth'], 'feedback': 'Good.'})])
+    assert len(prompts) <= 1
+    assert json.loads(result)['score'] == 8
+
+
+def failing(error):
+    def ask(prompt, schema):
+        raise error
+    return ask
+
+
+def test_failed_repair_keeps_the_output_so_far():
+    spec = structured.quiz_spec(5)
+    items = [mcq(n) for n in range(1, 5)] + [mcq(5, options=['x'])]
+    result = structured.run_steps(spec.repair_steps(json.dumps({'questions': items})),
+                                  failing(TimeoutError('repair timed out')))
+    assert json.loads(result)['questions'] == items
+
+
+def test_failed_conversion_returns_the_original_text():
+    spec = structured.evaluation_spec()
+    result = structured.run_steps(spec.repair_steps('not json'), failing(TimeoutError('down')))
+    assert result == 'not json'
+
+
+def test_failed_async_repair_keeps_the_output_so_far():
+    spec = structured.quiz_spec(2)
+
+    async def ask(prompt, schema):
+        raise TimeoutError('down')
+
+    result = asyncio.run(structured.run_steps_async(spec.repair_steps(json.dumps([mcq(1)])), ask))
+    assert json.loads(result)['questions'] == [mcq(1)]
+
+
+def test_a_client_that_has_gone_still_stops_repairs():
+    spec = structured.quiz_spec(2)
+    with pytest.raises(cancellation.ClientDisconnected):
+        structured.run_steps(spec.repair_steps(json.dumps([mcq(1)])),
+                             failing(cancellation.ClientDisconnected('Client disconnected')))
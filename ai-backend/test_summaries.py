@@ -0,0 +1,110 @@
+import pytest
+
+import handlers
+import summaries
+from cache import MemoryCache, ResponseCache
+from test_handlers import drive
+
+
+def note(sections=40, edit=None):
+    parts = []
+    for i in range(sections):
+        body = f'Topic {i} covers idea {i} in some depth. ' * 16
+        if i == edit:
+            body += 'An added sentence.'
+        parts.append(f'## Topic {i}\n\n{body}\n')
+    return '\n'.join(parts)
+
+
+def test_split_sections_ignores_headings_in_code_fences():
+    content = '# A\ntext\n```\n# not a heading\n```\n# B\nmore\n'
+    assert summaries.split_sections(content) == ['# A\ntext\n```\n# not a heading\n```\n', '# B\nmore\n']
+
+
+def test_split_note_packs_small_sections():
+    content = '\n'.join(f'## S{i}\nshort text\n' for i in range(10))
+    assert summaries.split_note(content, max_chars=1000) == [content.strip()]
+
+
+def test_fingerprint_ignores_whitespace_edits():
+    assert summaries.fingerprint('a  b\nc') == summaries.fingerprint('a b c ')
+
+
+def test_packs_stay_within_budget_and_group_sections():
+    packs = summaries.incremental_packs(note(), max_chars=8000)
+    assert len(packs) < 40
+    assert all(len(pack['text']) <= 8000 for pack in packs)
+    assert sum(len(pack['sections']) for pack in packs) == 40
+
+
+def test_an_edit_only_changes_the_pack_it_is_in():
+    before = [pack['fingerprint'] for pack in summaries.incremental_packs(note())]
+    after = [pack['fingerprint'] for pack in summaries.incremental_packs(note(edit=17))]
+    assert len(before) == len(after)
+    assert sum(a != b for a, b in zip(before, after)) == 1
+
+
+@pytest.fixture
+def partial_store(monkeypatch):
+    store = summaries.PartialStore(ResponseCache(MemoryCache(max_entries=1000)))
+    monkeypatch.setattr(handlers, 'partial_store', store)
+    return store
+
+
+def summarize(content):
+    call = handlers.Call({'content': content, 'title': 'Notes', 'incremental': True})
+    return drive(handlers.summarize_notes(call), lambda step: (f'summary of {step.endpoint}', 'MISS'))
+
+
+def test_incremental_summary_regenerates_only_the_edited_pack(partial_store):
+    (body, status), steps = summarize(note())
+    assert status == 200
+    packs = body['chunks']
+    assert body['reused_sections'] == 0
+    assert len(steps) == packs + 1
+
+    (body, status), steps = summarize(note(edit=17))
+    assert status == 200
+    assert [step.endpoint for step in steps] == ['summarize-notes-chunk', 'summarize-notes']
+    assert body['chunks'] == packs
+    assert len(body['sections']) == 40
+    edited_pack = next(
+        pack for pack in summaries.incremental_packs(note(edit=17))
+        if any(section['heading'] == 'Topic 17' for section in pack['sections'])
+    )
+    regenerated = [section['heading'] for section in body['sections'] if not section['reused']]
+    assert regenerated == [section['heading'] for section in edited_pack['sections']]
+    assert body['reused_sections'] == 40 - len(regenerated)
+
+
+def test_short_note_stores_partials_on_the_first_request(partial_store):
+    content = note(sections=12)
+    assert not summaries.needs_chunking(content)
+    (body, status), steps = summarize(content)
+    assert status == 200
+    assert body['reused_sections'] == 0
+    assert len(steps) == body['chunks'] + 1 > 2
+
+    (body, status), steps = summarize(note(sections=12, edit=5))
+    assert [step.endpoint for step in steps] == ['summarize-notes-chunk', 'summarize-notes']
+    assert body['reused_sections'] > 0
+
+
+def test_note_in_a_single_pack_takes_one_call(partial_store):
+    (body, status), steps = summarize('## Only\n\nOne short section.')
+    assert status == 200
+    assert [step.endpoint for step in steps] == ['summarize-notes']
+    assert 'sections' not in body
+
+
+def test_long_paragraph_ending_in_a_separator_is_split_hard():
+    content = 'x' * 30000 + '\n\n# B\n' + 'y' * 100
+    chunks = summaries.split_note(content, max_chars=8000)
+    assert all(len(chunk) <= 8000 for chunk in chunks)
+    assert ''.join(chunks).count('x') == 30000
+    assert len(summaries.incremental_sections(content)) == 5
+
+
+def test_long_note_with_trailing_separator_summarizes(partial_store):
+    (body, status), _ = summarize('x' * 30000 + '\n\n# B\n' + 'y' * 100)
+    assert status == 200
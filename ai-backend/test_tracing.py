@@ -0,0 +1,112 @@
+import json
+import re
+import time
+import types
+
+import pytest
+
+import hooks
+import tracing
+
+
+@pytest.fixture
+def trace():
+    trace = tracing.begin(None, 'POST', '/api/test')
+    yield trace
+    tracing.finish(trace, 200)
+
+
+def timing(header):
+    """{name: (dur, desc)} from a Server-Timing header, in header order"""
+    entries = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        fields = dict(param.split('=', 1) for param in params)
+        entries[name] = (float(fields['dur']), fields.get('desc'))
+    return entries
+
+
+@pytest.mark.parametrize('header, kept', [
+    ('abc-123', True),
+    ('req.1:2/3+4=', True),
+    ('', False),
+    (None, False),
+    ('has space', False),
+    ('x' * 129, False),
+    ('bad\r\nheader', False),
+])
+def test_request_id(header, kept):
+    request_id = tracing.request_id(header)
+    assert (request_id == header) is kept
+    assert tracing.REQUEST_ID.match(request_id)
+
+
+def test_server_timing_lists_recorded_phases_in_order(trace):
+    trace.add('model', 0.2)
+    trace.add('model', 0.1)
+    trace.add('parse', 0.01)
+    entries = timing(trace.server_timing())
+    assert list(entries) == ['parse', 'model', 'app', 'total']
+    assert entries['model'] == (pytest.approx(300.0), '"2 calls"')
+    assert entries['parse'][1] is None
+    assert entries['app'][0] >= 0
+    assert re.fullmatch(r'[a-z]+;dur=\d+\.\d(;desc="\d+ calls")?(, [a-z]+;dur=\d+\.\d(;desc="\d+ calls")?)*',
+                        trace.server_timing())
+
+
+def test_nested_phases_of_the_same_name_count_once(trace):
+    with tracing.phase('prompt'):
+        with tracing.phase('prompt'):
+            time.sleep(0.01)
+    assert trace.calls['prompt'] == 1
+    assert trace.phases['prompt'] >= 0.01
+
+
+def test_parallel_model_time_does_not_make_app_negative(trace):
+    trace.add('model', 60)
+    app = [ms for phase, ms, _ in trace.breakdown(0.5) if phase == 'app']
+    assert app == [0.0]
+
+
+def test_phases_outside_a_request_are_ignored():
+    assert tracing.current() is None
+    with tracing.phase('model'):
+        pass
+    tracing.add('model', 1)
+    assert tracing.current_request_id() is None
+
+
+def test_tracing_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(tracing, 'TRACING', False)
+    assert tracing.begin('abc', 'GET', '/') is None
+    tracing.finish(None, 200)
+
+
+def test_slow_request_log_has_sizes_but_no_bodies(monkeypatch, capsys):
+    monkeypatch.setattr(tracing, 'SLOW_REQUEST_MS', 0)
+    monkeypatch.setattr(tracing, 'SLOW_REQUEST_SAMPLE', 1.0)
+    trace = tracing.begin('slow-1', 'POST', '/api/test')
+    tracing.note_prompt('secret prompt text')
+    tracing.note_output('secret output')
+    tracing.finish(trace, 200)
+    line = capsys.readouterr().out.strip()
+    assert line.startswith('Slow request: ')
+    record = json.loads(line[len('Slow request: '):])
+    assert record['request_id'] == 'slow-1'
+    assert record['prompt_chars'] == len('secret prompt text')
+    assert record['model_output_chars'] == len('secret output')
+    assert 'secret' not in line
+    assert tracing.current() is None
+
+
+def test_response_gets_the_request_id_and_server_timing(trace):
+    g = types.SimpleNamespace(trace=trace)
+    g.get = lambda name, default=None: getattr(g, name, default)
+    response = types.SimpleNamespace(status_code=200, headers={})
+    with tracing.phase('serialize'):
+        pass
+    hooks.finish_response(g, response, size=42)
+    assert response.headers[tracing.REQUEST_ID_HEADER] == trace.request_id
+    entries = timing(response.headers['Server-Timing'])
+    assert 'serialize' in entries and 'total' in entries
+    assert trace.response_bytes == 42
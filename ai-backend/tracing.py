@@ -0,0 +1,258 @@
+"""
+Per-request tracing for both servers.
+
+Every request gets an ID, taken from the caller's X-Request-Id when it is a
+plain token and generated otherwise. The ID is echoed in the response and
+passed on to background jobs the request queues. The request also gets a
+trace of where its time went:
+
+- decode: inflating a gzip request body
+- parse: decoding the JSON request body
+- prompt: assembling prompts (templates and budget compaction)
+- model: upstream generations, retries and repair requests included
+- extract: fence stripping, JSON parsing and validation of model output
+- serialize: encoding the JSON response
+- encode: compressing the response
+
+Whatever is left over is reported as `app`. The breakdown is returned in a
+Server-Timing header and observed in ai_request_phase_seconds.
+
+Requests slower than AI_SLOW_REQUEST_MS are counted and, sampled at
+AI_SLOW_REQUEST_SAMPLE, logged as one JSON line with the phase breakdown and
+the prompt and response sizes. Prompt and response bodies are never logged.
+With AI_PROFILE_DIR set, a sample of requests (AI_PROFILE_SAMPLE) runs under
+cProfile, and the profile of any over AI_PROFILE_MS is written there.
+"""
+import contextlib
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+import metrics
+
+TRACING = os.getenv('AI_TRACING', '1') not in ('0', 'false')
+
+# Incoming header whose value becomes the request ID; the response carries it back
+REQUEST_ID_HEADER = os.getenv('AI_REQUEST_ID_HEADER', 'X-Request-Id')
+
+# Requests at least this slow are counted and logged
+SLOW_REQUEST_MS = float(os.getenv('AI_SLOW_REQUEST_MS', 2000))
+
+# Fraction of slow requests that are logged
+SLOW_REQUEST_SAMPLE = float(os.getenv('AI_SLOW_REQUEST_SAMPLE', 1.0))
+
+# Directory for cProfile dumps; unset disables profiling
+PROFILE_DIR = os.getenv('AI_PROFILE_DIR')
+
+# Fraction of requests run under the profiler; only those over AI_PROFILE_MS are written
+PROFILE_SAMPLE = float(os.getenv('AI_PROFILE_SAMPLE', 0.05))
+PROFILE_MS = float(os.getenv('AI_PROFILE_MS', SLOW_REQUEST_MS))
+
+# Server-Timing order; phases are listed only when they were recorded
+PHASES = ('decode', 'parse', 'prompt', 'model', 'extract', 'serialize', 'encode')
+
+# Caller-supplied IDs are kept only when they are short, header-safe tokens
+REQUEST_ID = re.compile(r'^[A-Za-z0-9._:/+=-]{1,128}$')
+
+_current = contextvars.ContextVar('ai_trace', default=None)
+
+# Phases open in the current context, so nested timers of the same phase count once
+_open = contextvars.ContextVar('ai_trace_open', default=frozenset())
+
+# cProfile takes over the whole thread's profiling hook, so one request is profiled at a time
+_profiling = threading.Lock()
+
+
+class Trace:
+    """Phase timings and sizes for one request; phases may be recorded from several threads"""
+
+    def __init__(self, request_id, method, route):
+        self.request_id = request_id
+        self.method = method
+        self.route = route
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.calls = {}
+        self.prompts = 0
+        self.prompt_chars = 0
+        self.output_chars = 0
+        self.response_bytes = None
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def note_prompt(self, prompt):
+        with self._lock:
+            self.prompts += 1
+            self.prompt_chars += len(prompt)
+
+    def note_output(self, text):
+        with self._lock:
+            self.output_chars += len(text or '')
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def breakdown(self, total):
+        """[(phase, ms, calls)] in PHASES order, then `app` for the rest of `total` seconds"""
+        with self._lock:
+            phases = dict(self.phases)
+            calls = dict(self.calls)
+        rows = [(phase, phases[phase] * 1000, calls[phase]) for phase in PHASES if phase in phases]
+        # Parallel model calls can add up to more than the wall time
+        rest = total - sum(phases.values())
+        rows.append(('app', max(0.0, rest) * 1000, None))
+        return rows
+
+    def server_timing(self):
+        total = self.elapsed()
+        entries = []
+        for phase, ms, calls in self.breakdown(total):
+            entry = f'{phase};dur={ms:.1f}'
+            if calls and calls > 1:
+                entry += f';desc="{calls} calls"'
+            entries.append(entry)
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+    def record(self, status, total):
+        """The slow-request log entry: timings and sizes, no bodies"""
+        return {
+            'request_id': self.request_id,
+            'method': self.method,
+            'route': self.route,
+            'status': status,
+            'total_ms': round(total * 1000, 1),
+            'phases_ms': {phase: round(ms, 1) for phase, ms, _ in self.breakdown(total)},
+            'model_calls': self.calls.get('model', 0),
+            'prompts': self.prompts,
+            'prompt_chars': self.prompt_chars,
+            'prompt_tokens': _estimate_tokens(self.prompt_chars),
+            'model_output_chars': self.output_chars,
+            'response_bytes': self.response_bytes,
+        }
+
+
+def _estimate_tokens(chars):
+    # Same rate as prompt_budget's ASCII estimate; the prompt text itself is not kept
+    return (chars + 3) // 4
+
+
+def request_id(header_value):
+    """The caller's request ID when it is a plain token, otherwise a new one"""
+    if header_value and REQUEST_ID.match(header_value):
+        return header_value
+    return uuid.uuid4().hex
+
+
+def begin(header_value, method, route):
+    """Start tracing the current request; returns its Trace, or None with AI_TRACING=0"""
+    if not TRACING:
+        return None
+    trace = Trace(request_id(header_value), method, route)
+    _current.set(trace)
+    if PROFILE_DIR and random.random() < PROFILE_SAMPLE and _profiling.acquire(blocking=False):
+        trace.profiler = cProfile.Profile()
+        trace.profiler.enable()
+    return trace
+
+
+def current():
+    return _current.get()
+
+
+def current_request_id():
+    trace = _current.get()
+    return trace.request_id if trace is not None else None
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Time the enclosed block as `name` in the current request's trace"""
+    trace = _current.get()
+    opened = _open.get()
+    if trace is None or name in opened:
+        yield
+        return
+    token = _open.set(opened | {name})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+        _open.reset(token)
+
+
+def traced(name):
+    """Decorator form of phase()"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add(name, seconds):
+    """Record time measured elsewhere (e.g. across a stream's chunks)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def note_prompt(prompt):
+    trace = _current.get()
+    if trace is not None:
+        trace.note_prompt(prompt)
+
+
+def note_output(text):
+    trace = _current.get()
+    if trace is not None:
+        trace.note_output(text)
+
+
+def finish(trace, status):
+    """End a request's trace: phase metrics, the slow-request log and the profile dump"""
+    _current.set(None)
+    if trace is None:
+        return
+    total = trace.elapsed()
+    if trace.profiler is not None:
+        trace.profiler.disable()
+        _profiling.release()
+        if total * 1000 >= PROFILE_MS:
+            _dump_profile(trace, total)
+    for name, ms, _ in trace.breakdown(total):
+        metrics.REQUEST_PHASE_SECONDS.observe(ms / 1000, trace.route, name)
+    if total * 1000 < SLOW_REQUEST_MS:
+        return
+    metrics.SLOW_REQUESTS.inc(trace.route)
+    if random.random() < SLOW_REQUEST_SAMPLE:
+        print(f"Slow request: {json.dumps(trace.record(status, total))}")
+
+
+def _slug(text):
+    return re.sub(r'[^A-Za-z0-9]+', '-', text).strip('-') or 'root'
+
+
+def _dump_profile(trace, total):
+    name = f'{_slug(trace.route)}-{_slug(trace.request_id)[:64]}-{int(total * 1000)}ms.prof'
+    path = os.path.join(PROFILE_DIR, name)
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        trace.profiler.dump_stats(path)
+    except OSError as e:
+        print(f"Error writing profile {path}: {str(e)}")
@@ -69,6 +69,7 @@ const generateAssessment = async (req, res) => {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
+            "X-Client-Id": req.user._id.toString(),
           },
           body: JSON.stringify({
             content: `${session.title}\n${session.subject}\n${session.description}`,
@@ -272,20 +272,22 @@ const completeSession = async (req, res) => {
     console.log(`Completing session: ${session.title}`);
     console.log(`Participants count: ${session.participants.length}`);
 
-    // Generate notes using AI
+    // Generate notes and assessment using AI (one call; both are generated in parallel)
     try {
-      console.log("Calling AI backend to generate notes...");
+      console.log("Calling AI backend to generate notes and assessment...");
       const aiResponse = await fetch(
-        "http://localhost:5001/api/generate-session-notes",
+        "http://localhost:5001/api/complete-session",
         {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
+            "X-Client-Id": req.user._id.toString(),
           },
           body: JSON.stringify({
             title: session.title,
             subject: session.subject,
             description: session.description || "",
+            num_questions: 5,
           }),
         }
       );
@@ -296,7 +298,45 @@ const completeSession = async (req, res) => {
       }
 
       const aiData = await aiResponse.json();
-      const generatedContent = aiData.content;
+
+      // The assessment is saved even if note generation failed
+      if (aiData.assessment && aiData.assessment.questions) {
+        try {
+          const questions = aiData.assessment.questions.map((q) => ({
+            question: q.question,
+            options: q.options,
+            correctAnswer: q.correct_answer,
+            explanation: q.explanation,
+          }));
+
+          // Create assessment in database
+          const assessment = new Assessment({
+            sessionId: session._id,
+            title: session.title,
+            subject: session.subject,
+            questions: questions.slice(0, 5), // Limit to 5 questions
+            createdBy: session.createdBy,
+          });
+
+          await assessment.save();
+          console.log("Assessment generated and saved successfully");
+        } catch (assessmentError) {
+          console.error("Error saving assessment:", assessmentError);
+        }
+      } else {
+        console.error(
+          "Failed to generate assessment from AI backend:",
+          aiData.errors && aiData.errors.assessment
+        );
+      }
+
+      if (!aiData.notes) {
+        throw new Error(
+          `AI backend error: ${aiData.errors && aiData.errors.notes}`
+        );
+      }
+
+      const generatedContent = aiData.notes.content;
 
       console.log("AI content generated successfully");
       console.log(`Content length: ${generatedContent.length} characters`);
@@ -341,103 +381,6 @@ const completeSession = async (req, res) => {
 
       console.log(`Successfully created ${createdNotes.length} notes`);
 
-      // Generate assessment after notes are created
-      try {
-        console.log("Generating assessment for session...");
-        const aiAssessmentResponse = await fetch(
-          "http://localhost:5001/api/generate-quiz",
-          {
-            method: "POST",
-            headers: {
-              "Content-Type": "application/json",
-            },
-            body: JSON.stringify({
-              content: `${session.title}\n${session.subject}\n${
-                session.description || ""
-              }`,
-              num_questions: 5,
-            }),
-          }
-        );
-
-        if (aiAssessmentResponse.ok) {
-          const aiAssessmentData = await aiAssessmentResponse.json();
-
-          // Use the new structured format from the improved AI backend
-          let questions = [];
-          if (aiAssessmentData.quiz && aiAssessmentData.quiz.questions) {
-            // New format - structured JSON
-            questions = aiAssessmentData.quiz.questions.map((q) => ({
-              question: q.question,
-              options: q.options,
-              correctAnswer: q.correct_answer,
-              explanation: q.explanation,
-            }));
-          } else if (aiAssessmentData.quiz) {
-            // Old format - parse the text content
-            const quizContent = aiAssessmentData.quiz;
-            const lines = quizContent.split("\n");
-            let currentQuestion = null;
-
-            for (let i = 0; i < lines.length; i++) {
-              const line = lines[i].trim();
-
-              // Check if this line starts a new question
-              if (line.match(/^\d+\./) || line.match(/^Question/)) {
-                if (currentQuestion) {
-                  questions.push(currentQuestion);
-                }
-
-                currentQuestion = {
-                  question: line,
-                  options: [],
-                  correctAnswer: "",
-                  explanation: "",
-                };
-              } else if (
-                currentQuestion &&
-                (line.match(/^[A-D]\)/) || line.match(/^[A-D]\./))
-              ) {
-                currentQuestion.options.push(line);
-              } else if (currentQuestion && line.match(/^Correct answer:/i)) {
-                currentQuestion.correctAnswer = line.replace(
-                  /^Correct answer:\s*/i,
-                  ""
-                );
-              } else if (currentQuestion && line.match(/^Explanation:/i)) {
-                currentQuestion.explanation = line.replace(
-                  /^Explanation:\s*/i,
-                  ""
-                );
-              } else if (currentQuestion && line.startsWith("Explanation:")) {
-                currentQuestion.explanation = line.substring(12).trim();
-              }
-            }
-
-            // Add the last question
-            if (currentQuestion) {
-              questions.push(currentQuestion);
-            }
-          }
-
-          // Create assessment in database
-          const assessment = new Assessment({
-            sessionId: session._id,
-            title: session.title,
-            subject: session.subject,
-            questions: questions.slice(0, 5), // Limit to 5 questions
-            createdBy: session.createdBy,
-          });
-
-          await assessment.save();
-          console.log("Assessment generated and saved successfully");
-        } else {
-          console.error("Failed to generate assessment from AI backend");
-        }
-      } catch (assessmentError) {
-        console.error("Error generating assessment:", assessmentError);
-      }
-
       res.json({
         message:
           "Session completed, notes generated, and assessment created for all participants",
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
@@ -20,6 +20,12 @@ const CourseGenerator = () => {
   const [learningPath, setLearningPath] = useState('');
   const navigate = useNavigate();
   const { toast } = useToast();
+  // In-flight generation; aborted on unmount so the backend stops generating
+  const requestRef = useRef<AbortController | null>(null);
+
+  useEffect(() => {
+    return () => requestRef.current?.abort();
+  }, []);
 
   const handleGenerate = async () => {
     if (!topic || !duration || !goal) {
@@ -32,10 +38,13 @@ const CourseGenerator = () => {
     }
 
     setIsGenerating(true);
+    const controller = new AbortController();
+    requestRef.current = controller;
     try {
       // Send request to AI backend
       const response = await fetch('http://localhost:5001/api/generate-learning-path', {
         method: 'POST',
+        signal: controller.signal,
         headers: {
           'Content-Type': 'application/json',
         },
@@ -63,6 +72,7 @@ const CourseGenerator = () => {
         throw new Error(data.error || 'Failed to generate learning path');
       }
     } catch (error) {
+      if (controller.signal.aborted) return;
       console.error("Error generating learning path:", error);
       toast({
         title: "Error",
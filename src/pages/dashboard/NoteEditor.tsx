@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useNavigate, useParams } from "react-router-dom";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -49,6 +49,8 @@ const NoteEditor = () => {
   const [summarizing, setSummarizing] = useState(false);
   const [showSummary, setShowSummary] = useState(false);
   const [summary, setSummary] = useState("");
+  // In-flight summary request; aborted when the editor closes so the backend stops generating
+  const summarizeRef = useRef<AbortController | null>(null);
 
   useEffect(() => {
     if (id && id !== "new") {
@@ -56,6 +58,10 @@ const NoteEditor = () => {
     }
   }, [id]);
 
+  useEffect(() => {
+    return () => summarizeRef.current?.abort();
+  }, []);
+
   const fetchNote = async (noteId: string) => {
     try {
       setLoading(true);
@@ -88,18 +94,23 @@ const NoteEditor = () => {
       return;
     }
 
+    const controller = new AbortController();
+    summarizeRef.current = controller;
     try {
       setSummarizing(true);
       const response = await fetch(
         "http://localhost:5001/api/summarize-notes",
         {
           method: "POST",
+          signal: controller.signal,
           headers: {
             "Content-Type": "application/json",
           },
           body: JSON.stringify({
             content: formData.content,
             title: formData.title || "Untitled Note",
+            // Only edited sections are re-summarized
+            incremental: true,
           }),
         }
       );
@@ -116,6 +127,7 @@ const NoteEditor = () => {
         description: "Notes summarized successfully!",
       });
     } catch (error) {
+      if (controller.signal.aborted) return;
       console.error("Error summarizing notes:", error);
       toast({
         title: "Error",
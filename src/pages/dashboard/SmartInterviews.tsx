@@ -20,6 +20,8 @@ interface Evaluation {
   strengths: string[];
   improvements: string[];
   feedback: string;
+  // Set when the AI could not evaluate this answer; it has no score
+  error?: string;
 }
 
 const SmartInterviews = () => {
@@ -28,6 +30,7 @@ const SmartInterviews = () => {
   const [resumeFile, setResumeFile] = useState<File | null>(null);
   const [stage, setStage] = useState<'setup' | 'interview' | 'results'>('setup');
   const [questions, setQuestions] = useState<Question[]>([]);
+  const [resumeProfileId, setResumeProfileId] = useState<string | null>(null);
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
   const [answers, setAnswers] = useState<string[]>([]);
   const [currentAnswer, setCurrentAnswer] = useState('');
@@ -39,12 +42,15 @@ const SmartInterviews = () => {
   const videoRef = useRef<HTMLVideoElement>(null);
   const streamRef = useRef<MediaStream | null>(null);
   const recognitionRef = useRef<any>(null);
+  // In-flight AI request; aborted on unmount so the backend stops generating
+  const requestRef = useRef<AbortController | null>(null);
   const { toast } = useToast();
 
   useEffect(() => {
     return () => {
       stopCamera();
       stopRecording();
+      requestRef.current?.abort();
     };
   }, []);
 
@@ -149,17 +155,21 @@ const SmartInterviews = () => {
     }
 
     setIsLoading(true);
+    const controller = new AbortController();
+    requestRef.current = controller;
     try {
       const response = await fetch('http://localhost:5001/api/generate-interview-questions', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ jobRole, resume }),
+        signal: controller.signal,
       });
 
       if (!response.ok) throw new Error('Failed to generate questions');
 
       const data = await response.json();
       setQuestions(data.questions);
+      setResumeProfileId(data.resume_profile?.id ?? null);
       setAnswers(new Array(data.questions.length).fill(''));
       setStage('interview');
       await startCamera();
@@ -169,6 +179,7 @@ const SmartInterviews = () => {
         description: "Answer each question. You can type or use voice recording.",
       });
     } catch (error) {
+      if (controller.signal.aborted) return;
       toast({
         title: "Error",
         description: "Failed to start interview. Make sure AI backend is running.",
@@ -195,22 +206,37 @@ const SmartInterviews = () => {
   const handleFinishInterview = async (finalAnswers: string[]) => {
     setIsLoading(true);
     stopCamera();
+    const controller = new AbortController();
+    requestRef.current = controller;
     
     try {
-      const evaluationPromises = questions.map((question, index) =>
-        fetch('http://localhost:5001/api/evaluate-answer', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
+      const response = await fetch('http://localhost:5001/api/evaluate-answers', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        signal: controller.signal,
+        body: JSON.stringify({
+          jobRole,
+          // Lets the evaluations take the candidate's background into account
+          resumeProfileId,
+          answers: questions.map((question, index) => ({
             question: question.question,
             answer: finalAnswers[index],
             expectedPoints: question.expectedPoints,
-            jobRole,
-          }),
-        }).then(res => res.json())
-      );
+          })),
+        }),
+      });
+
+      if (!response.ok) {
+        throw new Error('Failed to evaluate answers');
+      }
 
-      const results = await Promise.all(evaluationPromises);
+      const data = await response.json();
+      // Answers the AI could not evaluate come back as { error } entries
+      const results: Evaluation[] = data.evaluations.map((evaluation: Evaluation) =>
+        evaluation.error
+          ? { score: 0, strengths: [], improvements: [], feedback: '', error: evaluation.error }
+          : evaluation
+      );
       setEvaluations(results);
       setStage('results');
       
@@ -219,6 +245,7 @@ const SmartInterviews = () => {
         description: "Your interview has been evaluated. Check your results below.",
       });
     } catch (error) {
+      if (controller.signal.aborted) return;
       toast({
         title: "Error",
         description: "Failed to evaluate answers. Please try again.",
@@ -235,15 +262,18 @@ const SmartInterviews = () => {
     setResume('');
     setResumeFile(null);
     setQuestions([]);
+    setResumeProfileId(null);
     setCurrentQuestionIndex(0);
     setAnswers([]);
     setCurrentAnswer('');
     setEvaluations([]);
   };
 
-  const averageScore = evaluations.length > 0
-    ? evaluations.reduce((sum, e) => sum + e.score, 0) / evaluations.length
-    : 0;
+  // Answers that could not be evaluated are left out of the average
+  const scored = evaluations.filter((e) => !e.error);
+  const averageScore = scored.length > 0
+    ? scored.reduce((sum, e) => sum + e.score, 0) / scored.length
+    : null;
 
   return (
     <div className="space-y-6">
@@ -444,7 +474,9 @@ const SmartInterviews = () => {
             <CardHeader>
               <CardTitle>Interview Results</CardTitle>
               <CardDescription>
-                Average Score: {averageScore.toFixed(1)}/10
+                Average Score: {averageScore !== null ? `${averageScore.toFixed(1)}/10` : 'Not available'}
+                {scored.length < evaluations.length &&
+                  ` (${evaluations.length - scored.length} of ${evaluations.length} answers not evaluated)`}
               </CardDescription>
             </CardHeader>
             <CardContent>
@@ -453,14 +485,24 @@ const SmartInterviews = () => {
                   <div key={question.id} className="border-b pb-4 last:border-0">
                     <div className="flex items-start justify-between mb-2">
                       <h3 className="font-semibold">Question {idx + 1}</h3>
-                      <span className="text-lg font-bold text-primary">
-                        {evaluations[idx]?.score}/10
-                      </span>
+                      {evaluations[idx]?.error ? (
+                        <span className="text-sm font-medium text-muted-foreground">Not evaluated</span>
+                      ) : (
+                        <span className="text-lg font-bold text-primary">
+                          {evaluations[idx]?.score}/10
+                        </span>
+                      )}
                     </div>
                     <p className="text-sm text-muted-foreground mb-2">{question.question}</p>
                     <p className="text-sm mb-3"><strong>Your Answer:</strong> {answers[idx]}</p>
                     
-                    {evaluations[idx] && (
+                    {evaluations[idx]?.error && (
+                      <p className="text-sm text-muted-foreground">
+                        This answer could not be evaluated: {evaluations[idx].error}
+                      </p>
+                    )}
+
+                    {evaluations[idx] && !evaluations[idx].error && (
                       <div className="space-y-2 text-sm">
                         <div>
                           <strong className="text-green-600">Strengths:</strong>